@@ -0,0 +1,228 @@
+"""
+In-memory indexes over the loaded Yale alumni profiles.
+
+The index is built once when MiloAI loads its dataset, so list endpoints and
+chat retrieval can narrow the candidate profiles without re-parsing every
+record per request.
+"""
+
+import bisect
+import hashlib
+import re
+from itertools import islice
+from typing import Dict, List, Optional, Tuple
+
+YEAR_PATTERN = re.compile(r'\b(19|20)\d{2}\b')
+YEAR_RANGE_PATTERN = re.compile(r'^\s*(\d{4})?\s*(?:(-|–|to)\s*(\d{4})?)?\s*$')
+COMPANY_WORD_PATTERN = re.compile(r'[a-z0-9&]+')
+COMPANY_STOPWORDS = {'the', 'and', 'inc', 'llc', 'ltd', 'corp', 'co', 'company', 'group', 'plc'}
+
+# Query synonyms → canonical industry (keys are lowercase, space separated)
+INDUSTRY_SYNONYMS = {
+    'ib': 'Investment Banking', 'investment banking': 'Investment Banking', 'banking': 'Investment Banking',
+    'pe': 'Private Equity', 'private equity': 'Private Equity', 'buyout': 'Private Equity', 'buyouts': 'Private Equity',
+    'vc': 'Venture Capital', 'venture': 'Venture Capital', 'venture capital': 'Venture Capital',
+    'tech': 'Technology', 'technology': 'Technology', 'software': 'Technology', 'it': 'Technology', 'internet': 'Technology',
+    'consulting': 'Consulting', 'management consulting': 'Consulting', 'strategy consulting': 'Consulting',
+    'finance': 'Finance', 'financial services': 'Finance', 'fintech': 'Finance', 'asset management': 'Finance',
+    'hedge funds': 'Finance', 'hedge fund': 'Finance',
+    'healthcare': 'Healthcare', 'health care': 'Healthcare', 'medicine': 'Healthcare', 'biotech': 'Healthcare',
+    'law': 'Law', 'legal': 'Law',
+    'government': 'Government', 'policy': 'Government', 'public policy': 'Government', 'public service': 'Government',
+    'education': 'Education', 'academia': 'Education',
+    'media': 'Media', 'journalism': 'Media', 'publishing': 'Media', 'entertainment': 'Media',
+    'nonprofit': 'Nonprofit', 'non profit': 'Nonprofit', 'ngo': 'Nonprofit',
+    'energy': 'Energy', 'climate': 'Energy',
+    'real estate': 'Real Estate',
+}
+
+# Ordered substring rules mapping raw company_industry values to canonical industries
+INDUSTRY_RULES = [
+    # "Banking" companies are filed with investment banks, matching the 'banking' query synonym
+    ('investment bank', 'Investment Banking'), ('banking', 'Investment Banking'),
+    ('private equity', 'Private Equity'),
+    ('venture capital', 'Venture Capital'),
+    ('capital markets', 'Finance'), ('investment management', 'Finance'), ('financial', 'Finance'),
+    ('finance', 'Finance'), ('insurance', 'Finance'),
+    ('software', 'Technology'), ('internet', 'Technology'), ('information technology', 'Technology'),
+    ('computer', 'Technology'), ('technology', 'Technology'), ('semiconductor', 'Technology'),
+    ('consulting', 'Consulting'),
+    ('hospital', 'Healthcare'), ('health', 'Healthcare'), ('medical', 'Healthcare'),
+    ('biotech', 'Healthcare'), ('pharma', 'Healthcare'),
+    ('law', 'Law'), ('legal', 'Law'),
+    ('government', 'Government'), ('public policy', 'Government'), ('military', 'Government'),
+    ('education', 'Education'), ('e-learning', 'Education'),
+    ('media', 'Media'), ('publishing', 'Media'), ('entertainment', 'Media'), ('broadcast', 'Media'),
+    ('nonprofit', 'Nonprofit'), ('non-profit', 'Nonprofit'), ('philanthropy', 'Nonprofit'),
+    ('energy', 'Energy'), ('renewables', 'Energy'), ('utilities', 'Energy'),
+    ('real estate', 'Real Estate'),
+]
+
+# Sub-industries are also indexed under their parent, so "finance" includes IB, PE and VC
+INDUSTRY_PARENTS = {
+    'Investment Banking': 'Finance',
+    'Private Equity': 'Finance',
+    'Venture Capital': 'Finance',
+}
+
+CANONICAL_INDUSTRIES = sorted(set(INDUSTRY_SYNONYMS.values()))
+
+
+def parse_graduation_year(education_details: List[dict]) -> Optional[int]:
+    """Parse graduation year as an integer from education_details[*].end_year, preferring Yale entries"""
+    if not education_details:
+        return None
+
+    yale_entries = [edu for edu in education_details if 'yale' in (edu.get('institution') or '').lower()]
+    for edu in yale_entries or education_details:
+        match = YEAR_PATTERN.search(str(edu.get('end_year') or ''))
+        if match:
+            return int(match.group(0))
+
+    return None
+
+
+def parse_year_range(value: str) -> Tuple[Optional[int], Optional[int]]:
+    """Parse "2020-2024", "2020", "2020-" or "-2024" into an inclusive (start, end) range"""
+    match = YEAR_RANGE_PATTERN.match(value or '')
+    if not match or not (match.group(1) or match.group(3)):
+        raise ValueError(f"Invalid graduation_year '{value}', expected YYYY or YYYY-YYYY")
+
+    start = int(match.group(1)) if match.group(1) else None
+    if match.group(2):
+        end = int(match.group(3)) if match.group(3) else None
+    else:
+        end = start
+
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"Invalid graduation_year '{value}', start year is after end year")
+
+    return start, end
+
+
+def _clean_industry(value: str) -> str:
+    return ' '.join(re.sub(r'[-_/]+', ' ', (value or '').lower()).split())
+
+
+def normalize_industries(company_industry: str) -> List[str]:
+    """Map a raw company_industry value to its canonical industries (including parents)"""
+    cleaned = _clean_industry(company_industry)
+    if not cleaned:
+        return []
+
+    industries = []
+    for keyword, industry in INDUSTRY_RULES:
+        if keyword in cleaned and industry not in industries:
+            industries.append(industry)
+
+    for industry in list(industries):
+        parent = INDUSTRY_PARENTS.get(industry)
+        if parent and parent not in industries:
+            industries.append(parent)
+
+    return industries
+
+
+def company_words(company: str) -> List[str]:
+    """Significant lowercase words of a company name ("The Goldman Sachs Group, Inc." → goldman, sachs)"""
+    return [word for word in COMPANY_WORD_PATTERN.findall((company or '').lower())
+            if len(word) > 1 and word not in COMPANY_STOPWORDS]
+
+
+def resolve_industry(industry: str) -> Optional[str]:
+    """Resolve a user-facing industry name or abbreviation ("IB", "tech", "private-equity") to a canonical industry"""
+    cleaned = _clean_industry(industry)
+    if cleaned in INDUSTRY_SYNONYMS:
+        return INDUSTRY_SYNONYMS[cleaned]
+
+    for canonical in CANONICAL_INDUSTRIES:
+        if cleaned == canonical.lower():
+            return canonical
+
+    industries = normalize_industries(industry)
+    return industries[0] if industries else None
+
+
+class AlumniIndex:
+    """Secondary indexes over a list of alumni profile dicts"""
+
+    def __init__(self, profiles: List[dict]):
+        self.profiles = profiles or []
+
+        # Fingerprint of the loaded dataset, for caches of anything derived from it
+        identities = "\n".join(str(profile.get('person_id') or profile.get('name') or '') for profile in self.profiles)
+        self.version = hashlib.sha1(f"{len(self.profiles)}\n{identities}".encode('utf-8')).hexdigest()[:12]
+
+        # Parse graduation year once into an integer column on each profile
+        for profile in self.profiles:
+            profile['graduation_year'] = parse_graduation_year(profile.get('education_details') or [])
+
+        # Sorted (year, row id) pairs for bisect range lookups
+        year_rows = sorted(
+            (profile['graduation_year'], row_id)
+            for row_id, profile in enumerate(self.profiles)
+            if profile['graduation_year'] is not None
+        )
+        self._graduation_years = [year for year, _ in year_rows]
+        self._graduation_rows = [row_id for _, row_id in year_rows]
+
+        # Canonical industry → row ids, in dataset order
+        self._industry_rows: Dict[str, List[int]] = {}
+        for row_id, profile in enumerate(self.profiles):
+            for industry in normalize_industries(profile.get('company_industry')):
+                self._industry_rows.setdefault(industry, []).append(row_id)
+
+        # Significant word of the current company name → row ids, in dataset order
+        self._company_rows: Dict[str, List[int]] = {}
+        for row_id, profile in enumerate(self.profiles):
+            company = profile.get('current_company_name') or profile.get('company')
+            for word in dict.fromkeys(company_words(company)):
+                self._company_rows.setdefault(word, []).append(row_id)
+
+    def rows_in_graduation_range(self, start: Optional[int], end: Optional[int]) -> List[int]:
+        """Return row ids with start <= graduation_year <= end, in dataset order"""
+        lo = bisect.bisect_left(self._graduation_years, start) if start is not None else 0
+        hi = bisect.bisect_right(self._graduation_years, end) if end is not None else len(self._graduation_years)
+        return sorted(self._graduation_rows[lo:hi])
+
+    def profiles_for_graduation_year(self, graduation_year: Optional[str] = None) -> List[dict]:
+        """Return profiles matching a graduation_year filter string, or every profile if no filter is given"""
+        if not graduation_year:
+            return self.profiles
+
+        start, end = parse_year_range(graduation_year)
+        return [self.profiles[row_id] for row_id in self.rows_in_graduation_range(start, end)]
+
+    def profiles_for_industry(self, industry: str, graduation_year: Optional[str] = None, limit: Optional[int] = None) -> List[dict]:
+        """Return profiles in a canonical industry, optionally narrowed by a graduation_year filter string
+
+        With a limit, only the first `limit` matching rows (in dataset order) are turned into profiles.
+        """
+        rows = self._industry_rows.get(industry, [])
+
+        if graduation_year:
+            start, end = parse_year_range(graduation_year)
+            year_rows = set(self.rows_in_graduation_range(start, end))
+            rows = (row_id for row_id in rows if row_id in year_rows)
+
+        return [self.profiles[row_id] for row_id in islice(rows, limit)]
+
+    def rows_for_company(self, company: str) -> List[int]:
+        """Row ids, in dataset order, whose current company name contains every significant word of `company`"""
+        words = company_words(company)
+        if not words:
+            return []
+
+        postings = sorted((self._company_rows.get(word, []) for word in dict.fromkeys(words)), key=len)
+        if len(postings) == 1:
+            return postings[0]
+        others = [set(rows) for rows in postings[1:]]
+        return [row_id for row_id in postings[0] if all(row_id in rows for rows in others)]
+
+    def profiles_for_company(self, company: str, limit: Optional[int] = None) -> List[dict]:
+        """Return profiles whose current company name contains every significant word of `company` (the first `limit`)"""
+        return [self.profiles[row_id] for row_id in self.rows_for_company(company)[:limit]]
+
+    def industry_counts(self) -> Dict[str, int]:
+        """Number of profiles indexed under each canonical industry"""
+        return {industry: len(rows) for industry, rows in self._industry_rows.items()}
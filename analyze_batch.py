@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Batch Career Analysis Script
+Precomputes plans for a cohort by sending their stated goals to the /analyze/batch endpoint.
+
+Usage:
+    python analyze_batch.py goals.txt --output plans.ndjson
+    python analyze_batch.py goals.json --url https://your-backend.up.railway.app --concurrency 4
+
+The input file is either a text file with one goal per line or a JSON list of strings.
+Results are written as NDJSON in completion order; each line carries the input's index.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import httpx
+
+
+def load_inputs(path: str) -> list:
+    """Read goals from a JSON list or a text file with one goal per line"""
+    if path == '-':
+        content = sys.stdin.read()
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+
+    if path.endswith('.json'):
+        inputs = json.loads(content)
+        if not isinstance(inputs, list):
+            raise ValueError("JSON input must be a list of strings")
+        return [str(item) for item in inputs]
+
+    return [line.strip() for line in content.splitlines() if line.strip()]
+
+
+def run_batch(url: str, inputs: list, concurrency: int, output) -> dict:
+    """Stream the batch results to output and return the final summary line"""
+    payload = {"inputs": inputs}
+    if concurrency:
+        payload["concurrency"] = concurrency
+
+    summary = {}
+    with httpx.stream("POST", f"{url.rstrip('/')}/analyze/batch", json=payload, timeout=None) as response:
+        if response.status_code != 200:
+            response.read()
+            raise RuntimeError(f"Batch request failed ({response.status_code}): {response.text}")
+
+        for line in response.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if item.get("done"):
+                summary = item
+                continue
+
+            output.write(line + "\n")
+            output.flush()
+            if "index" in item:
+                status = "❌" if "error" in item["result"] else "✅"
+                print(f"{status} [{item['index'] + 1}/{len(inputs)}] {item['user_input'][:60]}", file=sys.stderr)
+            else:
+                print(f"❌ {item.get('error')}", file=sys.stderr)
+
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute Milo career plans for a list of student goals")
+    parser.add_argument("inputs", help="Text file with one goal per line, a JSON list of goals, or - for stdin")
+    parser.add_argument("--url", default=os.getenv("MILO_API_URL", "http://localhost:8001"), help="Milo backend URL")
+    parser.add_argument("--concurrency", type=int, default=None, help="Pipelines to run at once (server default: MILO_BATCH_CONCURRENCY)")
+    parser.add_argument("--output", default="-", help="NDJSON output file (default: stdout)")
+    args = parser.parse_args()
+
+    inputs = load_inputs(args.inputs)
+    print(f"📤 Sending {len(inputs)} goals ({len(set(inputs))} distinct) to {args.url}", file=sys.stderr)
+
+    output = sys.stdout if args.output == "-" else open(args.output, 'w', encoding='utf-8')
+    try:
+        summary = run_batch(args.url, inputs, args.concurrency, output)
+    except Exception as e:
+        print(f"❌ Batch analysis failed: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    if summary:
+        print(f"🎉 {summary['completed']}/{summary['total']} plans in {summary['elapsed_ms'] / 1000:.1f}s ({summary['failed']} failed)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
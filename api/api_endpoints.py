@@ -3,6 +3,7 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 import json
 from milo_ai import MiloAI
+from alumni_index import CANONICAL_INDUSTRIES, resolve_industry
 
 # Initialize the API
 api_app = FastAPI(title="Yale Alumni API", version="1.0.0")
@@ -16,7 +17,7 @@ class AlumniProfile(BaseModel):
     position: Optional[str] = None
     company: Optional[str] = None
     major: Optional[str] = None
-    graduation_year: Optional[str] = None
+    graduation_year: Optional[int] = None  # indexed Yale graduation year, the one the graduation_year filter uses
     location: Optional[str] = None
     connections: Optional[int] = None
     networking_score: Optional[int] = None
@@ -29,13 +30,27 @@ class CompanyAlumniResponse(BaseModel):
     total_alumni: int
     alumni: List[AlumniProfile]
 
+class IndustryAlumniResponse(BaseModel):
+    industry: str
+    total_alumni: int
+    limit: int
+    offset: int
+    alumni: List[AlumniProfile]
+
 class CareerPathResponse(BaseModel):
     path: str
     count: int
     examples: List[Dict]
 
 # Helper functions
-def filter_alumni_by_company(company_name: str, limit: int = 50) -> List[Dict]:
+def profiles_for_graduation_year(graduation_year: Optional[str]) -> List[Dict]:
+    """Narrow the dataset with the graduation year index ("2020" or "2020-2024")"""
+    try:
+        return milo.alumni_index.profiles_for_graduation_year(graduation_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def filter_alumni_by_company(company_name: str, limit: int = 50, graduation_year: Optional[str] = None) -> List[Dict]:
     """Filter alumni by company name"""
     if not milo.yale_data:
         return []
@@ -43,7 +58,7 @@ def filter_alumni_by_company(company_name: str, limit: int = 50) -> List[Dict]:
     company_lower = company_name.lower()
     filtered = []
     
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         current_company = (alumni.get('current_company_name') or alumni.get('company') or '').lower()
         
         # Flexible matching
@@ -54,7 +69,7 @@ def filter_alumni_by_company(company_name: str, limit: int = 50) -> List[Dict]:
     
     return filtered
 
-def filter_alumni_by_position(position_name: str, limit: int = 50) -> List[Dict]:
+def filter_alumni_by_position(position_name: str, limit: int = 50, graduation_year: Optional[str] = None) -> List[Dict]:
     """Filter alumni by position/role"""
     if not milo.yale_data:
         return []
@@ -62,7 +77,7 @@ def filter_alumni_by_position(position_name: str, limit: int = 50) -> List[Dict]
     position_lower = position_name.lower()
     filtered = []
     
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         current_position = (alumni.get('current_title') or alumni.get('position') or '').lower()
         
         # Check if position matches
@@ -73,7 +88,7 @@ def filter_alumni_by_position(position_name: str, limit: int = 50) -> List[Dict]
     
     return filtered
 
-def filter_alumni_by_major(major_name: str, limit: int = 50) -> List[Dict]:
+def filter_alumni_by_major(major_name: str, limit: int = 50, graduation_year: Optional[str] = None) -> List[Dict]:
     """Filter alumni by major"""
     if not milo.yale_data:
         return []
@@ -81,7 +96,7 @@ def filter_alumni_by_major(major_name: str, limit: int = 50) -> List[Dict]:
     major_lower = major_name.lower()
     filtered = []
     
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         education_details = alumni.get('educations_details', '')
         if major_lower in education_details.lower():
             filtered.append(alumni)
@@ -116,8 +131,8 @@ def get_company_insights(company_name: str) -> Dict[str, Any]:
         location = person.get('city') or person.get('location', 'Unknown')
         locations[location] = locations.get(location, 0) + 1
         
-        # Count graduation years
-        year = milo.extract_graduation_year(person.get('educations_details', ''))
+        # Count graduation years (the indexed column the graduation_year filter uses)
+        year = person.get('graduation_year') or 'Unknown'
         graduation_years[year] = graduation_years.get(year, 0) + 1
     
     return {
@@ -133,22 +148,57 @@ def get_company_insights(company_name: str) -> Dict[str, Any]:
 
 # API Endpoints
 
+def find_company_alumni(company_name: str, limit: int, major: Optional[str], graduation_year: Optional[str]) -> CompanyAlumniResponse:
+    """Scan for alumni at a company; runs in the matching pool, off the event loop"""
+    alumni = filter_alumni_by_company(company_name, limit, graduation_year)
+    
+    # Apply additional filters
+    if major:
+        alumni = [a for a in alumni if major.lower() in milo.extract_major(a.get('educations_details', '')).lower()]
+    
+    # Convert to response format
+    alumni_profiles = []
+    for person in alumni:
+        education_info = milo.extract_detailed_education(person.get('education_details', []))
+        
+        alumni_profiles.append(AlumniProfile(
+            name=person.get('name', 'Yale Alumni'),
+            position=person.get('current_title') or person.get('position'),
+            company=person.get('current_company_name') or person.get('company'),
+            major=education_info.get('major', 'Liberal Arts'),
+            graduation_year=person.get('graduation_year'),
+            location=person.get('city') or person.get('location'),
+            connections=person.get('connections', 0),
+            networking_score=milo.calculate_networking_score(person),
+            career_progression=milo.analyze_career_progression(person.get('experience_history', [])),
+            key_skills=milo.extract_skills_from_experience(person.get('experience_history', [])),
+            experience_history=person.get('experience_history', [])
+        ))
+    
+    return CompanyAlumniResponse(
+        company=company_name,
+        total_alumni=len(alumni_profiles),
+        alumni=alumni_profiles
+    )
+
 @api_app.get("/api/companies/{company_name}/alumni")
 async def get_company_alumni(
     company_name: str,
     limit: int = Query(50, ge=1, le=500),
     major: Optional[str] = None,
-    graduation_year: Optional[str] = None
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
 ):
     """Get Yale alumni at a specific company"""
-    alumni = filter_alumni_by_company(company_name, limit)
-    
-    # Apply additional filters
-    if major:
-        alumni = [a for a in alumni if major.lower() in milo.extract_major(a.get('educations_details', '')).lower()]
+    return await milo.run_matching(find_company_alumni, company_name, limit, major, graduation_year)
+
+def find_position_alumni(position_name: str, limit: int, company: Optional[str], graduation_year: Optional[str]) -> CompanyAlumniResponse:
+    """Scan for alumni in a position; runs in the matching pool, off the event loop"""
+    alumni = filter_alumni_by_position(position_name, limit, graduation_year)
     
-    if graduation_year:
-        alumni = [a for a in alumni if graduation_year in milo.extract_graduation_year(a.get('educations_details', ''))]
+    # Apply company filter
+    if company:
+        company_lower = company.lower()
+        alumni = [a for a in alumni if company_lower in (a.get('current_company_name') or a.get('company') or '').lower()]
     
     # Convert to response format
     alumni_profiles = []
@@ -160,7 +210,7 @@ async def get_company_alumni(
             position=person.get('current_title') or person.get('position'),
             company=person.get('current_company_name') or person.get('company'),
             major=education_info.get('major', 'Liberal Arts'),
-            graduation_year=education_info.get('graduation_year', 'XX'),
+            graduation_year=person.get('graduation_year'),
             location=person.get('city') or person.get('location'),
             connections=person.get('connections', 0),
             networking_score=milo.calculate_networking_score(person),
@@ -170,7 +220,7 @@ async def get_company_alumni(
         ))
     
     return CompanyAlumniResponse(
-        company=company_name,
+        company=position_name,
         total_alumni=len(alumni_profiles),
         alumni=alumni_profiles
     )
@@ -179,10 +229,20 @@ async def get_company_alumni(
 async def get_position_alumni(
     position_name: str,
     limit: int = Query(50, ge=1, le=500),
-    company: Optional[str] = None
+    company: Optional[str] = None,
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
 ):
     """Get Yale alumni in a specific position/role"""
-    alumni = filter_alumni_by_position(position_name, limit)
+    return await milo.run_matching(find_position_alumni, position_name, limit, company, graduation_year)
+
+@api_app.get("/api/companies/{company_name}/insights")
+async def get_company_insights_endpoint(company_name: str):
+    """Get insights about a specific company"""
+    return await milo.run_matching(get_company_insights, company_name)
+
+def find_major_alumni(major_name: str, limit: int, company: Optional[str], graduation_year: Optional[str]) -> CompanyAlumniResponse:
+    """Scan for alumni with a major; runs in the matching pool, off the event loop"""
+    alumni = filter_alumni_by_major(major_name, limit, graduation_year)
     
     # Apply company filter
     if company:
@@ -199,7 +259,7 @@ async def get_position_alumni(
             position=person.get('current_title') or person.get('position'),
             company=person.get('current_company_name') or person.get('company'),
             major=education_info.get('major', 'Liberal Arts'),
-            graduation_year=education_info.get('graduation_year', 'XX'),
+            graduation_year=person.get('graduation_year'),
             location=person.get('city') or person.get('location'),
             connections=person.get('connections', 0),
             networking_score=milo.calculate_networking_score(person),
@@ -209,33 +269,46 @@ async def get_position_alumni(
         ))
     
     return CompanyAlumniResponse(
-        company=position_name,
+        company=major_name,
         total_alumni=len(alumni_profiles),
         alumni=alumni_profiles
     )
 
-@api_app.get("/api/companies/{company_name}/insights")
-async def get_company_insights_endpoint(company_name: str):
-    """Get insights about a specific company"""
-    return get_company_insights(company_name)
-
 @api_app.get("/api/majors/{major_name}/alumni")
 async def get_major_alumni(
     major_name: str,
     limit: int = Query(50, ge=1, le=500),
-    company: Optional[str] = None
+    company: Optional[str] = None,
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
 ):
     """Get Yale alumni with a specific major"""
-    alumni = filter_alumni_by_major(major_name, limit)
+    return await milo.run_matching(find_major_alumni, major_name, limit, company, graduation_year)
+
+def find_industry_alumni(industry: str, limit: int, offset: int, major: Optional[str], company: Optional[str], graduation_year: Optional[str]) -> IndustryAlumniResponse:
+    """Filter and page industry alumni; runs in the matching pool, off the event loop"""
+    canonical_industry = resolve_industry(industry)
+    if not canonical_industry:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown industry '{industry}'. Try one of: {', '.join(CANONICAL_INDUSTRIES)}"
+        )
+    
+    try:
+        alumni = milo.alumni_index.profiles_for_industry(canonical_industry, graduation_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # Apply additional filters
+    if major:
+        alumni = [a for a in alumni if major.lower() in milo.extract_major(a.get('educations_details', '')).lower()]
     
-    # Apply company filter
     if company:
         company_lower = company.lower()
         alumni = [a for a in alumni if company_lower in (a.get('current_company_name') or a.get('company') or '').lower()]
     
-    # Convert to response format
+    # Convert the requested page to response format
     alumni_profiles = []
-    for person in alumni:
+    for person in alumni[offset:offset + limit]:
         education_info = milo.extract_detailed_education(person.get('education_details', []))
         
         alumni_profiles.append(AlumniProfile(
@@ -243,7 +316,7 @@ async def get_major_alumni(
             position=person.get('current_title') or person.get('position'),
             company=person.get('current_company_name') or person.get('company'),
             major=education_info.get('major', 'Liberal Arts'),
-            graduation_year=education_info.get('graduation_year', 'XX'),
+            graduation_year=person.get('graduation_year'),
             location=person.get('city') or person.get('location'),
             connections=person.get('connections', 0),
             networking_score=milo.calculate_networking_score(person),
@@ -252,28 +325,35 @@ async def get_major_alumni(
             experience_history=person.get('experience_history', [])
         ))
     
-    return CompanyAlumniResponse(
-        company=major_name,
-        total_alumni=len(alumni_profiles),
+    return IndustryAlumniResponse(
+        industry=canonical_industry,
+        total_alumni=len(alumni),
+        limit=limit,
+        offset=offset,
         alumni=alumni_profiles
     )
 
-@api_app.get("/api/search")
-async def search_alumni(
-    q: str = Query(..., description="Search query"),
-    company: Optional[str] = None,
-    position: Optional[str] = None,
+@api_app.get("/api/industries/{industry}/alumni")
+async def get_industry_alumni(
+    industry: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
     major: Optional[str] = None,
-    limit: int = Query(50, ge=1, le=500)
+    company: Optional[str] = None,
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
 ):
-    """Search alumni with multiple filters"""
+    """Get Yale alumni in an industry (accepts abbreviations like IB, PE, VC or tech)"""
+    return await milo.run_matching(find_industry_alumni, industry, limit, offset, major, company, graduation_year)
+
+def search_alumni_scan(q: str, company: Optional[str], position: Optional[str], major: Optional[str], graduation_year: Optional[str], limit: int) -> Dict[str, Any]:
+    """Apply the search filters; runs in the matching pool, off the event loop"""
     if not milo.yale_data:
         return {"results": [], "total": 0}
     
     results = []
     query_lower = q.lower()
     
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         # Check if query matches name, company, or position
         name = (alumni.get('name') or '').lower()
         company_name = (alumni.get('current_company_name') or alumni.get('company') or '').lower()
@@ -297,6 +377,18 @@ async def search_alumni(
     
     return {"results": results, "total": len(results)}
 
+@api_app.get("/api/search")
+async def search_alumni(
+    q: str = Query(..., description="Search query"),
+    company: Optional[str] = None,
+    position: Optional[str] = None,
+    major: Optional[str] = None,
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024"),
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Search alumni with multiple filters"""
+    return await milo.run_matching(search_alumni_scan, q, company, position, major, graduation_year, limit)
+
 @api_app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
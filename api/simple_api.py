@@ -1,7 +1,8 @@
-from fastapi import FastAPI, Query
+from fastapi import FastAPI, HTTPException, Query
 from typing import List, Optional
 from pydantic import BaseModel
 from milo_ai import MiloAI
+from alumni_index import CANONICAL_INDUSTRIES, resolve_industry
 
 # Create a simple API app
 simple_api = FastAPI(title="Yale Alumni Simple API")
@@ -9,18 +10,24 @@ simple_api = FastAPI(title="Yale Alumni Simple API")
 # Initialize MiloAI
 milo = MiloAI()
 
+def profiles_for_graduation_year(graduation_year: Optional[str]) -> List[dict]:
+    """Narrow the dataset with the graduation year index ("2020" or "2020-2024")"""
+    try:
+        return milo.alumni_index.profiles_for_graduation_year(graduation_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 class AlumniProfile(BaseModel):
     name: str
     position: Optional[str] = None
     company: Optional[str] = None
     major: Optional[str] = None
-    graduation_year: Optional[str] = None
+    graduation_year: Optional[int] = None  # indexed Yale graduation year, the one the graduation_year filter uses
     location: Optional[str] = None
     connections: Optional[int] = None
 
-@simple_api.get("/companies/{company_name}/alumni")
-async def get_company_alumni(company_name: str, limit: int = Query(50, ge=1, le=500)):
-    """Get Yale alumni at a specific company"""
+def find_company_alumni(company_name: str, limit: int, graduation_year: Optional[str]) -> dict:
+    """Scan for alumni at a company; runs in the matching pool, off the event loop"""
     if not milo.yale_data:
         return {"company": company_name, "total_alumni": 0, "alumni": []}
     
@@ -28,7 +35,7 @@ async def get_company_alumni(company_name: str, limit: int = Query(50, ge=1, le=
     filtered = []
     
     # Use the same data source as the main analysis
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         current_company = (alumni.get('current_company_name') or alumni.get('company') or '').lower()
         
         # Use the same flexible matching logic as the main analysis
@@ -54,7 +61,7 @@ async def get_company_alumni(company_name: str, limit: int = Query(50, ge=1, le=
                 position=alumni.get('current_title') or alumni.get('position'),
                 company=alumni.get('current_company_name') or alumni.get('company'),
                 major=education_info.get('major', 'Liberal Arts'),
-                graduation_year=education_info.get('graduation_year', 'XX'),
+                graduation_year=alumni.get('graduation_year'),
                 location=alumni.get('city') or alumni.get('location'),
                 connections=alumni.get('connections', 0)
             ))
@@ -68,16 +75,24 @@ async def get_company_alumni(company_name: str, limit: int = Query(50, ge=1, le=
         "alumni": filtered
     }
 
-@simple_api.get("/positions/{position_name}/alumni")
-async def get_position_alumni(position_name: str, limit: int = Query(50, ge=1, le=500)):
-    """Get Yale alumni in a specific position"""
+@simple_api.get("/companies/{company_name}/alumni")
+async def get_company_alumni(
+    company_name: str,
+    limit: int = Query(50, ge=1, le=500),
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
+):
+    """Get Yale alumni at a specific company"""
+    return await milo.run_matching(find_company_alumni, company_name, limit, graduation_year)
+
+def find_position_alumni(position_name: str, limit: int, graduation_year: Optional[str]) -> dict:
+    """Scan for alumni in a position; runs in the matching pool, off the event loop"""
     if not milo.yale_data:
         return {"position": position_name, "total_alumni": 0, "alumni": []}
     
     position_lower = position_name.lower()
     filtered = []
     
-    for alumni in milo.yale_data:
+    for alumni in profiles_for_graduation_year(graduation_year):
         current_position = (alumni.get('current_title') or alumni.get('position') or '').lower()
         
         if position_lower in current_position or any(word in current_position for word in position_lower.split()):
@@ -88,7 +103,7 @@ async def get_position_alumni(position_name: str, limit: int = Query(50, ge=1, l
                 position=alumni.get('current_title') or alumni.get('position'),
                 company=alumni.get('current_company_name') or alumni.get('company'),
                 major=education_info.get('major', 'Liberal Arts'),
-                graduation_year=education_info.get('graduation_year', 'XX'),
+                graduation_year=alumni.get('graduation_year'),
                 location=alumni.get('city') or alumni.get('location'),
                 connections=alumni.get('connections', 0)
             ))
@@ -102,9 +117,75 @@ async def get_position_alumni(position_name: str, limit: int = Query(50, ge=1, l
         "alumni": filtered
     }
 
-@simple_api.get("/companies/{company_name}/insights")
-async def get_company_insights(company_name: str):
-    """Get insights about a specific company"""
+@simple_api.get("/positions/{position_name}/alumni")
+async def get_position_alumni(
+    position_name: str,
+    limit: int = Query(50, ge=1, le=500),
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
+):
+    """Get Yale alumni in a specific position"""
+    return await milo.run_matching(find_position_alumni, position_name, limit, graduation_year)
+
+def find_industry_alumni(industry: str, limit: int, offset: int, major: Optional[str], company: Optional[str], graduation_year: Optional[str]) -> dict:
+    """Filter and page industry alumni; runs in the matching pool, off the event loop"""
+    canonical_industry = resolve_industry(industry)
+    if not canonical_industry:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown industry '{industry}'. Try one of: {', '.join(CANONICAL_INDUSTRIES)}"
+        )
+    
+    try:
+        candidates = milo.alumni_index.profiles_for_industry(canonical_industry, graduation_year)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    matched = []
+    for alumni in candidates:
+        education_info = milo.extract_detailed_education(alumni.get('education_details', []))
+        
+        if major and major.lower() not in (education_info.get('major') or '').lower():
+            continue
+        if company and company.lower() not in (alumni.get('current_company_name') or alumni.get('company') or '').lower():
+            continue
+        
+        matched.append((alumni, education_info))
+    
+    page = [
+        AlumniProfile(
+            name=alumni.get('name', 'Yale Alumni'),
+            position=alumni.get('current_title') or alumni.get('position'),
+            company=alumni.get('current_company_name') or alumni.get('company'),
+            major=education_info.get('major', 'Liberal Arts'),
+            graduation_year=alumni.get('graduation_year'),
+            location=alumni.get('city') or alumni.get('location'),
+            connections=alumni.get('connections', 0)
+        )
+        for alumni, education_info in matched[offset:offset + limit]
+    ]
+    
+    return {
+        "industry": canonical_industry,
+        "total_alumni": len(matched),
+        "limit": limit,
+        "offset": offset,
+        "alumni": page
+    }
+
+@simple_api.get("/industries/{industry}/alumni")
+async def get_industry_alumni(
+    industry: str,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    major: Optional[str] = None,
+    company: Optional[str] = None,
+    graduation_year: Optional[str] = Query(None, description="Graduation year or range, e.g. 2020-2024")
+):
+    """Get Yale alumni in an industry (accepts abbreviations like IB, PE, VC or tech)"""
+    return await milo.run_matching(find_industry_alumni, industry, limit, offset, major, company, graduation_year)
+
+def build_company_insights(company_name: str) -> dict:
+    """Aggregate hiring trends for a company; runs in the matching pool, off the event loop"""
     if not milo.yale_data:
         return {"company": company_name, "total_alumni": 0, "insights": "No data available"}
     
@@ -147,6 +228,11 @@ async def get_company_insights(company_name: str):
         }
     }
 
+@simple_api.get("/companies/{company_name}/insights")
+async def get_company_insights(company_name: str):
+    """Get insights about a specific company"""
+    return await milo.run_matching(build_company_insights, company_name)
+
 @simple_api.get("/health")
 async def health_check():
     """Health check endpoint"""
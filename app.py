@@ -1,12 +1,16 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from milo_ai import MiloAI
+from chat_streams import ChatStreamRegistry, parse_event_id
+import sse_coalescer
 import uvicorn
+import gc
 import os
 import json
+import time
 from typing import Optional, List
 # Import will be done after app creation to avoid circular imports
 
@@ -53,14 +57,44 @@ except Exception as e:
     class DummyMilo:
         async def analyze_career(self, user_input: str):
             return {"error": "Milo AI not available", "message": "Backend is running but AI service is unavailable"}
+        
+        async def stream_career_analysis(self, user_input: str):
+            yield {"type": "error", "data": "Milo AI not available"}
     milo = DummyMilo()
 
+# Chat replies generate in background tasks so a dropped connection can resume them (see chat_streams.py)
+chat_streams = ChatStreamRegistry()
+
+@app.on_event("startup")
+async def freeze_loaded_data():
+    """Keep the alumni datasets loaded at import out of the collector's generations
+
+    Runs once, after every MiloAI instance (this module's and the mounted API's) has loaded its data.
+    Startup garbage is collected first so only live objects are frozen; without this, each full
+    collection walks every profile while holding the GIL, about a second at 100k profiles.
+    """
+    gc.collect()
+    gc.freeze()
+    print(f"🧊 Froze {gc.get_freeze_count()} startup objects out of garbage collection")
+
+@app.on_event("shutdown")
+async def flush_sessions():
+    """Write queued chat session changes to the session backend before the worker exits"""
+    if hasattr(getattr(milo, 'conversation_sessions', None), 'flush'):
+        await milo.conversation_sessions.flush()
+
 class CareerRequest(BaseModel):
     user_input: str
 
+class BatchCareerRequest(BaseModel):
+    inputs: List[str]
+    concurrency: Optional[int] = None
+
 class ChatMessage(BaseModel):
     message: str
     session_id: Optional[str] = "default"
+    coalesce_ms: Optional[float] = None  # SSE frame window; 0 sends every token as its own frame
+    coalesce_bytes: Optional[int] = None
 
 class ChatHistoryResponse(BaseModel):
     messages: List[dict]
@@ -89,46 +123,176 @@ async def health_check():
         "features": ["career_analysis", "streaming_chat", "session_management"]
     }
 
+@app.get("/metrics")
+async def get_metrics():
+    """Performance counters for the analysis pipeline"""
+    metrics = {}
+    if hasattr(milo, 'get_query_stats'):
+        metrics["query_fast_path"] = milo.get_query_stats()
+    if getattr(milo, 'llm_cache', None):
+        metrics["llm_cache"] = milo.llm_cache.get_stats()
+    if hasattr(milo, 'get_pipeline_stats'):
+        metrics["analyze_pipeline"] = milo.get_pipeline_stats()
+    if hasattr(milo, 'get_matching_stats'):
+        metrics["matching_pool"] = milo.get_matching_stats()
+    if hasattr(milo, 'get_coalescing_stats'):
+        metrics["request_coalescing"] = milo.get_coalescing_stats()
+    if hasattr(milo, 'get_context_block_stats'):
+        metrics["context_blocks"] = milo.get_context_block_stats()
+    if hasattr(milo, 'get_plan_prompt_stats'):
+        metrics["plan_prompt"] = milo.get_plan_prompt_stats()
+    if hasattr(milo, 'get_fallback_stats'):
+        metrics["fallbacks"] = milo.get_fallback_stats()
+    if hasattr(milo, 'get_chat_prompt_stats'):
+        metrics["chat_prompt"] = milo.get_chat_prompt_stats()
+    if hasattr(milo, 'get_chat_retrieval_stats'):
+        metrics["chat_retrieval"] = milo.get_chat_retrieval_stats()
+    if hasattr(milo, 'get_session_stats'):
+        metrics["chat_sessions"] = milo.get_session_stats()
+    if getattr(milo, 'model_router', None):
+        metrics["model_routing"] = milo.model_router.get_stats()
+    if hasattr(getattr(milo, 'client', None), 'get_stats'):
+        metrics["llm_client"] = milo.client.get_stats()
+    metrics["chat_stream"] = sse_coalescer.get_stats()
+    if hasattr(milo, 'get_stream_cancellation_stats'):
+        metrics["stream_cancellations"] = milo.get_stream_cancellation_stats()
+    metrics["chat_stream_resume"] = chat_streams.get_stats()
+    return metrics
+
 @app.post("/analyze")
 async def analyze_career(request: CareerRequest):
     """Analyze career goals and provide actionable plan"""
     result = await milo.analyze_career(request.user_input)
     return result
 
+@app.post("/analyze/stream")
+async def analyze_career_stream(request: CareerRequest):
+    """Stream the career analysis as typed Server-Sent Events, in order: processed_query,
+    analysis, target_company_alumni, career_paths, people_to_contact, action_plan_delta (repeated), done"""
+    async def generate_events():
+        try:
+            async for event in milo.stream_career_analysis(request.user_input):
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'type': 'error', 'data': f'Error in analysis stream: {str(e)}'})}\n\n"
+    
+    return StreamingResponse(
+        generate_events(),
+        media_type="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Content-Type": "text/event-stream",
+        }
+    )
+
+@app.post("/analyze/batch")
+async def analyze_career_batch(request: BatchCareerRequest):
+    """Analyze a cohort of inputs, streaming one NDJSON line {index, user_input, result} per input
+    as it finishes, then a final {"done": true, ...} summary line"""
+    max_inputs = int(os.getenv("MILO_BATCH_MAX_INPUTS", "500"))
+    if len(request.inputs) > max_inputs:
+        raise HTTPException(status_code=400, detail=f"Batch has {len(request.inputs)} inputs, the limit is {max_inputs}")
+    if not hasattr(milo, 'analyze_batch'):
+        raise HTTPException(status_code=503, detail="Milo AI not available")
+    
+    async def generate_lines():
+        started = time.perf_counter()
+        completed = failed = 0
+        try:
+            async for item in milo.analyze_batch(request.inputs, request.concurrency):
+                completed += 1
+                failed += 1 if 'error' in item['result'] else 0
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Error in batch analysis: {str(e)}"}) + "\n"
+        yield json.dumps({
+            "done": True,
+            "total": len(request.inputs),
+            "completed": completed,
+            "failed": failed,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }) + "\n"
+    
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
 # ===== NEW STREAMING CHAT ENDPOINTS =====
 
+def sse_event(response_id: str, offset: int, payload: dict) -> str:
+    """One chat SSE event; the id lets a reconnecting client resume after `offset` reply characters"""
+    return f"id: {response_id}:{offset}\ndata: {json.dumps(payload)}\n\n"
+
+async def stored_reply_events(response_id: str, reply: str, offset: int):
+    """Replay the rest of a finished reply from session history"""
+    if offset < len(reply):
+        yield sse_event(response_id, len(reply), {'content': reply[offset:]})
+    yield sse_event(response_id, len(reply), {'done': True, 'response_id': response_id})
+
 @app.post("/chat/stream")
-async def stream_chat(chat_message: ChatMessage):
-    """Stream chat response using the new 6-step conversation flow"""
+async def stream_chat(chat_message: ChatMessage, last_event_id: Optional[str] = Header(None)):
+    """Stream chat response using the new 6-step conversation flow
+    
+    Events carry `id: <response_id>:<offset>`. Sending the same request again with a Last-Event-ID
+    header resumes that reply after the offset instead of generating a new one.
+    """
+    headers = {
+        "Cache-Control": "no-cache",
+        "Connection": "keep-alive",
+        "Content-Type": "text/event-stream",
+    }
+    window_ms, max_bytes = sse_coalescer.coalescing_settings(chat_message.coalesce_ms, chat_message.coalesce_bytes)
+    
+    stream, offset = None, 0
+    if last_event_id:
+        resumed = chat_streams.resume(last_event_id, chat_message.session_id)
+        reply = None
+        if resumed is not None:
+            stream, message_seq, offset = resumed
+            if stream is None:
+                reply = await milo.get_stored_reply(chat_message.session_id, message_seq)
+        if stream is None and reply is None:
+            raise HTTPException(status_code=404, detail="Reply can no longer be resumed; send the message again without Last-Event-ID")
+        if stream is None:
+            response_id, _ = parse_event_id(last_event_id)
+            return StreamingResponse(stored_reply_events(response_id, reply, offset), media_type="text/plain", headers=headers)
+    
     try:
+        if stream is None:
+            stream = chat_streams.start(
+                chat_message.session_id,
+                lambda turn_info: milo.stream_chat_response(chat_message.message, chat_message.session_id, turn_info)
+            )
+        
         async def generate_response():
+            sent = offset
+            chat_streams.attach(stream)
             try:
-                async for chunk in milo.stream_chat_response(
-                    chat_message.message, 
-                    chat_message.session_id
-                ):
+                # First token goes out at once; the rest are batched into frames per window / byte threshold
+                async for chunk in sse_coalescer.coalesce_deltas(stream.follow(sent), window_ms, max_bytes):
                     # Format as Server-Sent Events
-                    yield f"data: {json.dumps({'content': chunk})}\n\n"
+                    sent += len(chunk)
+                    yield sse_event(stream.response_id, sent, {'content': chunk})
                 
                 # Send completion signal
-                yield f"data: {json.dumps({'done': True})}\n\n"
+                if stream.error:
+                    yield sse_event(stream.response_id, sent, {'error': stream.error})
+                else:
+                    yield sse_event(stream.response_id, sent, {'done': True, 'response_id': stream.response_id})
                 
             except Exception as e:
                 error_msg = f"Error in chat stream: {str(e)}"
                 yield f"data: {json.dumps({'error': error_msg})}\n\n"
+            finally:
+                # Without a client the reply keeps generating for the resume grace period, then is cancelled
+                chat_streams.detach(stream)
         
         return StreamingResponse(
             generate_response(),
             media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Content-Type": "text/event-stream",
-            }
+            headers=headers
         )
         
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Streaming error: {str(e)}")
 
 @app.get("/chat/history/{session_id}")
@@ -136,46 +300,46 @@ async def get_chat_history(session_id: str = "default"):
     """Get chat history for a session"""
     try:
         messages = await milo.get_chat_history(session_id)
-        session_info = milo.get_session_info(session_id)
-        
-        return ChatHistoryResponse(
-            messages=messages,
-            session_info=session_info
-        )
+        session_info = await milo.get_session_info(session_id)
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Error getting chat history: {str(e)}")
+    
+    # Reading a session never creates one
+    if messages is None or session_info is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    
+    return ChatHistoryResponse(
+        messages=messages,
+        session_info=session_info
+    )
 
 @app.get("/chat/session/{session_id}")
 async def get_session_info(session_id: str = "default"):
     """Get session information"""
     try:
-        session_info = milo.get_session_info(session_id)
-        return SessionInfoResponse(**session_info)
+        session_info = await milo.get_session_info(session_id)
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Error getting session info: {str(e)}")
+    
+    if session_info is None:
+        raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+    return SessionInfoResponse(**session_info)
 
 @app.delete("/chat/session/{session_id}")
 async def clear_session(session_id: str = "default"):
     """Clear a conversation session"""
     try:
-        milo.clear_session(session_id)
+        await milo.clear_session(session_id)
         return {"message": f"Session {session_id} cleared successfully"}
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Error clearing session: {str(e)}")
 
 @app.get("/chat/sessions")
 async def list_sessions():
     """List all active sessions"""
     try:
-        sessions = {}
-        for session_id in milo.conversation_sessions.keys():
-            sessions[session_id] = milo.get_session_info(session_id)
-        return {"sessions": sessions}
+        return {"sessions": milo.list_sessions()}
     except Exception as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=500, detail=f"Error listing sessions: {str(e)}")
 
 # Mount the API endpoints
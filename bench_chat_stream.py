@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Chat Streaming Benchmark
+Opens concurrent /chat/stream requests against a running backend and compares SSE frame coalescing settings.
+
+Usage:
+    MILO_LLM_PROVIDER=fake uvicorn app:app --port 8001
+    python bench_chat_stream.py --url http://localhost:8001 --streams 200 --windows 0,40
+
+For each window (milliseconds, 0 = one frame per token) it reports time to first token,
+frames per response and server CPU per stream, read from the process CPU time in /metrics.
+"""
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] if ordered else 0.0
+
+
+async def run_stream(client: httpx.AsyncClient, url: str, window_ms: float) -> dict:
+    """One chat turn on a fresh session; returns time to first content frame and frame count"""
+    started = time.perf_counter()
+    first_token_ms, frames = None, 0
+    payload = {"message": "I love data science and writing", "session_id": f"bench-{uuid.uuid4().hex[:12]}", "coalesce_ms": window_ms}
+    async with client.stream("POST", f"{url}/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: ") or '"content"' not in line:
+                continue
+            frames += 1
+            if first_token_ms is None:
+                first_token_ms = (time.perf_counter() - started) * 1000
+    return {"first_token_ms": first_token_ms or 0.0, "frames": frames}
+
+
+async def run_window(url: str, streams: int, concurrency: int, window_ms: float) -> dict:
+    limit = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def bounded():
+            async with limit:
+                return await run_stream(client, url, window_ms)
+
+        cpu_before = (await client.get(f"{url}/metrics")).json()["chat_stream"]["process_cpu_s"]
+        results = await asyncio.gather(*(bounded() for _ in range(streams)))
+        cpu_after = (await client.get(f"{url}/metrics")).json()["chat_stream"]["process_cpu_s"]
+
+    first_token = [result["first_token_ms"] for result in results]
+    return {
+        "window_ms": window_ms,
+        "streams": streams,
+        "frames_per_response": round(sum(result["frames"] for result in results) / streams, 1),
+        "ttft_p50_ms": round(percentile(first_token, 50), 1),
+        "ttft_p95_ms": round(percentile(first_token, 95), 1),
+        "server_cpu_ms_per_stream": round((cpu_after - cpu_before) * 1000 / streams, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /chat/stream with different SSE coalescing windows")
+    parser.add_argument("--url", default="http://localhost:8001", help="Backend base URL")
+    parser.add_argument("--streams", type=int, default=100, help="Chat streams per window")
+    parser.add_argument("--concurrency", type=int, default=100, help="Streams open at once")
+    parser.add_argument("--windows", default="0,40", help="Comma-separated coalescing windows in ms")
+    args = parser.parse_args()
+
+    for window_ms in [float(value) for value in args.windows.split(",")]:
+        print(asyncio.run(run_window(args.url.rstrip("/"), args.streams, args.concurrency, window_ms)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Event Loop Latency Benchmark
+Measures /chat/stream token cadence on its own and while broad alumni searches run on the same worker.
+
+Usage:
+    python bench_event_loop.py --make-dataset 100000 --dir /tmp/milo-bench
+    cd /tmp/milo-bench && MILO_LLM_PROVIDER=fake uvicorn --app-dir /path/to/milo-ai app:app --port 8001
+    python bench_event_loop.py --url http://localhost:8001 --streams 20 --searchers 8
+
+The server loads sample_data.json from its working directory, so --make-dataset writes a synthetic
+dataset of that size there. Chat streams use one SSE frame per token (coalesce_ms 0), and the report
+gives the gap between consecutive frames at p50 / p95 / p99 / max. With the fake provider the
+expected gap is 1000 / MILO_FAKE_LLM_TOKENS_PER_S ms (20 ms by default). Load is a mix of /api
+industry, company and position scans, company insights and /analyze runs.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+import httpx
+
+COMPANIES = [
+    ("Goldman Sachs", "Investment Banking"), ("Morgan Stanley", "Investment Banking"), ("J.P. Morgan", "Banking"),
+    ("Blackstone", "Private Equity"), ("Sequoia Capital", "Venture Capital"), ("Bridgewater Associates", "Investment Management"),
+    ("Google", "Technology"), ("Microsoft", "Computer Software"), ("Meta", "Internet"), ("Apple", "Consumer Electronics"),
+    ("McKinsey & Company", "Management Consulting"), ("Bain & Company", "Management Consulting"), ("Boston Consulting Group", "Management Consulting"),
+    ("Mayo Clinic", "Hospital & Health Care"), ("Pfizer", "Pharmaceuticals"), ("Skadden", "Law Practice"),
+    ("U.S. Department of State", "Government Administration"), ("The New York Times", "Newspapers & Media"),
+    ("Teach For America", "Education Management"), ("Gates Foundation", "Philanthropy"),
+]
+TITLES = ["Analyst", "Associate", "Software Engineer", "Product Manager", "Consultant", "Vice President",
+          "Data Scientist", "Research Fellow", "Attorney", "Policy Advisor", "Reporter", "Director"]
+MAJORS = ["Economics", "Computer Science", "Political Science", "History", "Mathematics", "Molecular Biology",
+          "English", "Statistics and Data Science", "Global Affairs", "Psychology"]
+
+LOAD_PATHS = [
+    "/api/industries/finance/alumni?limit=500",
+    "/api/industries/tech/alumni?limit=500&major=Economics",
+    "/api/companies/Goldman Sachs/alumni?limit=100",
+    "/api/positions/Analyst/alumni?limit=100",
+    "/api/companies/Google/insights",
+]
+ANALYZE_INPUTS = ["I want to work at Google", "investment banking", "I like economics and helping people"]
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * pct / 100), len(ordered) - 1)] if ordered else 0.0
+
+
+def make_dataset(count: int, directory: str, seed: int = 7):
+    """Write `count` synthetic alumni profiles to <directory>/sample_data.json"""
+    rng = random.Random(seed)
+    profiles = []
+    for index in range(count):
+        company, industry = rng.choice(COMPANIES)
+        title, major = rng.choice(TITLES), rng.choice(MAJORS)
+        year = rng.randint(1980, 2024)
+        profiles.append({
+            "person_id": f"bench_{index}",
+            "name": f"Yale Alumnus {index}",
+            "position": title, "company": company,
+            "location": "New York, NY",
+            "about": f"Yale {major} graduate working as {title} at {company}",
+            "connections": rng.randint(50, 500), "followers": rng.randint(0, 5000), "recommendations_count": rng.randint(0, 10),
+            "educations_details": f"Yale University - {major}",
+            "current_company_name": company, "current_title": title,
+            "experience_history": [
+                {"company": company, "title": title, "start_date": str(year + 2), "end_date": "Present", "description": ""},
+                {"company": rng.choice(COMPANIES)[0], "title": "Intern", "start_date": str(year), "end_date": str(year), "description": ""}
+            ],
+            "education_details": [
+                {"institution": "Yale University", "degree": "Bachelor of Arts", "field": major,
+                 "start_year": str(year - 4), "end_year": str(year)}
+            ],
+            "company_industry": industry, "company_size": "10000+", "yale_alumni_count": rng.randint(10, 500)
+        })
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "sample_data.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(profiles, f)
+    print(f"✅ Wrote {count} synthetic profiles to {path}")
+
+
+async def run_stream(client: httpx.AsyncClient, url: str) -> list:
+    """One chat turn on a fresh session with one frame per token; returns the gaps between frames in ms"""
+    gaps, last = [], None
+    payload = {"message": "I love data science and writing", "session_id": f"bench-{uuid.uuid4().hex[:12]}", "coalesce_ms": 0}
+    async with client.stream("POST", f"{url}/chat/stream", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: ") or '"content"' not in line:
+                continue
+            now = time.perf_counter()
+            if last is not None:
+                gaps.append((now - last) * 1000)
+            last = now
+    return gaps
+
+
+async def run_load(client: httpx.AsyncClient, url: str, stop: asyncio.Event, counts: dict, rng: random.Random):
+    """Issue broad searches and /analyze runs back to back until stopped"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        if rng.random() < 0.2:
+            response = await client.post(f"{url}/analyze", json={"user_input": rng.choice(ANALYZE_INPUTS)})
+        else:
+            response = await client.get(f"{url}{rng.choice(LOAD_PATHS)}")
+        counts["requests"] += 1
+        counts["errors"] += response.status_code >= 400
+        counts["ms"] += (time.perf_counter() - started) * 1000
+
+
+async def run_phase(url: str, streams: int, searchers: int) -> dict:
+    stop, counts, rng = asyncio.Event(), {"requests": 0, "errors": 0, "ms": 0.0}, random.Random(11)
+    async with httpx.AsyncClient(timeout=300, limits=httpx.Limits(max_connections=streams + searchers + 2)) as client:
+        load = [asyncio.create_task(run_load(client, url, stop, counts, rng)) for _ in range(searchers)]
+        try:
+            await asyncio.sleep(0.5 if searchers else 0)
+            results = await asyncio.gather(*(run_stream(client, url) for _ in range(streams)))
+        finally:
+            stop.set()
+            await asyncio.gather(*load, return_exceptions=True)
+        matching_pool = (await client.get(f"{url}/metrics")).json().get("matching_pool", {})
+
+    gaps = [gap for result in results for gap in result]
+    return {
+        "searchers": searchers,
+        "streams": streams,
+        "gap_p50_ms": round(percentile(gaps, 50), 1),
+        "gap_p95_ms": round(percentile(gaps, 95), 1),
+        "gap_p99_ms": round(percentile(gaps, 99), 1),
+        "gap_max_ms": round(max(gaps), 1) if gaps else 0.0,
+        "load_requests": counts["requests"],
+        "load_errors": counts["errors"],
+        "load_avg_ms": round(counts["ms"] / counts["requests"], 1) if counts["requests"] else 0.0,
+        "matching_max_queue_wait_ms": matching_pool.get("max_queue_wait_ms")
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure /chat/stream token gaps with and without concurrent heavy searches")
+    parser.add_argument("--url", default="http://localhost:8001", help="Backend base URL")
+    parser.add_argument("--streams", type=int, default=20, help="Concurrent chat streams per phase")
+    parser.add_argument("--searchers", type=int, default=8, help="Concurrent search / analyze clients in the loaded phase")
+    parser.add_argument("--make-dataset", type=int, metavar="N", help="Write N synthetic profiles and exit")
+    parser.add_argument("--dir", default=".", help="Directory for --make-dataset")
+    args = parser.parse_args()
+
+    if args.make_dataset:
+        make_dataset(args.make_dataset, args.dir)
+        return
+
+    url = args.url.rstrip("/")
+    for searchers in (0, args.searchers):
+        print(asyncio.run(run_phase(url, args.streams, searchers)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Resumable chat streams: each reply is generated in a background task into a short-lived buffer.
+
+``/chat/stream`` no longer generates inside the HTTP response. It starts a
+``ChatStream``, which runs the generation and buffers the text, and the
+response follows that buffer. SSE events carry ``id: <response_id>:<offset>``,
+where the offset is the number of reply characters sent so far. A client that
+loses its connection can send the same request again with a ``Last-Event-ID``
+header and receive the rest of the reply from that offset:
+- while the reply is still generating, from the live buffer;
+- for ``MILO_STREAM_BUFFER_S`` after it finishes, from the buffer;
+- for ``MILO_STREAM_RESUME_TTL_S`` after that, from the assistant message
+  stored in the session.
+
+A stream left with no client for ``MILO_STREAM_RESUME_GRACE_S`` is cancelled.
+That stops the upstream generation and stores the partial reply. Streams live
+in the worker that started them, so resuming needs the reconnect to reach the
+same worker.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncGenerator, Callable, Dict, Optional, Tuple
+
+
+class ChatStream:
+    """One reply being generated: its buffered text, completion state and connected clients"""
+
+    def __init__(self, response_id: str, session_id: str):
+        self.response_id = response_id
+        self.session_id = session_id
+        self.text = ""
+        self.done = False
+        self.error: Optional[str] = None
+        self.turn_info: dict = {}  # filled by the generator, e.g. the stored message's seq
+        self.task: Optional[asyncio.Task] = None
+        self.consumers = 0
+        self.finished_at: Optional[float] = None
+        self._abandon_handle = None
+        self._changed = asyncio.Event()
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def append(self, delta: str):
+        self.text += delta
+        self._notify()
+
+    def finish(self, error: Optional[str] = None):
+        self.done = True
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._notify()
+
+    async def follow(self, offset: int = 0) -> AsyncGenerator[str, None]:
+        """Yield the reply from `offset` on: what is buffered at once, then new text as it is generated"""
+        while True:
+            changed = self._changed
+            if offset < len(self.text):
+                chunk, offset = self.text[offset:], len(self.text)
+                yield chunk
+                continue
+            if self.done:
+                return
+            await changed.wait()
+
+
+def parse_event_id(event_id: str) -> Optional[Tuple[str, int]]:
+    """Split a `<response_id>:<offset>` event id, or None if it is malformed"""
+    response_id, _, offset = (event_id or '').strip().rpartition(':')
+    if not response_id or not offset.isdigit():
+        return None
+    return response_id, int(offset)
+
+
+class ChatStreamRegistry:
+    """Running and recently finished chat streams in this worker, by response id"""
+
+    def __init__(self, grace_seconds: float = None, buffer_seconds: float = None,
+                 resume_ttl_seconds: float = None, max_finished: int = None):
+        self.grace_seconds = grace_seconds if grace_seconds is not None else float(os.getenv('MILO_STREAM_RESUME_GRACE_S', '15'))
+        self.buffer_seconds = buffer_seconds if buffer_seconds is not None else float(os.getenv('MILO_STREAM_BUFFER_S', '60'))
+        self.resume_ttl_seconds = resume_ttl_seconds if resume_ttl_seconds is not None else float(os.getenv('MILO_STREAM_RESUME_TTL_S', '3600'))
+        self.max_finished = max_finished or int(os.getenv('MILO_STREAM_RESUME_MAX', '10000'))
+
+        self._streams: Dict[str, ChatStream] = {}
+        # Finished streams whose buffer was dropped: response id → (session_id, message seq, finished_at)
+        self._finished = OrderedDict()
+        self.stats = {
+            'started': 0, 'completed': 0, 'failed': 0, 'abandoned': 0,
+            'resumed_live': 0, 'resumed_buffer': 0, 'resumed_stored': 0, 'resume_misses': 0
+        }
+
+    def start(self, session_id: str, generate: Callable[[dict], AsyncGenerator[str, None]]) -> ChatStream:
+        """Start generating a reply in the background; `generate(turn_info)` yields its text"""
+        self.expire()
+        stream = ChatStream(uuid.uuid4().hex, session_id)
+        stream.task = asyncio.create_task(self._run(stream, generate(stream.turn_info)))
+        self._streams[stream.response_id] = stream
+        self.stats['started'] += 1
+        return stream
+
+    async def _run(self, stream: ChatStream, deltas: AsyncGenerator[str, None]):
+        try:
+            async for delta in deltas:
+                if delta:
+                    stream.append(delta)
+        except asyncio.CancelledError:
+            stream.finish(error="Chat stream cancelled")
+            raise
+        except Exception as e:
+            self.stats['failed'] += 1
+            stream.finish(error=f"Error in chat stream: {str(e)}")
+            return
+        self.stats['completed'] += 1
+        stream.finish()
+
+    def attach(self, stream: ChatStream):
+        stream.consumers += 1
+        if stream._abandon_handle is not None:
+            stream._abandon_handle.cancel()
+            stream._abandon_handle = None
+
+    def detach(self, stream: ChatStream):
+        """A client went away; cancel the generation if nobody reconnects within the grace period"""
+        stream.consumers -= 1
+        if stream.consumers > 0 or stream.done:
+            return
+        if self.grace_seconds <= 0:
+            self._abandon(stream)
+        else:
+            stream._abandon_handle = asyncio.get_running_loop().call_later(self.grace_seconds, self._abandon, stream)
+
+    def _abandon(self, stream: ChatStream):
+        stream._abandon_handle = None
+        if stream.consumers == 0 and not stream.done and stream.task is not None:
+            self.stats['abandoned'] += 1
+            stream.task.cancel()
+
+    def resume(self, event_id: str, session_id: str) -> Optional[Tuple[Optional[ChatStream], Optional[int], int]]:
+        """Look up a Last-Event-ID: (buffered stream, None, offset), (None, stored message seq, offset) or None"""
+        self.expire()
+        parsed = parse_event_id(event_id)
+        if parsed is not None:
+            response_id, offset = parsed
+            stream = self._streams.get(response_id)
+            if stream is not None and stream.session_id == session_id:
+                self.stats['resumed_buffer' if stream.done else 'resumed_live'] += 1
+                return stream, None, offset
+
+            finished = self._finished.get(response_id)
+            if finished is not None and finished[0] == session_id and finished[1] is not None:
+                self.stats['resumed_stored'] += 1
+                return None, finished[1], offset
+
+        self.stats['resume_misses'] += 1
+        return None
+
+    def expire(self):
+        """Drop buffers finished more than buffer_seconds ago, keeping a pointer to the stored message"""
+        now = time.monotonic()
+        for response_id, stream in list(self._streams.items()):
+            if stream.done and stream.consumers == 0 and now - stream.finished_at > self.buffer_seconds:
+                del self._streams[response_id]
+                self._finished[response_id] = (stream.session_id, stream.turn_info.get('message_seq'), stream.finished_at)
+
+        while self._finished:
+            _, (_, _, finished_at) = next(iter(self._finished.items()))
+            if len(self._finished) <= self.max_finished and now - finished_at <= self.resume_ttl_seconds:
+                break
+            self._finished.popitem(last=False)
+
+    def get_stats(self) -> dict:
+        self.expire()
+        return {
+            **self.stats,
+            'active': sum(1 for stream in self._streams.values() if not stream.done),
+            'buffered': len(self._streams),
+            'buffered_chars': sum(len(stream.text) for stream in self._streams.values()),
+            'resumable_from_history': len(self._finished),
+            'grace_s': self.grace_seconds,
+            'buffer_s': self.buffer_seconds
+        }
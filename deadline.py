@@ -0,0 +1,47 @@
+"""
+Per-request deadlines propagated through a context variable.
+
+A request handler calls ``start_deadline(seconds)`` once; every coroutine and
+task spawned from it then sees the same absolute deadline through
+``remaining()``. The LLM client uses it to shorten per-call timeouts and skip
+retries that cannot finish in time, and the analysis pipeline uses it to decide
+whether there is still time for an LLM-written plan.
+"""
+
+import contextvars
+import time
+from typing import Optional
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar('milo_deadline', default=None)
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out before the operation could complete"""
+
+
+def start_deadline(seconds: Optional[float]) -> contextvars.Token:
+    """Set the current request's deadline to `seconds` from now (None clears it); keeps an earlier deadline if one is set"""
+    if seconds is None:
+        return _deadline.set(None)
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    return _deadline.set(min(deadline, current) if current is not None else deadline)
+
+
+def reset_deadline(token: contextvars.Token):
+    _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline, or None when no deadline is set"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def check_deadline(operation: str = "operation"):
+    """Raise DeadlineExceeded if the current deadline has already passed"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(f"Deadline exceeded before {operation}")
@@ -0,0 +1,230 @@
+"""
+Offline stand-in for the OpenAI chat completions API, for load tests and CI.
+
+``FakeCompletions`` implements ``chat.completions.create`` in process
+(``MILO_LLM_PROVIDER=fake``, no API key needed) and ``fake_openai_server.py``
+serves the same responses over HTTP for ``OPENAI_BASE_URL``. Responses are
+recognised by prompt: query processing and intent extraction get schema-valid
+JSON built from the local rules classifier; every other call gets a canned
+plan, summary or chat reply, streamed word by word. Usage reports
+``cached_tokens`` for message prefixes seen before, the way OpenAI's prompt
+cache does, and streams end with a usage chunk when ``include_usage`` is set.
+Latency, throughput and injected 429 / timeout errors are configured with
+``MILO_FAKE_LLM_*`` variables.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncGenerator, Optional
+
+import httpx
+from openai import APITimeoutError, RateLimitError
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+from prompt_budget import count_tokens
+from query_classifier import classify_query, local_intent
+
+QUERY_PATTERN = re.compile(r'User Query: "(.*?)"\n', re.DOTALL)
+INTENT_PATTERN = re.compile(r'Parse this Yale student\'s career goal and return ONLY valid JSON:\s*"(.*?)"\n', re.DOTALL)
+FAKE_ENDPOINT = "http://fake-llm.local/v1/chat/completions"
+
+# OpenAI caches prompt prefixes of at least 1024 tokens, in 128-token increments
+PROMPT_CACHE_MIN_TOKENS = 1024
+PROMPT_CACHE_BLOCK_TOKENS = 128
+
+PLAN_TEXT = (
+    "Here's what I'd do if I were in your shoes this week. **IMMEDIATE ACTIONS (Next 7 Days):** "
+    "Reach out to two of the alumni above with a short note that mentions their path, and book a "
+    "drop-in with your residential college career advisor. **THIS SEMESTER:** Take one course that "
+    "builds a core skill for the role, join a related student organization, and set up two "
+    "informational interviews each month. **CAREER TIMELINE:** Aim for a relevant summer "
+    "internship, then use it to convert to a full-time offer. **SUCCESS FACTORS:** Consistent "
+    "outreach, concrete projects and a clear story about why this path fits you. You've got this."
+)
+
+SUMMARY_TEXT = (
+    "The student is exploring careers that combine their interests in data science and writing. "
+    "Milo asked about classes and projects that energize them and suggested talking to Yale alumni "
+    "in those fields; no path has been chosen yet."
+)
+
+CHAT_TEXT = (
+    "That's a great place to start. Tell me a little more about the classes, projects or "
+    "activities at Yale that have made you lose track of time recently, and what it was about "
+    "them that pulled you in. Once I understand what energizes you, we can map it to a few "
+    "concrete career paths and the Yale alumni who have walked them."
+)
+
+
+class FakeStream:
+    """Async iterator of chat completion chunks, shaped like the SDK's AsyncStream"""
+
+    def __init__(self, chunks: AsyncGenerator):
+        self._chunks = chunks
+
+    def __aiter__(self):
+        return self._chunks
+
+    async def close(self):
+        await self._chunks.aclose()
+
+
+class FakeCompletions:
+    """In-process fake of ``client.chat.completions`` with configurable latency, throughput and faults"""
+
+    def __init__(self, latency_ms: float = None, tokens_per_second: float = None,
+                 rate_limit_rate: float = None, timeout_rate: float = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms if latency_ms is not None else float(os.getenv('MILO_FAKE_LLM_LATENCY_MS', '200'))
+        self.model_latency_ms = json.loads(os.getenv('MILO_FAKE_LLM_MODEL_LATENCY_MS', '{}'))
+        self.tokens_per_second = tokens_per_second or float(os.getenv('MILO_FAKE_LLM_TOKENS_PER_S', '50'))
+        self.rate_limit_rate = rate_limit_rate if rate_limit_rate is not None else float(os.getenv('MILO_FAKE_LLM_429_RATE', '0'))
+        self.timeout_rate = timeout_rate if timeout_rate is not None else float(os.getenv('MILO_FAKE_LLM_TIMEOUT_RATE', '0'))
+        self.retry_after_s = float(os.getenv('MILO_FAKE_LLM_RETRY_AFTER_S', '1'))
+        if seed is None and os.getenv('MILO_FAKE_LLM_SEED'):
+            seed = int(os.getenv('MILO_FAKE_LLM_SEED'))
+        self._random = random.Random(seed)
+        self.stats = {'calls': 0, 'streams': 0, 'cancelled': 0, 'rate_limited': 0, 'timeouts': 0, 'cached_tokens': 0}
+        self._seen_prefixes = OrderedDict()
+
+    def pick_fault(self) -> Optional[str]:
+        """Decide whether this call fails: 'rate_limit', 'timeout' or None"""
+        roll = self._random.random()
+        if roll < self.rate_limit_rate:
+            self.stats['rate_limited'] += 1
+            return 'rate_limit'
+        if roll < self.rate_limit_rate + self.timeout_rate:
+            self.stats['timeouts'] += 1
+            return 'timeout'
+        return None
+
+    def latency_for(self, model: str) -> float:
+        """Seconds before the response or first token, per model if MILO_FAKE_LLM_MODEL_LATENCY_MS sets one"""
+        return float(self.model_latency_ms.get(model, self.latency_ms)) / 1000
+
+    def reply_for(self, messages: list) -> str:
+        """Response text for a prompt: JSON for query processing and intent extraction, prose otherwise"""
+        prompt = "\n".join(str(message.get('content', '')) for message in messages)
+
+        query = QUERY_PATTERN.search(prompt)
+        if query and 'query processor' in prompt:
+            processed = classify_query(query.group(1))
+            processed.pop('source', None)
+            if processed['query_type'] == 'general':
+                processed.update({
+                    'detected_industry': 'Technology',
+                    'confidence': 0.6,
+                    'student_intent': 'Explore career options that fit their interests'
+                })
+            return json.dumps(processed)
+
+        goal = INTENT_PATTERN.search(prompt)
+        if goal:
+            return json.dumps(local_intent(goal.group(1)))
+
+        if 'career strategist' in prompt:
+            return PLAN_TEXT
+        if 'conversation summarizer' in prompt:
+            return SUMMARY_TEXT
+        return CHAT_TEXT
+
+    def usage_for(self, messages: list, content: str) -> dict:
+        """Token usage; cached_tokens covers the longest whole-message prefix seen in an earlier call"""
+        prompt_tokens = cached_prefix = 0
+        digest = hashlib.sha256()
+        for message in messages:
+            digest.update(json.dumps([message.get('role'), str(message.get('content', ''))]).encode())
+            prompt_tokens += count_tokens(str(message.get('content', '')))
+            key = digest.hexdigest()
+            if key in self._seen_prefixes:
+                self._seen_prefixes.move_to_end(key)
+                cached_prefix = prompt_tokens
+            else:
+                self._seen_prefixes[key] = True
+        while len(self._seen_prefixes) > 10000:
+            self._seen_prefixes.popitem(last=False)
+
+        cached_tokens = 0
+        if cached_prefix >= PROMPT_CACHE_MIN_TOKENS:
+            cached_tokens = cached_prefix - (cached_prefix - PROMPT_CACHE_MIN_TOKENS) % PROMPT_CACHE_BLOCK_TOKENS
+        self.stats['cached_tokens'] += cached_tokens
+        completion_tokens = count_tokens(content)
+        return {
+            'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': cached_tokens}
+        }
+
+    def completion_dict(self, model: str, messages: list, content: str) -> dict:
+        return {
+            'id': f"chatcmpl-fake-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': self.usage_for(messages, content)
+        }
+
+    async def stream_chunk_dicts(self, model: str, content: str, usage: Optional[dict] = None) -> AsyncGenerator[dict, None]:
+        """Yield streaming chunk payloads word by word at the configured throughput, then a usage chunk if given"""
+        completion_id = f"chatcmpl-fake-{uuid.uuid4().hex[:12]}"
+        words = re.findall(r'\S+\s*', content)
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(1 / self.tokens_per_second)
+            yield {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'delta': {'content': word}, 'finish_reason': None}]
+            }
+        yield {
+            'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]
+        }
+        if usage is not None:
+            # Like OpenAI with stream_options.include_usage: empty choices, usage for the whole request
+            yield {
+                'id': completion_id, 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                'choices': [], 'usage': usage
+            }
+
+    async def create(self, model: str = 'gpt-3.5-turbo', messages: list = None, stream: bool = False, timeout=None, **kwargs):
+        """Fake ``chat.completions.create``: sleeps for the configured latency, then returns or streams a reply"""
+        self.stats['calls'] += 1
+        messages = messages or []
+        request = httpx.Request('POST', FAKE_ENDPOINT)
+
+        fault = self.pick_fault()
+        if fault == 'rate_limit':
+            await asyncio.sleep(0.005)
+            response = httpx.Response(429, headers={'retry-after': str(self.retry_after_s)}, request=request)
+            raise RateLimitError("Rate limit reached (injected by fake LLM)", response=response, body=None)
+        if fault == 'timeout':
+            # Hang for the caller's timeout like an unresponsive upstream would
+            await asyncio.sleep(timeout if isinstance(timeout, (int, float)) else 30)
+            raise APITimeoutError(request=request)
+
+        await asyncio.sleep(self.latency_for(model))
+        content = self.reply_for(messages)
+
+        if not stream:
+            return ChatCompletion(**self.completion_dict(model, messages, content))
+
+        self.stats['streams'] += 1
+        stream_options = kwargs.get('stream_options') or (kwargs.get('extra_body') or {}).get('stream_options') or {}
+        usage = self.usage_for(messages, content) if stream_options.get('include_usage') else None
+
+        async def chunks():
+            try:
+                async for chunk in self.stream_chunk_dicts(model, content, usage):
+                    yield ChatCompletionChunk(**chunk)
+            except (asyncio.CancelledError, GeneratorExit):
+                self.stats['cancelled'] += 1
+                raise
+
+        return FakeStream(chunks())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Fake OpenAI-compatible server for offline load testing.
+
+Serves POST /v1/chat/completions with the same responses, latency, throughput
+and injected faults as the in-process fake (fake_llm.py, MILO_FAKE_LLM_*
+variables). Run it and point the backend at it:
+
+    python fake_openai_server.py --port 9000
+    OPENAI_BASE_URL=http://localhost:9000/v1 OPENAI_API_KEY=fake uvicorn app:app
+"""
+
+import argparse
+import asyncio
+import json
+import os
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from fake_llm import FakeCompletions
+
+app = FastAPI()
+fake = FakeCompletions()
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """OpenAI chat completions: JSON body, or Server-Sent Events when stream is true"""
+    body = await request.json()
+    model = body.get('model', 'gpt-3.5-turbo')
+    messages = body.get('messages', [])
+    fake.stats['calls'] += 1
+
+    fault = fake.pick_fault()
+    if fault == 'rate_limit':
+        return JSONResponse(
+            {"error": {"message": "Rate limit reached (injected by fake LLM)", "type": "requests", "code": "rate_limit_exceeded"}},
+            status_code=429,
+            headers={"retry-after": str(fake.retry_after_s)}
+        )
+    if fault == 'timeout':
+        # Never answer in time; the client's own timeout fires first
+        await asyncio.sleep(float(os.getenv('MILO_FAKE_LLM_HANG_S', '600')))
+
+    await asyncio.sleep(fake.latency_for(model))
+    content = fake.reply_for(messages)
+
+    if not body.get('stream'):
+        return fake.completion_dict(model, messages, content)
+
+    fake.stats['streams'] += 1
+    usage = fake.usage_for(messages, content) if (body.get('stream_options') or {}).get('include_usage') else None
+
+    async def generate_events():
+        try:
+            async for chunk in fake.stream_chunk_dicts(model, content, usage):
+                yield f"data: {json.dumps(chunk)}\n\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client closed the connection mid-stream
+            fake.stats['cancelled'] += 1
+            raise
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(generate_events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+async def get_stats():
+    """Calls served and faults injected so far"""
+    return fake.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake OpenAI-compatible server for offline load testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    args = parser.parse_args()
+
+    print(f"🧪 Fake OpenAI server on http://{args.host}:{args.port}/v1 "
+          f"(latency {fake.latency_ms:.0f}ms, {fake.tokens_per_second:.0f} tokens/s, "
+          f"429 rate {fake.rate_limit_rate}, timeout rate {fake.timeout_rate})")
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
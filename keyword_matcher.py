@@ -0,0 +1,139 @@
+"""
+Single-pass multi-keyword matching (Aho–Corasick) for skill, major and interest extraction.
+
+Each vocabulary is compiled once into an automaton and then scans a text in one
+pass, instead of testing every keyword separately. Built-in vocabularies can be
+extended without code changes by dropping a JSON file named ``<vocabulary>.json``
+into the directory given by ``MILO_VOCAB_DIR`` (default ``vocab``). The file is
+either an object mapping keyword → label or a list of keywords; its entries are
+added after (and override the labels of) the built-in ones.
+"""
+
+import json
+import os
+from collections import deque
+from typing import Dict, List, NamedTuple, Union
+
+
+class KeywordMatch(NamedTuple):
+    start: int
+    end: int
+    keyword: str
+    label: str
+    priority: int
+
+
+class KeywordMatcher:
+    """Aho–Corasick automaton over a case-insensitive keyword vocabulary"""
+
+    def __init__(self, vocabulary: Dict[str, str]):
+        self.keywords: List[str] = []
+        self.labels: List[str] = []
+
+        # Trie: per-node transition dicts, failure links and keyword outputs
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for keyword, label in vocabulary.items():
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            self._add(keyword, len(self.keywords))
+            self.keywords.append(keyword)
+            self.labels.append(label)
+
+        self._build_failure_links()
+
+    def _add(self, keyword: str, keyword_id: int):
+        node = 0
+        for char in keyword:
+            if char not in self._goto[node]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[node][char] = len(self._goto) - 1
+            node = self._goto[node][char]
+        self._output[node].append(keyword_id)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find_all(self, text: str) -> List[KeywordMatch]:
+        """Return every keyword occurrence in text, ordered by end position.
+
+        Matching is case-insensitive; positions index into ``text.lower()``.
+        """
+        matches = []
+        if not text:
+            return matches
+
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for position, char in enumerate(text.lower()):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for keyword_id in output[node]:
+                keyword = self.keywords[keyword_id]
+                matches.append(KeywordMatch(
+                    start=position - len(keyword) + 1,
+                    end=position + 1,
+                    keyword=keyword,
+                    label=self.labels[keyword_id],
+                    priority=keyword_id
+                ))
+        return matches
+
+    def find_labels(self, text: str) -> List[str]:
+        """Return the distinct labels found in text, in order of first occurrence"""
+        labels = []
+        for match in self.find_all(text):
+            if match.label not in labels:
+                labels.append(match.label)
+        return labels
+
+    def best_label(self, text: str, default: str = None) -> str:
+        """Return the label of the highest-priority (earliest in vocabulary) keyword found in text"""
+        matches = self.find_all(text)
+        if not matches:
+            return default
+        return min(matches, key=lambda match: match.priority).label
+
+
+def load_vocabulary(name: str, defaults: Union[Dict[str, str], List[str]]) -> Dict[str, str]:
+    """Merge a built-in vocabulary with an optional ``<MILO_VOCAB_DIR>/<name>.json`` extension file"""
+    vocabulary = dict(defaults) if isinstance(defaults, dict) else {keyword: keyword for keyword in defaults}
+
+    path = os.path.join(os.getenv('MILO_VOCAB_DIR', 'vocab'), f"{name}.json")
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                extra = json.load(f)
+            if isinstance(extra, list):
+                extra = {keyword: keyword for keyword in extra}
+            vocabulary.update({str(keyword): str(label) for keyword, label in extra.items()})
+            print(f"📚 Loaded {len(extra)} extra '{name}' keywords from {path}")
+        except Exception as e:
+            print(f"⚠️  Could not load vocabulary file {path}: {e}")
+
+    return vocabulary
+
+
+_matchers: Dict[str, KeywordMatcher] = {}
+
+
+def get_matcher(name: str, defaults: Union[Dict[str, str], List[str]]) -> KeywordMatcher:
+    """Return the compiled matcher for a vocabulary, building it on first use"""
+    if name not in _matchers:
+        _matchers[name] = KeywordMatcher(load_vocabulary(name, defaults))
+    return _matchers[name]
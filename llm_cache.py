@@ -0,0 +1,153 @@
+"""
+Two-tier cache for deterministic LLM responses (query processing and intent extraction).
+
+Tier 1 is an in-process LRU; tier 2 is a SQLite file in WAL mode, so every
+worker process on a node shares the same entries. Keys combine the call site,
+the normalized input, the model and the prompt version, so changing a prompt
+or model never serves stale answers.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_input(text: str) -> str:
+    """Normalize user input for cache keys: case, whitespace and trailing punctuation"""
+    return re.sub(r'\s+', ' ', (text or '').lower()).strip().strip('.!?')
+
+
+class LLMCache:
+    """In-process LRU in front of a node-local SQLite store, with TTLs and size-bounded eviction"""
+
+    def __init__(self, path: str = None, memory_size: int = None, max_rows: int = None, ttl_seconds: float = None):
+        self.path = path or os.getenv('MILO_LLM_CACHE_PATH', '.milo_cache/llm_cache.sqlite3')
+        self.memory_size = memory_size or int(os.getenv('MILO_LLM_CACHE_MEMORY_SIZE', '1024'))
+        self.max_rows = max_rows or int(os.getenv('MILO_LLM_CACHE_MAX_ROWS', '50000'))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('MILO_LLM_CACHE_TTL_S', '86400'))
+
+        self._memory = OrderedDict()  # key → (expires_at, serialized value)
+        self._local = threading.local()
+        self._writes_since_prune = 0
+        self.stats = {
+            'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0,
+            'memory_evictions': 0, 'disk_evictions': 0, 'errors': 0
+        }
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        value TEXT NOT NULL,
+                        expires_at REAL NOT NULL
+                    )
+                """)
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_expires ON llm_cache(expires_at)")
+        except sqlite3.Error as e:
+            print(f"⚠️  LLM cache store unavailable at {self.path}, using memory only: {e}")
+            self.path = None
+
+    @staticmethod
+    def make_key(call_site: str, user_input: str, model: str, prompt_version: str) -> str:
+        raw = json.dumps([call_site, normalize_input(user_input), model, prompt_version])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers and a writer from other workers proceed concurrently
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _remember(self, key: str, expires_at: float, serialized: str):
+        self._memory[key] = (expires_at, serialized)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.stats['memory_evictions'] += 1
+
+    def _disk_get(self, key: str) -> Optional[tuple]:
+        row = self._connect().execute(
+            "SELECT expires_at, value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row
+
+    def _disk_set(self, key: str, expires_at: float, serialized: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, serialized, expires_at)
+            )
+            self._writes_since_prune += 1
+            if self._writes_since_prune >= 100:
+                self._writes_since_prune = 0
+                self._prune(conn)
+
+    def _prune(self, conn: sqlite3.Connection):
+        """Drop expired rows, then the soonest-to-expire rows beyond max_rows"""
+        evicted = conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_rows
+        if overflow > 0:
+            evicted += conn.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY expires_at LIMIT ?)",
+                (overflow,)
+            ).rowcount
+        self.stats['disk_evictions'] += evicted
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return a fresh copy of the cached value, or None on a miss"""
+        entry = self._memory.get(key)
+        if entry and entry[0] > time.time():
+            self._memory.move_to_end(key)
+            self.stats['memory_hits'] += 1
+            return json.loads(entry[1])
+        if entry:
+            del self._memory[key]
+
+        if self.path:
+            try:
+                row = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error:
+                self.stats['errors'] += 1
+                row = None
+            if row:
+                self._remember(key, row[0], row[1])
+                self.stats['disk_hits'] += 1
+                return json.loads(row[1])
+
+        self.stats['misses'] += 1
+        return None
+
+    async def set(self, key: str, value: dict, ttl_seconds: float = None):
+        expires_at = time.time() + (ttl_seconds or self.ttl_seconds)
+        serialized = json.dumps(value)
+        self._remember(key, expires_at, serialized)
+        self.stats['writes'] += 1
+
+        if self.path:
+            try:
+                await asyncio.to_thread(self._disk_set, key, expires_at, serialized)
+            except sqlite3.Error:
+                self.stats['errors'] += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.stats['memory_hits'] + self.stats['disk_hits'] + self.stats['misses']
+        hits = self.stats['memory_hits'] + self.stats['disk_hits']
+        return {
+            **self.stats,
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+            'memory_entries': len(self._memory),
+            'store': self.path or 'memory-only'
+        }
@@ -0,0 +1,340 @@
+"""
+Process-wide LLM client with connection pooling, per-model concurrency limits and retries.
+
+Every MiloAI instance in a process shares one client. The default ``openai``
+provider is an ``AsyncOpenAI`` client backed by a tuned ``httpx.AsyncClient``
+keep-alive pool; ``MILO_LLM_PROVIDER=fake`` swaps in the offline fake from
+fake_llm.py, and register_provider() adds others. Calls go through
+``client.chat.completions.create`` as before, but each model gets an asyncio
+semaphore bounding in-flight requests, every call has a timeout, and 429 / 5xx /
+connection errors are retried with exponential backoff that honours the
+``Retry-After`` header. Set ``OPENAI_BASE_URL`` to point the openai provider at a
+local OpenAI-compatible server such as fake_openai_server.py.
+"""
+
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI, APIConnectionError, APIStatusError, APITimeoutError
+
+from deadline import DeadlineExceeded, remaining
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class _DeadlineBeforeCall(DeadlineExceeded):
+    """The deadline ran out before the call was sent; says nothing about the provider's health"""
+
+
+class CircuitOpenError(Exception):
+    """The LLM provider is failing and calls are being skipped until the breaker's cool-down ends"""
+
+
+class CircuitBreaker:
+    """Opens after consecutive upstream failures, then lets one trial call through after a cool-down"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = 'closed'
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.stats = {'opened': 0, 'rejected': 0}
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected: not closed and still inside the cool-down"""
+        return self.state != 'closed' and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def before_call(self):
+        if self.state == 'closed':
+            return
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            # Let one trial call through and restart the cool-down for everyone else
+            self.state = 'half_open'
+            self.opened_at = time.monotonic()
+            return
+        self.stats['rejected'] += 1
+        raise CircuitOpenError(f"LLM circuit open after {self.consecutive_failures} consecutive failures")
+
+    def record_success(self):
+        self.state = 'closed'
+        self.consecutive_failures = 0
+
+    def record_inconclusive(self):
+        """The call ended without a provider outcome; if it held the half-open trial, let the next call try"""
+        if self.state == 'half_open':
+            self.opened_at = time.monotonic() - self.reset_seconds
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        if self.state == 'half_open' or self.consecutive_failures >= self.failure_threshold:
+            if self.state != 'open':
+                self.stats['opened'] += 1
+                print(f"🔌 LLM circuit opened after {self.consecutive_failures} consecutive failures")
+            self.state = 'open'
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> dict:
+        return {'state': self.state, 'consecutive_failures': self.consecutive_failures, **self.stats}
+
+
+class ResilientCompletions:
+    """Drop-in ``chat.completions`` with per-model semaphores, timeouts and retry/backoff"""
+
+    def __init__(self, completions, max_concurrency: int, model_concurrency: Dict[str, int],
+                 max_retries: int, backoff_base: float, backoff_max: float, timeout: float,
+                 breaker: CircuitBreaker = None):
+        self._completions = completions
+        self.breaker = breaker
+        self.max_concurrency = max_concurrency
+        self.model_concurrency = model_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {
+            'calls': 0, 'succeeded': 0, 'failed': 0, 'retries': 0,
+            'rate_limited': 0, 'server_errors': 0, 'timeouts': 0, 'connection_errors': 0,
+            'in_flight': 0, 'waiting': 0, 'semaphore_wait_ms': 0.0
+        }
+
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.model_concurrency.get(model, self.max_concurrency))
+        return self._semaphores[model]
+
+    def _is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, APITimeoutError):
+            self.stats['timeouts'] += 1
+            return True
+        if isinstance(error, APIConnectionError):
+            self.stats['connection_errors'] += 1
+            return True
+        if isinstance(error, APIStatusError):
+            if error.status_code == 429:
+                self.stats['rate_limited'] += 1
+            elif error.status_code >= 500:
+                self.stats['server_errors'] += 1
+            return error.status_code in RETRYABLE_STATUS_CODES
+        return False
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before the next attempt: Retry-After if the server sent one, else jittered exponential backoff"""
+        response = getattr(error, 'response', None)
+        headers = response.headers if response is not None else {}
+
+        retry_after_ms = headers.get('retry-after-ms')
+        retry_after = headers.get('retry-after')
+        try:
+            if retry_after_ms:
+                return min(float(retry_after_ms) / 1000, self.backoff_max)
+            if retry_after:
+                return min(float(retry_after), self.backoff_max)
+        except ValueError:
+            pass  # HTTP-date form; fall back to backoff
+
+        return random.uniform(0, min(self.backoff_base * (2 ** attempt), self.backoff_max))
+
+    async def _attempt(self, kwargs: dict):
+        """One call, with its timeout shortened to the request deadline if that comes first"""
+        left = remaining()
+        if left is None:
+            return await self._completions.create(**kwargs)
+        if left <= 0:
+            raise _DeadlineBeforeCall("Deadline exceeded before the LLM call")
+
+        shortened = left < kwargs['timeout']
+        kwargs = {**kwargs, 'timeout': min(kwargs['timeout'], left)}
+        try:
+            return await asyncio.wait_for(self._completions.create(**kwargs), timeout=left)
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded during the LLM call")
+        except APITimeoutError as e:
+            # A timeout cut short by the request deadline is the deadline's doing, not the provider's
+            if shortened:
+                raise DeadlineExceeded("Deadline exceeded during the LLM call") from e
+            raise
+
+    async def create(self, **kwargs):
+        """Create a chat completion; with stream=True the model slot is released once the stream has opened"""
+        model = kwargs.get('model', 'default')
+        kwargs.setdefault('timeout', self.timeout)
+        semaphore = self._semaphore(model)
+        self.stats['calls'] += 1
+        if self.breaker:
+            self.breaker.before_call()
+
+        attempt = 0
+        while True:
+            waited = time.perf_counter()
+            self.stats['waiting'] += 1
+            async with semaphore:
+                self.stats['waiting'] -= 1
+                self.stats['semaphore_wait_ms'] += (time.perf_counter() - waited) * 1000
+                self.stats['in_flight'] += 1
+                try:
+                    response = await self._attempt(kwargs)
+                    self.stats['succeeded'] += 1
+                    if self.breaker:
+                        self.breaker.record_success()
+                    return response
+                except DeadlineExceeded:
+                    # The request ran out of time (before or during the call): not a provider failure
+                    self.stats['failed'] += 1
+                    if self.breaker:
+                        self.breaker.record_inconclusive()
+                    raise
+                except Exception as e:
+                    retryable = self._is_retryable(e)
+                    if not retryable or attempt >= self.max_retries:
+                        self.stats['failed'] += 1
+                        if self.breaker and retryable:
+                            self.breaker.record_failure()
+                        elif self.breaker:
+                            self.breaker.record_success()  # the provider answered; the request itself was bad
+                        raise
+                    error = e
+                finally:
+                    self.stats['in_flight'] -= 1
+
+            # Back off outside the semaphore so other requests can use the slot
+            delay = self._retry_delay(attempt, error)
+            left = remaining()
+            if left is not None and delay >= left:
+                # Giving up is the deadline's call; the provider is judged on calls that ran to completion
+                self.stats['failed'] += 1
+                if self.breaker:
+                    self.breaker.record_inconclusive()
+                raise DeadlineExceeded(f"No time left to retry after {type(error).__name__}") from error
+            attempt += 1
+            self.stats['retries'] += 1
+            print(f"⏳ LLM call for {model} failed ({type(error).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+    def get_stats(self) -> dict:
+        calls = self.stats['calls']
+        return {
+            **{key: value for key, value in self.stats.items() if key != 'semaphore_wait_ms'},
+            'avg_semaphore_wait_ms': round(self.stats['semaphore_wait_ms'] / calls, 1) if calls else 0.0,
+            'max_concurrency': self.max_concurrency,
+            'model_concurrency': self.model_concurrency,
+            'circuit_breaker': self.breaker.get_stats() if self.breaker else None
+        }
+
+
+_closing_streams = set()
+
+
+def close_stream(stream) -> Optional[asyncio.Task]:
+    """Close a streamed completion in a background task, dropping its connection so the provider stops generating
+
+    The close runs in its own task so it still completes when the caller is being cancelled
+    (a client disconnect cancels the response task).
+    """
+    close = getattr(stream, 'close', None)
+    if close is None:
+        # The openai SDK's AsyncStream has no close(); closing its HTTP response drops the connection
+        close = getattr(getattr(stream, 'response', None), 'aclose', None)
+    if close is None:
+        return None
+    task = asyncio.ensure_future(close())
+    _closing_streams.add(task)
+    task.add_done_callback(_closing_streams.discard)
+    return task
+
+
+class _Chat:
+    def __init__(self, completions: ResilientCompletions):
+        self.completions = completions
+
+
+def openai_provider(api_key: str, timeout: float):
+    """Real OpenAI (or OPENAI_BASE_URL-compatible) completions on a tuned keep-alive connection pool"""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=int(os.getenv('MILO_LLM_MAX_CONNECTIONS', '100')),
+            max_keepalive_connections=int(os.getenv('MILO_LLM_MAX_KEEPALIVE', '20')),
+            keepalive_expiry=float(os.getenv('MILO_LLM_KEEPALIVE_S', '30'))
+        ),
+        timeout=httpx.Timeout(timeout, connect=float(os.getenv('MILO_LLM_CONNECT_TIMEOUT_S', '5')))
+    )
+    # Retries are handled by ResilientCompletions, so the SDK's own retry loop is disabled
+    client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.getenv('OPENAI_BASE_URL') or None,
+        max_retries=0,
+        http_client=http_client
+    )
+    return client.chat.completions
+
+
+def fake_provider(api_key: str, timeout: float):
+    """In-process fake completions for offline load testing (see fake_llm.py)"""
+    from fake_llm import FakeCompletions
+    return FakeCompletions()
+
+
+# Provider name → factory(api_key, timeout) returning an object with an async create(**kwargs)
+PROVIDERS = {
+    'openai': openai_provider,
+    'fake': fake_provider,
+}
+
+
+def register_provider(name: str, factory):
+    """Make a completions provider selectable with MILO_LLM_PROVIDER=<name>"""
+    PROVIDERS[name] = factory
+
+
+def provider_requires_api_key(provider: str = None) -> bool:
+    return (provider or os.getenv('MILO_LLM_PROVIDER', 'openai')) == 'openai'
+
+
+class LLMClient:
+    """Exposes ``chat.completions.create`` like ``AsyncOpenAI``, on top of the configured provider"""
+
+    def __init__(self, api_key: str, provider: str = None):
+        self.provider = provider or os.getenv('MILO_LLM_PROVIDER', 'openai')
+        if self.provider not in PROVIDERS:
+            raise ValueError(f"Unknown MILO_LLM_PROVIDER '{self.provider}', expected one of: {', '.join(PROVIDERS)}")
+
+        timeout = float(os.getenv('MILO_LLM_TIMEOUT_S', '30'))
+        self.chat = _Chat(ResilientCompletions(
+            PROVIDERS[self.provider](api_key, timeout),
+            max_concurrency=int(os.getenv('MILO_LLM_MAX_CONCURRENCY', '16')),
+            model_concurrency=json.loads(os.getenv('MILO_LLM_MODEL_CONCURRENCY', '{}')),
+            max_retries=int(os.getenv('MILO_LLM_MAX_RETRIES', '3')),
+            backoff_base=float(os.getenv('MILO_LLM_BACKOFF_BASE_S', '0.5')),
+            backoff_max=float(os.getenv('MILO_LLM_BACKOFF_MAX_S', '20')),
+            timeout=timeout,
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv('MILO_LLM_BREAKER_FAILURES', '5')),
+                reset_seconds=float(os.getenv('MILO_LLM_BREAKER_RESET_S', '30'))
+            )
+        ))
+
+    @property
+    def circuit_open(self) -> bool:
+        """True while the breaker is skipping LLM calls"""
+        return self.chat.completions.breaker.is_open()
+
+    def get_stats(self) -> dict:
+        return {'provider': self.provider, **self.chat.completions.get_stats()}
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client(api_key: str) -> LLMClient:
+    """Return the process-wide client, creating it on first use"""
+    global _client
+    if _client is None:
+        _client = LLMClient(api_key)
+    return _client
@@ -116,65 +116,92 @@ export class MiloAPIService {
     onComplete: () => void,
     onError: (error: string) => void
   ): Promise<void> {
-    try {
-      const response = await fetch(`${this.baseUrl}/chat/stream`, {
-        method: 'POST',
-        headers: {
+    // A dropped connection is resumed with Last-Event-ID instead of generating the reply again
+    const maxResumes = 3;
+    let lastEventId: string | null = null;
+
+    for (let attempt = 0; ; attempt++) {
+      try {
+        const headers: Record<string, string> = {
           'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          message: message,
-          session_id: sessionId
-        })
-      });
+        };
+        if (lastEventId) {
+          headers['Last-Event-ID'] = lastEventId;
+        }
 
-      if (!response.ok) {
-        throw new Error(`HTTP error! status: ${response.status}`);
-      }
+        const response = await fetch(`${this.baseUrl}/chat/stream`, {
+          method: 'POST',
+          headers,
+          body: JSON.stringify({
+            message: message,
+            session_id: sessionId
+          })
+        });
 
-      const reader = response.body?.getReader();
-      if (!reader) {
-        throw new Error('No response body');
-      }
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const reader = response.body?.getReader();
+        if (!reader) {
+          throw new Error('No response body');
+        }
 
-      const decoder = new TextDecoder();
-      let buffer = '';
+        const decoder = new TextDecoder();
+        let buffer = '';
+        // An event's id only becomes the resume point once its data has been handled (at the blank line ending it)
+        let pendingEventId: string | null = null;
 
-      while (true) {
-        const { done, value } = await reader.read();
-        if (done) break;
+        while (true) {
+          const { done, value } = await reader.read();
+          if (done) break;
 
-        buffer += decoder.decode(value, { stream: true });
-        const lines = buffer.split('\n');
-        buffer = lines.pop() || '';
+          buffer += decoder.decode(value, { stream: true });
+          const lines = buffer.split('\n');
+          buffer = lines.pop() || '';
 
-        for (const line of lines) {
-          if (line.startsWith('data: ')) {
-            try {
-              const data = JSON.parse(line.slice(6));
-              
-              if (data.error) {
-                onError(data.error);
-                return;
-              }
-              
-              if (data.done) {
-                onComplete();
-                return;
+          for (const line of lines) {
+            if (line === '') {
+              if (pendingEventId) {
+                lastEventId = pendingEventId;
+                pendingEventId = null;
               }
-              
-              if (data.content) {
-                onChunk(data.content);
+            } else if (line.startsWith('id: ')) {
+              pendingEventId = line.slice(4).trim();
+            } else if (line.startsWith('data: ')) {
+              try {
+                const data = JSON.parse(line.slice(6));
+                
+                if (data.error) {
+                  onError(data.error);
+                  return;
+                }
+                
+                if (data.done) {
+                  onComplete();
+                  return;
+                }
+                
+                if (data.content) {
+                  onChunk(data.content);
+                }
+              } catch (e) {
+                console.error('Error parsing SSE data:', e);
               }
-            } catch (e) {
-              console.error('Error parsing SSE data:', e);
             }
           }
         }
+
+        throw new Error('Connection closed before the reply finished');
+      } catch (error) {
+        if (!lastEventId || attempt >= maxResumes) {
+          console.error('Streaming chat error:', error);
+          onError(error instanceof Error ? error.message : 'Unknown error');
+          return;
+        }
+        console.warn('Chat stream interrupted, resuming:', error);
+        await new Promise(resolve => setTimeout(resolve, 500 * (attempt + 1)));
       }
-    } catch (error) {
-      console.error('Streaming chat error:', error);
-      onError(error instanceof Error ? error.message : 'Unknown error');
     }
   }
 
@@ -1,30 +1,181 @@
-from openai import AsyncOpenAI
 import json
 import pandas as pd
-from typing import Dict, List, AsyncGenerator
+from typing import Dict, List, AsyncGenerator, Optional
 import asyncio
+import copy
+import heapq
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 import os
+import time
 import sqlite3
 import re
 from dotenv import load_dotenv
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from datetime import datetime
+from alumni_index import AlumniIndex, resolve_industry
+from keyword_matcher import get_matcher
+from query_classifier import classify_query, format_industry_mappings, local_intent
+from llm_cache import LLMCache, normalize_input
+from llm_client import close_stream, get_llm_client, provider_requires_api_key
+from prompt_budget import PromptSection, count_tokens, fit_sections
+from singleflight import SingleFlight
+from model_router import get_model_router
+from deadline import remaining, reset_deadline, start_deadline
+from session_store import SessionStore
 
 # Load environment variables
 load_dotenv()
 
+# Bump when a prompt's text changes so cached responses for the old prompt are not served
+PROCESS_QUERY_PROMPT_VERSION = "2"
+EXTRACT_INTENT_PROMPT_VERSION = "1"
+
+# Keyword vocabularies (extendable via MILO_VOCAB_DIR/<name>.json, see keyword_matcher.py)
+SKILL_KEYWORDS = {
+    'python': 'Python', 'java': 'Java', 'javascript': 'JavaScript', 'react': 'React',
+    'machine learning': 'Machine Learning', 'data analysis': 'Data Analysis',
+    'project management': 'Project Management', 'leadership': 'Leadership',
+    'financial modeling': 'Financial Modeling', 'strategy': 'Strategy',
+    'marketing': 'Marketing', 'sales': 'Sales', 'consulting': 'Consulting'
+}
+
+# Ordered by priority: the first major in this list found in the text wins
+MAJOR_KEYWORDS = {
+    'computer science': 'Computer Science', 'cs': 'CS', 'engineering': 'Engineering',
+    'mathematics': 'Mathematics', 'math': 'Math', 'economics': 'Economics', 'business': 'Business',
+    'finance': 'Finance', 'political science': 'Political Science', 'psychology': 'Psychology',
+    'history': 'History', 'english': 'English', 'literature': 'Literature', 'biology': 'Biology',
+    'chemistry': 'Chemistry', 'physics': 'Physics', 'art': 'Art', 'music': 'Music',
+    'philosophy': 'Philosophy', 'sociology': 'Sociology'
+}
+
+INTEREST_KEYWORDS = [
+    'data science', 'machine learning', 'artificial intelligence', 'programming', 'coding',
+    'writing', 'journalism', 'communication', 'media', 'publishing',
+    'business', 'finance', 'consulting', 'entrepreneurship', 'startup',
+    'research', 'academia', 'teaching', 'education',
+    'healthcare', 'medicine', 'public health', 'policy',
+    'law', 'legal', 'government', 'politics', 'public service',
+    'art', 'design', 'creative', 'music', 'theater', 'film',
+    'environment', 'sustainability', 'climate', 'energy',
+    'international', 'global', 'foreign', 'language', 'culture',
+    'engineering', 'cars', 'automotive', 'mechanical', 'electrical',
+    'computer science', 'software', 'hardware', 'robotics',
+    'biology', 'chemistry', 'physics', 'mathematics', 'statistics',
+    'psychology', 'sociology', 'economics', 'political science',
+    'history', 'literature', 'philosophy', 'languages'
+]
+
+# Chat interests with an obvious industry that resolve_industry() does not already map
+INTEREST_INDUSTRIES = {
+    'data science': 'Technology', 'machine learning': 'Technology', 'artificial intelligence': 'Technology',
+    'programming': 'Technology', 'coding': 'Technology', 'hardware': 'Technology', 'robotics': 'Technology',
+    'writing': 'Media', 'communication': 'Media', 'film': 'Media', 'theater': 'Media',
+    'entrepreneurship': 'Venture Capital', 'startup': 'Venture Capital', 'economics': 'Finance',
+    'teaching': 'Education', 'research': 'Education', 'politics': 'Government', 'political science': 'Government',
+    'environment': 'Energy', 'sustainability': 'Energy', 'biology': 'Healthcare'
+}
+
+# Process-wide pool for CPU-bound matching over the dataset, shared by every MiloAI instance
+_matching_executor = None
+_matching_stats = {'jobs': 0, 'in_flight': 0, 'queue_wait_ms': 0.0, 'run_ms': 0.0, 'max_queue_wait_ms': 0.0}
+
+
+def get_matching_executor() -> ThreadPoolExecutor:
+    """Return the bounded matching pool (MILO_MATCHING_WORKERS threads), creating it on first use"""
+    global _matching_executor
+    if _matching_executor is None:
+        # Scans are pure Python, so extra threads add no throughput under the GIL, only contention with the
+        # event loop: every thread waiting on the GIL delays the next streamed token
+        _matching_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv('MILO_MATCHING_WORKERS', '1')),
+            thread_name_prefix='milo-matching'
+        )
+    return _matching_executor
+
+
+def _field(obj, name: str):
+    """Read a field from an SDK object or a plain dict (usage fields the installed SDK does not model arrive as dicts)"""
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
 class MiloAI:
     def __init__(self):
         # Get OpenAI API key from environment variable
         api_key = os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
-        self.client = AsyncOpenAI(api_key=api_key)
+        if not api_key and provider_requires_api_key():
+            raise ValueError("OPENAI_API_KEY environment variable is required (or set MILO_LLM_PROVIDER=fake)")
+        # One pooled, rate-limit-aware client per process (MILO_LLM_PROVIDER), shared by every MiloAI instance
+        self.client = get_llm_client(api_key)
+        self.model_router = get_model_router()
         self.yale_data = self.load_yale_data()
-        
-        # Conversation context management
-        self.conversation_sessions = {}
+        self.alumni_index = AlumniIndex(self.yale_data)
+        
+        # Rule-based fast path that answers obvious queries without the classification LLM call
+        self.fast_path_enabled = os.getenv('MILO_QUERY_FAST_PATH', '1') != '0'
+        self.fast_path_min_confidence = float(os.getenv('MILO_QUERY_FAST_PATH_MIN_CONFIDENCE', '0.8'))
+        self.query_stats = {'fast_path_hits': 0, 'llm_calls': 0, 'llm_latency_ms': 0.0}
+        
+        # Response cache for the deterministic (temperature 0.1) classification and intent calls
+        self.llm_cache = LLMCache() if os.getenv('MILO_LLM_CACHE', '1') != '0' else None
+        
+        # Identical inputs in flight at the same time share one execution
+        self.coalescing_enabled = os.getenv('MILO_COALESCE_REQUESTS', '1') != '0'
+        self.analyze_flight = SingleFlight('analyze_career')
+        self.query_flight = SingleFlight('process_user_query')
+        self.intent_flight = SingleFlight('extract_intent')
+        
+        # Concurrent pipelines per /analyze/batch request
+        self.batch_concurrency = int(os.getenv('MILO_BATCH_CONCURRENCY', '8'))
+        
+        # Rendered prompt blocks per dataset version and canonical target set
+        self.context_cache_size = int(os.getenv('MILO_CONTEXT_CACHE_SIZE', '1024'))
+        self.context_blocks = OrderedDict()
+        self.context_block_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+        
+        # Per-stage timings of recent analyze_career runs
+        self.analyze_timings = deque(maxlen=200)
+        
+        # Token budget for the action-plan prompt, and input sizes of recent plans
+        self.plan_prompt_budget = int(os.getenv('MILO_PLAN_PROMPT_BUDGET', '1600'))
+        self.plan_prompt_history = deque(maxlen=200)
+        
+        # Time budget per analysis; below MILO_PLAN_MIN_BUDGET_S left, the plan comes from the template instead of the LLM
+        self.analyze_deadline_s = float(os.getenv('MILO_ANALYZE_DEADLINE_S', '25'))
+        self.plan_min_budget_s = float(os.getenv('MILO_PLAN_MIN_BUDGET_S', '5'))
+        self.fallback_stats = {'template_plans': 0, 'rules_queries': 0, 'local_intents': 0}
+        
+        # Jobs run in the matching pool instead of on the event loop (counters are process-wide, like the pool)
+        self.matching_stats = _matching_stats
+        
+        # Conversation context management (bounded: LRU eviction, idle TTL and per-session message cap)
+        self.conversation_sessions = SessionStore()
+        
+        # Older chat turns are folded into a rolling summary; prompts carry it plus the newest raw messages
+        self.chat_recent_messages = int(os.getenv('MILO_CHAT_RECENT_MESSAGES', '4'))
+        self.chat_prompt_history = deque(maxlen=500)
+        self.chat_cache_stats = {'usage_reports': 0, 'prompt_tokens': 0, 'cached_tokens': 0}
+        
+        # Streams stopped early because the client disconnected, per call site, and the reply sizes used to estimate savings
+        self.cancelled_stream_stats = {}
+        self.completed_stream_tokens = {}
+        
+        # Real alumni and companies looked up for chat turns at these steps, within a small time budget
+        self.chat_retrieval_steps = {int(step) for step in os.getenv('MILO_CHAT_RETRIEVAL_STEPS', '2,4,5').split(',') if step.strip()}
+        self.chat_retrieval_budget_ms = float(os.getenv('MILO_CHAT_RETRIEVAL_BUDGET_MS', '50'))
+        self.chat_retrieval_alumni = int(os.getenv('MILO_CHAT_RETRIEVAL_ALUMNI', '5'))
+        self.chat_retrieval_scan = int(os.getenv('MILO_CHAT_RETRIEVAL_SCAN', '2000'))
+        self.chat_retrieval_cache = OrderedDict()
+        self.chat_retrieval_stats = {
+            'lookups': 0, 'skipped': 0, 'cache_hits': 0, 'injected': 0,
+            'over_budget': 0, 'failed': 0, 'wait_ms': 0.0
+        }
+        self.summary_stats = {'runs': 0, 'failed': 0, 'stale': 0, 'folded_messages': 0, 'latency_ms': 0.0}
+        self._summarizing = {}
         
         # Master prompt for the 6-step conversation flow
         self.master_prompt = """You are a Yale career advisor AI that helps students discover their path through a natural, conversational 6-step process. You have deep knowledge of Yale-specific resources, programs, and alumni networks.
@@ -331,43 +482,340 @@ Remember: Every suggestion should be something the student could actually do at
         
     async def analyze_career(self, user_input: str) -> dict:
         """Main function: dream job → actionable plan (Stockfish for careers)"""
+        if not self.coalescing_enabled:
+            return await self._analyze_career(user_input)
+        return await self.analyze_flight.do(normalize_input(user_input), lambda: self._analyze_career(user_input))
+    
+    async def _analyze_career(self, user_input: str, matching_memo: dict = None) -> dict:
+        """Run the full analysis pipeline for one input"""
+        
+        timings = {}
+        prompt_stats = {}
+        started = time.perf_counter()
+        token = start_deadline(self.analyze_deadline_s)
         
         try:
-            # Step 1: Process and classify the user query
-            processed_query = await self.process_user_query(user_input)
+            # Steps 1-5: query processing, intent, alumni, career paths and contacts
+            results = {}
+            async for stage, result in self._run_analysis_stages(user_input, timings, matching_memo):
+                results[stage] = result
             
-            # Step 2: Parse what they want from the processed query
-            intent = await self.extract_intent(processed_query['expanded_query'])
+            # Step 6: Generate comprehensive action plan (template plan if the LLM is out of time or failing)
+            plan = await self._timed(timings, 'create_comprehensive_plan', self._plan_or_template(results, user_input, prompt_stats))
             
-            # Step 3: Find alumni at target companies
-            target_company_alumni = self.find_alumni_at_companies(intent.get("target_companies", []))
-            
-            # Step 4: Find common career paths to target roles
-            career_paths = self.find_career_paths_to_roles(intent.get("target_roles", []))
-            
-            # Step 5: Find specific people to contact based on major/interests
-            people_to_contact = self.find_people_to_contact(intent, target_company_alumni)
-            
-            # Step 6: Generate comprehensive action plan
-            plan = await self.create_comprehensive_plan(intent, target_company_alumni, career_paths, people_to_contact, user_input, processed_query)
+            self._record_timings(timings, started)
             
             return {
-                "analysis": intent,
-                "processed_query": processed_query,
-                "target_company_alumni": target_company_alumni,
-                "career_paths": career_paths,
-                "people_to_contact": people_to_contact,
+                **results,
                 "action_plan": plan,
-                "success_odds": self.calculate_odds(target_company_alumni)
+                "success_odds": self.calculate_odds(results['target_company_alumni']),
+                "timings_ms": timings,
+                "prompt_tokens": prompt_stats
             }
             
         except Exception as e:
             import traceback
-            return {"error": f"Analysis failed: {str(e)}\nTraceback: {traceback.format_exc()}"}
+            traceback.print_exc()
+            return {"error": f"Analysis failed: {str(e)}"}
+        
+        finally:
+            reset_deadline(token)
+    
+    def _plan_skip_reason(self) -> str:
+        """Why the LLM plan should be skipped right now ('circuit_open' or 'deadline'), or None"""
+        if getattr(self.client, 'circuit_open', False):
+            return 'circuit_open'
+        left = remaining()
+        if left is not None and left < self.plan_min_budget_s:
+            return 'deadline'
+        return None
+    
+    async def _plan_or_template(self, results: dict, user_input: str, prompt_stats: dict) -> dict:
+        """LLM-written action plan, or the deterministic template plan when there is no time or the LLM fails"""
+        
+        args = (
+            results['analysis'], results['target_company_alumni'], results['career_paths'],
+            results['people_to_contact'], user_input, results['processed_query']
+        )
+        
+        reason = self._plan_skip_reason()
+        if reason is None:
+            try:
+                return await self.create_comprehensive_plan(*args, prompt_stats)
+            except Exception as e:
+                print(f"⚠️  Action plan LLM call failed, using template plan: {type(e).__name__}: {e}")
+                reason = type(e).__name__
+        
+        self.fallback_stats['template_plans'] += 1
+        return {"plan": self.build_template_plan(*args), "source": "template", "fallback_reason": reason}
+    
+    async def stream_career_analysis(self, user_input: str) -> AsyncGenerator[dict, None]:
+        """Stream analyze_career progressively: each stage as soon as it is ready, then the plan token by token"""
+        
+        timings = {}
+        prompt_stats = {}
+        started = time.perf_counter()
+        deadline_token = start_deadline(self.analyze_deadline_s)
+        
+        try:
+            results = {}
+            async for stage, result in self._run_analysis_stages(user_input, timings):
+                if 'first_event' not in timings:
+                    timings['first_event'] = round((time.perf_counter() - started) * 1000, 1)
+                results[stage] = result
+                yield {"type": stage, "data": result}
+            
+            args = (
+                results['analysis'], results['target_company_alumni'], results['career_paths'],
+                results['people_to_contact'], user_input, results['processed_query']
+            )
+            plan_started = time.perf_counter()
+            plan_source = 'llm'
+            reason = self._plan_skip_reason()
+            if reason is None:
+                try:
+                    # The deadline bounds the plan until its stream opens; once tokens flow the plan is sent in full
+                    async for token in self.stream_comprehensive_plan(*args, prompt_stats):
+                        if 'plan_first_token' not in timings:
+                            timings['plan_first_token'] = round((time.perf_counter() - plan_started) * 1000, 1)
+                        yield {"type": "action_plan_delta", "data": token}
+                except Exception as e:
+                    # Once tokens have been sent the plan cannot be swapped for the template
+                    if 'plan_first_token' in timings:
+                        raise
+                    print(f"⚠️  Action plan stream failed, using template plan: {type(e).__name__}: {e}")
+                    reason = type(e).__name__
+            
+            if reason is not None:
+                plan_source = 'template'
+                self.fallback_stats['template_plans'] += 1
+                timings['plan_first_token'] = round((time.perf_counter() - plan_started) * 1000, 1)
+                yield {"type": "action_plan_delta", "data": self.build_template_plan(*args)}
+            
+            timings['create_comprehensive_plan'] = round((time.perf_counter() - plan_started) * 1000, 1)
+            if plan_source == 'llm':
+                self._record_plan_prompt(prompt_stats, timings['create_comprehensive_plan'])
+            
+            self._record_timings(timings, started)
+            
+            yield {
+                "type": "done",
+                "data": {
+                    "success_odds": self.calculate_odds(results['target_company_alumni']),
+                    "timings_ms": timings,
+                    "prompt_tokens": prompt_stats,
+                    "plan_source": plan_source
+                }
+            }
+            
+        except Exception as e:
+            yield {"type": "error", "data": f"Analysis failed: {str(e)}"}
+        
+        finally:
+            try:
+                reset_deadline(deadline_token)
+            except (ValueError, RuntimeError):
+                pass  # generator finalized from another context; the deadline dies with that context
+    
+    async def analyze_batch(self, inputs: List[str], concurrency: int = None) -> AsyncGenerator[dict, None]:
+        """Analyze many inputs, yielding {index, user_input, result} per input as each finishes
+        
+        Duplicate inputs (after normalization) run once, at most `concurrency` (capped at MILO_BATCH_CONCURRENCY)
+        pipelines run at a time, and alumni/career-path matching is shared between inputs with the same targets.
+        """
+        groups = {}
+        for index, user_input in enumerate(inputs):
+            groups.setdefault(normalize_input(user_input), []).append(index)
+        
+        semaphore = asyncio.Semaphore(max(1, min(concurrency or self.batch_concurrency, self.batch_concurrency)))
+        matching_memo = {}
+        
+        async def run(indices: List[int]):
+            async with semaphore:
+                return indices, await self._analyze_career(inputs[indices[0]], matching_memo)
+        
+        tasks = [asyncio.create_task(run(indices)) for indices in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, result = await next_done
+                for index in indices:
+                    yield {"index": index, "user_input": inputs[index], "result": result}
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            for shared in matching_memo.values():
+                shared.cancel()
+    
+    async def _shared_matching(self, matching_memo: dict, func, targets: List[str]):
+        """Run a matching function in the pool, sharing the result between batch items with the same targets"""
+        if matching_memo is None:
+            return await self.run_matching(func, targets)
+        
+        key = (func.__name__, tuple(targets))
+        if key not in matching_memo:
+            matching_memo[key] = asyncio.ensure_future(self.run_matching(func, targets))
+        return copy.deepcopy(await asyncio.shield(matching_memo[key]))
+    
+    async def _run_analysis_stages(self, user_input: str, timings: dict, matching_memo: dict = None) -> AsyncGenerator[tuple, None]:
+        """Run the data stages of the analysis, yielding (result_key, result) as each becomes available"""
+        
+        pending = []
+        
+        try:
+            # Steps 1-2: classify the query while speculatively extracting intent from the raw input
+            intent_task = asyncio.create_task(self._timed(timings, 'extract_intent', self.extract_intent(user_input)))
+            pending.append(intent_task)
+            processed_query = await self._timed(timings, 'process_user_query', self.process_user_query(user_input))
+            yield 'processed_query', processed_query
+            
+            # Step 3: start alumni retrieval as soon as company names are known
+            target_companies = processed_query.get('detected_companies') or []
+            companies_detected = bool(target_companies)
+            if not companies_detected:
+                target_companies = (await intent_task).get("target_companies", [])
+            alumni_task = asyncio.create_task(self._timed(
+                timings, 'find_alumni_at_companies',
+                self._shared_matching(matching_memo, self.find_alumni_at_companies, target_companies)
+            ))
+            pending.append(alumni_task)
+            
+            # Companies named in the query: send their alumni without waiting for the intent LLM call
+            target_company_alumni = None
+            if companies_detected:
+                target_company_alumni = await alumni_task
+                yield 'target_company_alumni', target_company_alumni
+            
+            # Merge the speculative intent with the classification result
+            intent = await intent_task
+            intent["target_companies"] = target_companies
+            if not intent.get("target_roles"):
+                intent["target_roles"] = processed_query.get('detected_roles', [])
+            yield 'analysis', intent
+            
+            # Step 4: Find common career paths to target roles (overlaps with alumni retrieval)
+            paths_task = asyncio.create_task(self._timed(
+                timings, 'find_career_paths_to_roles',
+                self._shared_matching(matching_memo, self.find_career_paths_to_roles, intent.get("target_roles", []))
+            ))
+            pending.append(paths_task)
+            
+            if target_company_alumni is None:
+                target_company_alumni = await alumni_task
+                yield 'target_company_alumni', target_company_alumni
+            
+            yield 'career_paths', await paths_task
+            
+            # Step 5: Find specific people to contact based on major/interests
+            yield 'people_to_contact', await self.run_matching(self.find_people_to_contact, intent, target_company_alumni)
+        
+        finally:
+            for task in pending:
+                if not task.done():
+                    task.cancel()
+    
+    def _record_timings(self, timings: dict, started: float):
+        """Add total and serial-estimate timings and keep them for /metrics"""
+        timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+        timings['serial_estimate'] = round(sum(
+            ms for stage, ms in timings.items()
+            if stage not in ('total', 'first_event', 'plan_first_token')
+        ), 1)
+        self.analyze_timings.append(timings)
+    
+    async def _timed(self, timings: dict, stage: str, awaitable):
+        """Await a pipeline stage and record its wall-clock time in milliseconds"""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+    
+    async def run_matching(self, func, *args):
+        """Run a CPU-bound matching function in the bounded matching pool so the event loop stays responsive"""
+        submitted = time.perf_counter()
+        timing = {}
+        
+        def job():
+            timing['started'] = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                timing['finished'] = time.perf_counter()
+        
+        self.matching_stats['in_flight'] += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(get_matching_executor(), job)
+        finally:
+            self.matching_stats['in_flight'] -= 1
+            if 'started' in timing:
+                queue_wait_ms = (timing['started'] - submitted) * 1000
+                self.matching_stats['jobs'] += 1
+                self.matching_stats['queue_wait_ms'] += queue_wait_ms
+                self.matching_stats['run_ms'] += (timing.get('finished', timing['started']) - timing['started']) * 1000
+                self.matching_stats['max_queue_wait_ms'] = max(self.matching_stats['max_queue_wait_ms'], round(queue_wait_ms, 1))
+    
+    def get_matching_stats(self) -> dict:
+        """Matching pool size, load and average queue wait / run time across the process"""
+        jobs = self.matching_stats['jobs']
+        return {
+            'workers': get_matching_executor()._max_workers,
+            'jobs': jobs,
+            'in_flight': self.matching_stats['in_flight'],
+            'avg_queue_wait_ms': round(self.matching_stats['queue_wait_ms'] / jobs, 1) if jobs else 0.0,
+            'max_queue_wait_ms': self.matching_stats['max_queue_wait_ms'],
+            'avg_run_ms': round(self.matching_stats['run_ms'] / jobs, 1) if jobs else 0.0
+        }
+    
+    def get_pipeline_stats(self) -> dict:
+        """Average per-stage timings of recent analyze_career runs"""
+        if not self.analyze_timings:
+            return {'runs': 0}
+        
+        stages = {}
+        for timings in self.analyze_timings:
+            for stage, ms in timings.items():
+                stages.setdefault(stage, []).append(ms)
+        
+        stats = {'runs': len(self.analyze_timings)}
+        stats['avg_ms'] = {stage: round(sum(values) / len(values), 1) for stage, values in stages.items()}
+        if 'total' in stats['avg_ms'] and 'serial_estimate' in stats['avg_ms']:
+            stats['avg_overlap_saved_ms'] = round(stats['avg_ms']['serial_estimate'] - stats['avg_ms']['total'], 1)
+        return stats
 
     async def process_user_query(self, user_input: str) -> dict:
         """Intelligent query processing layer that classifies and expands user queries"""
         
+        # Obvious queries are classified locally; only low-confidence ones go to the LLM
+        local_query = classify_query(user_input)
+        if self.fast_path_enabled and local_query['confidence'] >= self.fast_path_min_confidence:
+            self.query_stats['fast_path_hits'] += 1
+            return local_query
+        
+        try:
+            if not self.coalescing_enabled:
+                return await self._process_user_query_llm(user_input)
+            processed_query = await self.query_flight.do(normalize_input(user_input), lambda: self._process_user_query_llm(user_input))
+            processed_query['original_query'] = user_input
+            return processed_query
+        except Exception as e:
+            # LLM unavailable (circuit open, deadline, upstream errors): use the low-confidence local classification
+            print(f"⚠️  Query processing LLM call failed, using rules: {type(e).__name__}: {e}")
+            self.fallback_stats['rules_queries'] += 1
+            return {**local_query, 'source': 'rules_fallback'}
+    
+    async def _process_user_query_llm(self, user_input: str) -> dict:
+        """Classify a query with the LLM, going through the response cache"""
+        
+        route = self.model_router.choose('process_user_query', count_tokens(user_input))
+        model = route[0]
+        cache_key = LLMCache.make_key('process_user_query', user_input, model, PROCESS_QUERY_PROMPT_VERSION)
+        if self.llm_cache:
+            cached = await self.llm_cache.get(cache_key)
+            if cached:
+                cached.update({'original_query': user_input, 'source': 'cache'})
+                return cached
+        
         prompt = f"""
         You are an intelligent career query processor for Yale students. Analyze this query and understand the student's intent, then expand it intelligently.
         
@@ -394,13 +842,7 @@ Remember: Every suggestion should be something the student could actually do at
            - For general queries: Suggest the most relevant path based on Yale student patterns
         
         4. **Yale-Specific Industry Mappings:**
-           - "IB" or "investment banking" → ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "Citigroup", "Bank of America"]
-           - "tech" or "technology" → ["Google", "Microsoft", "Apple", "Amazon", "Meta", "Netflix"]
-           - "consulting" → ["McKinsey", "Bain", "BCG", "Deloitte", "PwC"]
-           - "finance" → ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "BlackRock", "Vanguard"]
-           - "startups" → ["Stripe", "Airbnb", "Uber", "Lyft", "Pinterest"]
-           - "PE" or "private equity" → ["KKR", "Blackstone", "Apollo", "Carlyle", "TPG"]
-           - "VC" or "venture capital" → ["Andreessen Horowitz", "Sequoia", "Kleiner Perkins", "Accel", "Benchmark"]
+           {format_industry_mappings("           ")}
         
         Return ONLY valid JSON:
         {{
@@ -415,15 +857,21 @@ Remember: Every suggestion should be something the student could actually do at
         }}
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        started = time.perf_counter()
+        response = await self.model_router.create(
+            self.client, 'process_user_query', route=route,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=400
+            temperature=0.1
         )
+        self.query_stats['llm_calls'] += 1
+        self.query_stats['llm_latency_ms'] += (time.perf_counter() - started) * 1000
         
         try:
-            return json.loads(response.choices[0].message.content)
+            processed_query = json.loads(response.choices[0].message.content)
+            processed_query['source'] = 'llm'
+            if self.llm_cache:
+                await self.llm_cache.set(cache_key, processed_query)
+            return processed_query
         except:
             # Fallback if JSON parsing fails
             return {
@@ -433,11 +881,54 @@ Remember: Every suggestion should be something the student could actually do at
                 "detected_industry": "Technology",
                 "detected_companies": [],
                 "detected_roles": [],
-                "confidence": 0.5
+                "confidence": 0.5,
+                "source": "llm"
             }
     
+    def get_coalescing_stats(self) -> dict:
+        """How often identical in-flight requests shared one execution"""
+        return {
+            'enabled': self.coalescing_enabled,
+            **{flight.name: flight.get_stats() for flight in (self.analyze_flight, self.query_flight, self.intent_flight)}
+        }
+    
+    def get_query_stats(self) -> dict:
+        """Report rule fast-path hit rate and the LLM latency it saved"""
+        hits = self.query_stats['fast_path_hits']
+        llm_calls = self.query_stats['llm_calls']
+        total = hits + llm_calls
+        avg_llm_latency_ms = self.query_stats['llm_latency_ms'] / llm_calls if llm_calls else None
+        
+        return {
+            'queries': total,
+            'fast_path_hits': hits,
+            'llm_calls': llm_calls,
+            'hit_rate': round(hits / total, 3) if total else 0.0,
+            'avg_llm_latency_ms': round(avg_llm_latency_ms, 1) if avg_llm_latency_ms is not None else None,
+            'estimated_latency_saved_ms': round(hits * avg_llm_latency_ms, 1) if avg_llm_latency_ms is not None else None
+        }
+    
     async def extract_intent(self, user_input: str) -> dict:
         """Use GPT to parse career goals with better role extraction"""
+        try:
+            if not self.coalescing_enabled:
+                return await self._extract_intent(user_input)
+            return await self.intent_flight.do(normalize_input(user_input), lambda: self._extract_intent(user_input))
+        except Exception as e:
+            print(f"⚠️  Intent extraction LLM call failed, using rules: {type(e).__name__}: {e}")
+            self.fallback_stats['local_intents'] += 1
+            return local_intent(user_input)
+    
+    async def _extract_intent(self, user_input: str) -> dict:
+        """Extract intent with the LLM, going through the response cache"""
+        
+        route = self.model_router.choose('extract_intent', count_tokens(user_input))
+        model = route[0]
+        cache_key = LLMCache.make_key('extract_intent', user_input, model, EXTRACT_INTENT_PROMPT_VERSION)
+        if self.llm_cache:
+            cached = await self.llm_cache.get(cache_key)
+            if cached:
+                return cached
         
         prompt = f"""
         Parse this Yale student's career goal and return ONLY valid JSON:
@@ -457,15 +948,17 @@ Remember: Every suggestion should be something the student could actually do at
         For example: "work at Google" → roles: ["Software Engineer", "Product Manager", "Business Analyst"]
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await self.model_router.create(
+            self.client, 'extract_intent', route=route,
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.1,
-            max_tokens=300
+            temperature=0.1
         )
         
         try:
-            return json.loads(response.choices[0].message.content)
+            intent = json.loads(response.choices[0].message.content)
+            if self.llm_cache:
+                await self.llm_cache.set(cache_key, intent)
+            return intent
         except:
             return {
                 "target_companies": ["Technology Companies"],
@@ -730,22 +1223,8 @@ Remember: Every suggestion should be something the student could actually do at
         if not educations_details:
             return "Unknown"
         
-        # Look for common major patterns
-        major_patterns = [
-            r'Computer Science', r'CS', r'Engineering', r'Mathematics', r'Math',
-            r'Economics', r'Business', r'Finance', r'Political Science', r'Psychology',
-            r'History', r'English', r'Literature', r'Biology', r'Chemistry',
-            r'Physics', r'Art', r'Music', r'Philosophy', r'Sociology'
-        ]
-        
-        for pattern in major_patterns:
-            if re.search(pattern, educations_details, re.IGNORECASE):
-                # Return the actual major found, not the regex pattern
-                match = re.search(pattern, educations_details, re.IGNORECASE)
-                if match:
-                    return match.group(0)
-        
-        return "Liberal Arts"
+        # Single pass over the text; earliest major in MAJOR_KEYWORDS wins
+        return get_matcher('majors', MAJOR_KEYWORDS).best_label(educations_details, "Liberal Arts")
     
     def build_career_path(self, alumni: dict) -> str:
         """Build career progression string from alumni data"""
@@ -854,58 +1333,185 @@ Remember: Every suggestion should be something the student could actually do at
                 }
             ]
     
-    async def create_comprehensive_plan(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None) -> dict:
+    async def create_comprehensive_plan(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None, prompt_stats: dict = None) -> dict:
         """Create clean, ChatGPT-style action plan with structured data"""
         
-        # Extract student name
-        student_name = self.extract_student_name(user_input, intent)
+        prompt_stats = {} if prompt_stats is None else prompt_stats
+        prompt = self._build_plan_prompt(intent, target_company_alumni, career_paths, people_to_contact, user_input, processed_query, prompt_stats)
         
-        # Count alumni at target companies
-        total_alumni = len(target_company_alumni)
-        total_paths = len(career_paths)
-        top_contacts = len(people_to_contact)
+        started = time.perf_counter()
+        response = await self.model_router.create(
+            self.client, 'action_plan', prompt_stats.get('input_tokens', 0),
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.3
+        )
         
-        # Get primary target company or industry
-        if processed_query and processed_query.get('query_type') == 'industry':
-            target_company = processed_query.get('detected_industry', 'your target industry')
-        else:
-            target_company = intent.get('target_companies', ['your target company'])[0] if intent.get('target_companies') else 'your target company'
+        usage = getattr(response, 'usage', None)
+        if usage is not None and getattr(usage, 'prompt_tokens', None):
+            prompt_stats['usage_prompt_tokens'] = usage.prompt_tokens
+        self._record_plan_prompt(prompt_stats, (time.perf_counter() - started) * 1000)
         
-        # Create the personalized greeting with context about query processing
-        if processed_query and processed_query.get('query_type') == 'industry':
-            personalized_greeting = f"Hey {student_name}, you want to work in {target_company}? I found Yale alumni at top companies in this industry. Here are the {total_alumni} Yale alumni currently at relevant companies, the {total_paths} most common paths to get hired, and the {top_contacts} people you should talk to first based on your major and interests."
-        else:
-            personalized_greeting = f"Hey {student_name}, you want to work at {target_company}? Here are the {total_alumni} Yale alumni currently there, the {total_paths} most common paths to get hired, and the {top_contacts} people you should talk to first based on your major and interests."
+        return {"plan": response.choices[0].message.content, "source": "llm"}
+    
+    async def stream_comprehensive_plan(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None, prompt_stats: dict = None) -> AsyncGenerator[str, None]:
+        """Stream the action plan token by token"""
         
-        # Structure the alumni data cleanly
-        alumni_summary = self.format_alumni_data(target_company_alumni)
-        paths_summary = self.format_career_paths(career_paths)
-        contacts_summary = self.format_people_to_contact(people_to_contact)
+        prompt = self._build_plan_prompt(intent, target_company_alumni, career_paths, people_to_contact, user_input, processed_query, prompt_stats)
         
-        # Create a much cleaner, more concise response
-        context = f"""
-        {personalized_greeting}
+        stream = await self.model_router.create(
+            self.client, 'action_plan', count_tokens(prompt),
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            temperature=0.3
+        )
+        
+        received = []
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    received.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        except (asyncio.CancelledError, GeneratorExit):
+            # The client disconnected: stop generation upstream instead of draining the rest of the plan
+            close_stream(stream)
+            self._record_cancelled_stream('action_plan', "".join(received))
+            raise
+        self._record_completed_stream('action_plan', "".join(received))
+    
+    def _record_plan_prompt(self, prompt_stats: dict, latency_ms: float):
+        """Keep the plan prompt size and LLM latency of a request for /metrics"""
+        if prompt_stats:
+            self.plan_prompt_history.append({**prompt_stats, 'latency_ms': round(latency_ms, 1)})
+    
+    def get_fallback_stats(self) -> dict:
+        """How often the pipeline answered without the LLM, and whether the circuit breaker is open"""
+        return {
+            **self.fallback_stats,
+            'circuit_open': getattr(self.client, 'circuit_open', False),
+            'analyze_deadline_s': self.analyze_deadline_s,
+            'plan_min_budget_s': self.plan_min_budget_s
+        }
+    
+    def get_plan_prompt_stats(self) -> dict:
+        """Average input tokens, trimming rate and plan latency of recent action-plan prompts"""
+        history = list(self.plan_prompt_history)
+        if not history:
+            return {'requests': 0, 'budget': self.plan_prompt_budget}
+        
+        return {
+            'requests': len(history),
+            'budget': self.plan_prompt_budget,
+            'avg_input_tokens': round(sum(entry['input_tokens'] for entry in history) / len(history), 1),
+            'avg_untrimmed_tokens': round(sum(entry['original_tokens'] for entry in history) / len(history), 1),
+            'trimmed_rate': round(sum(1 for entry in history if entry['trimmed']) / len(history), 3),
+            'avg_latency_ms': round(sum(entry['latency_ms'] for entry in history) / len(history), 1)
+        }
+    
+    def _build_plan_prompt(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None, prompt_stats: dict = None) -> str:
+        """Build the action-plan prompt from the analysis results, fitted to MILO_PLAN_PROMPT_BUDGET tokens"""
         
-        **QUERY ANALYSIS:**
+        total_alumni = len(target_company_alumni)
+        total_paths = len(career_paths)
+        top_contacts = len(people_to_contact)
+        target_company = self._plan_target(intent, processed_query)
+        personalized_greeting = self._plan_greeting(intent, target_company_alumni, career_paths, people_to_contact, user_input, processed_query)
+        
+        query_analysis = f"""**QUERY ANALYSIS:**
         Original Query: "{processed_query.get('original_query', user_input) if processed_query else user_input}"
         Query Type: {processed_query.get('query_type', 'general') if processed_query else 'general'}
         Detected Industry: {processed_query.get('detected_industry', 'Not specified') if processed_query else 'Not specified'}
-        Expanded Companies: {', '.join(processed_query.get('detected_companies', [])) if processed_query else 'Not specified'}
+        Expanded Companies: {', '.join(processed_query.get('detected_companies', [])) if processed_query else 'Not specified'}"""
+        
+        instructions = self._plan_instructions(personalized_greeting)
+        
+        # Sections in the order they appear; lower priority numbers are kept longest when over budget
+        sections = [
+            PromptSection('instructions', instructions, 0),
+            PromptSection('greeting', personalized_greeting, 0),
+            PromptSection('alumni', f"**YALE ALUMNI AT {target_company.upper()}** ({total_alumni} total)\n{self.format_alumni_data(target_company_alumni, intent.get('target_companies'))}", 1, 120),
+            PromptSection('contacts', f"**PEOPLE TO CONTACT FIRST** ({top_contacts} prioritized)\n{self.format_people_to_contact(people_to_contact)}", 2, 80),
+            PromptSection('query_analysis', query_analysis, 3, 0),
+            PromptSection('paths', f"**COMMON CAREER PATHS** ({total_paths} paths)\n{self.format_career_paths(career_paths, intent.get('target_roles'))}", 4, 0),
+        ]
+        fitted, report = fit_sections(sections, self.plan_prompt_budget)
         
-        **YALE ALUMNI AT {target_company.upper()}** ({total_alumni} total)
-        {alumni_summary}
+        context = "\n        \n        ".join(
+            fitted[name] for name in ('greeting', 'query_analysis', 'alumni', 'contacts', 'paths') if fitted[name]
+        )
+        prompt = instructions.replace("{context}", context, 1)
         
-        **PEOPLE TO CONTACT FIRST** ({top_contacts} prioritized)
-        {contacts_summary}
+        if prompt_stats is not None:
+            prompt_stats.update(report)
+            prompt_stats['input_tokens'] = count_tokens(prompt)
         
-        **COMMON CAREER PATHS** ({total_paths} paths)
-        {paths_summary}
-        """
+        return prompt
+    
+    def _plan_target(self, intent: dict, processed_query: dict = None) -> str:
+        """Primary target company, or the industry for industry queries"""
+        if processed_query and processed_query.get('query_type') == 'industry':
+            return processed_query.get('detected_industry', 'your target industry')
+        return intent.get('target_companies', ['your target company'])[0] if intent.get('target_companies') else 'your target company'
+    
+    def _plan_greeting(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None) -> str:
+        """Personalized opening line of the action plan"""
         
-        prompt = f"""
+        student_name = self.extract_student_name(user_input, intent)
+        target_company = self._plan_target(intent, processed_query)
+        total_alumni = len(target_company_alumni)
+        total_paths = len(career_paths)
+        top_contacts = len(people_to_contact)
+        
+        if processed_query and processed_query.get('query_type') == 'industry':
+            return f"Hey {student_name}, you want to work in {target_company}? I found Yale alumni at top companies in this industry. Here are the {total_alumni} Yale alumni currently at relevant companies, the {total_paths} most common paths to get hired, and the {top_contacts} people you should talk to first based on your major and interests."
+        return f"Hey {student_name}, you want to work at {target_company}? Here are the {total_alumni} Yale alumni currently there, the {total_paths} most common paths to get hired, and the {top_contacts} people you should talk to first based on your major and interests."
+    
+    def build_template_plan(self, intent: dict, target_company_alumni: List[dict], career_paths: List[dict], people_to_contact: List[dict], user_input: str = "", processed_query: dict = None) -> str:
+        """Deterministic action plan built from the analysis data alone, used when the LLM cannot answer in time"""
+        
+        target_company = self._plan_target(intent, processed_query)
+        roles = intent.get('target_roles') or ['your target role']
+        lines = [self._plan_greeting(intent, target_company_alumni, career_paths, people_to_contact, user_input, processed_query), ""]
+        
+        lines.append("**IMMEDIATE ACTIONS (Next 7 Days):**")
+        for person in people_to_contact[:3]:
+            position = f"{person.get('position')} at {person.get('company')}" if person.get('position') else person.get('company', '')
+            lines.append(f"- Reach out to {person.get('name', 'a Yale alum')} ({position}, {person.get('major', 'Yale')} '{person.get('graduation_year', 'XX')}) with a short note about their path.")
+        if not people_to_contact:
+            lines.append(f"- Search the Yale alumni directory for people working in {target_company} and send two short introduction notes.")
+        lines.append("- Book a meeting with the Office of Career Strategy to review your resume for these roles.")
+        lines.append("")
+        
+        lines.append("**THIS SEMESTER:**")
+        skill_counts = {}
+        for alumni in target_company_alumni:
+            for skill in alumni.get('key_skills', []):
+                skill_counts[skill] = skill_counts.get(skill, 0) + 1
+        top_skills = sorted(skill_counts, key=lambda skill: (-skill_counts[skill], skill))[:3]
+        if top_skills:
+            lines.append(f"- Build the skills these alumni share most: {', '.join(top_skills)}.")
+        lines.append(f"- Set up two informational interviews a month with people working as {', '.join(roles[:2])}.")
+        lines.append("- Join a student organization related to this field and take on one concrete project.")
+        lines.append("")
+        
+        lines.append("**CAREER TIMELINE:**")
+        for path in career_paths[:3]:
+            lines.append(f"- {path['path']} ({path['count']} Yale alumni)")
+        if not career_paths:
+            lines.append(f"- Aim for a relevant summer internship, then convert it into a full-time {roles[0]} offer.")
+        lines.append("")
+        
+        lines.append("**SUCCESS FACTORS:**")
+        lines.append("- Consistent outreach to the alumni above, concrete projects, and a clear story about why this path fits you.")
+        
+        return "\n".join(lines)
+    
+    def _plan_instructions(self, personalized_greeting: str) -> str:
+        """Fixed instruction block of the action-plan prompt, with a {context} slot for the data sections"""
+        
+        return f"""
         You are Milo, Yale's AI career strategist. You're having a conversation with a Yale student about their career goals. Be conversational, insightful, and genuinely helpful - like ChatGPT but specialized in Yale career guidance.
         
-        {context}
+        {{context}}
         
         IMPORTANT: Start with exactly this greeting: "{personalized_greeting}"
         
@@ -937,15 +1543,6 @@ Remember: Every suggestion should be something the student could actually do at
         
         Write like you're having a conversation. Use "I," "you," contractions, and natural language. Be encouraging, specific, and genuinely helpful. Make them feel like they have a personal career advisor who knows the Yale network inside and out.
         """
-        
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        return {"plan": response.choices[0].message.content}
 
     def extract_student_name(self, user_input: str, intent: dict) -> str:
         """Extract student name from input"""
@@ -973,8 +1570,46 @@ Remember: Every suggestion should be something the student could actually do at
         
         return student_name
 
-    def format_alumni_data(self, alumni_list: List[dict]) -> str:
-        """Format alumni data with detailed career information"""
+    def _context_block(self, kind: str, items: List[dict], render, targets: List[str] = None) -> str:
+        """Return a rendered prompt block from the context cache, rendering it on a miss
+        
+        Blocks are keyed by dataset version plus the canonical target set that produced the items
+        (or, without targets, the identity of the items themselves).
+        """
+        if targets is not None:
+            identity = (tuple(sorted({target.lower().strip() for target in targets if target})), len(items))
+        else:
+            identity = tuple((item.get('name'), item.get('position'), item.get('company')) for item in items)
+        key = (kind, self.alumni_index.version, identity)
+        
+        block = self.context_blocks.get(key)
+        if block is not None:
+            self.context_blocks.move_to_end(key)
+            self.context_block_stats['hits'] += 1
+            return block
+        
+        self.context_block_stats['misses'] += 1
+        block = render(items)
+        self.context_blocks[key] = block
+        if len(self.context_blocks) > self.context_cache_size:
+            self.context_blocks.popitem(last=False)
+            self.context_block_stats['evictions'] += 1
+        return block
+    
+    def get_context_block_stats(self) -> dict:
+        lookups = self.context_block_stats['hits'] + self.context_block_stats['misses']
+        return {
+            **self.context_block_stats,
+            'entries': len(self.context_blocks),
+            'hit_rate': round(self.context_block_stats['hits'] / lookups, 3) if lookups else 0.0,
+            'dataset_version': self.alumni_index.version
+        }
+    
+    def format_alumni_data(self, alumni_list: List[dict], target_companies: List[str] = None) -> str:
+        """Format alumni data with detailed career information, memoized per target company set"""
+        return self._context_block('alumni', alumni_list, self._render_alumni_data, target_companies)
+    
+    def _render_alumni_data(self, alumni_list: List[dict]) -> str:
         if not alumni_list:
             return "No Yale alumni found at this company."
         
@@ -1020,8 +1655,11 @@ Remember: Every suggestion should be something the student could actually do at
         
         return "\n\n".join(formatted)
 
-    def format_career_paths(self, career_paths: List[dict]) -> str:
-        """Format career paths with detailed examples and progression"""
+    def format_career_paths(self, career_paths: List[dict], target_roles: List[str] = None) -> str:
+        """Format career paths with detailed examples and progression, memoized per target role set"""
+        return self._context_block('career_paths', career_paths, self._render_career_paths, target_roles)
+    
+    def _render_career_paths(self, career_paths: List[dict]) -> str:
         if not career_paths:
             return "No common career paths found. Consider exploring different roles or industries."
         
@@ -1055,7 +1693,10 @@ Remember: Every suggestion should be something the student could actually do at
         return "\n\n".join(formatted)
 
     def format_people_to_contact(self, people: List[dict]) -> str:
-        """Format people to contact with specific outreach strategies"""
+        """Format people to contact with specific outreach strategies, memoized per contact list"""
+        return self._context_block('contacts', people, self._render_people_to_contact)
+    
+    def _render_people_to_contact(self, people: List[dict]) -> str:
         if not people:
             return "No specific people identified for contact."
         
@@ -1140,11 +1781,12 @@ Remember: Every suggestion should be something the student could actually do at
         Be specific and actionable. Use Yale-specific resources where possible.
         """
         
-        response = await self.client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        # Same route as the comprehensive plan, but this shorter plan has always been capped at 800 tokens
+        model, max_tokens = self.model_router.choose('action_plan', count_tokens(prompt))
+        response = await self.model_router.create(
+            self.client, 'action_plan', route=(model, min(max_tokens, 800)),
             messages=[{"role": "user", "content": prompt}],
-            temperature=0.3,
-            max_tokens=800
+            temperature=0.3
         )
         
         return {"plan": response.choices[0].message.content}
@@ -1226,22 +1868,16 @@ Remember: Every suggestion should be something the student could actually do at
     
     def extract_skills_from_experience(self, experience_history: List[dict]) -> List[str]:
         """Extract key skills from experience descriptions"""
-        skills = set()
-        skill_keywords = {
-            'python': 'Python', 'java': 'Java', 'javascript': 'JavaScript', 'react': 'React',
-            'machine learning': 'Machine Learning', 'data analysis': 'Data Analysis',
-            'project management': 'Project Management', 'leadership': 'Leadership',
-            'financial modeling': 'Financial Modeling', 'strategy': 'Strategy',
-            'marketing': 'Marketing', 'sales': 'Sales', 'consulting': 'Consulting'
-        }
+        skill_matcher = get_matcher('skills', SKILL_KEYWORDS)
+        skills = []
         
         for exp in experience_history:
-            description = (exp.get('description', '') + ' ' + exp.get('title', '')).lower()
-            for keyword, skill in skill_keywords.items():
-                if keyword in description:
-                    skills.add(skill)
+            description = f"{exp.get('description') or ''} {exp.get('title') or ''}"
+            for skill in skill_matcher.find_labels(description):
+                if skill not in skills:
+                    skills.append(skill)
         
-        return list(skills)[:5]  # Return top 5 skills
+        return skills[:5]  # Return top 5 skills
     
     def calculate_networking_score(self, alumni: dict) -> int:
         """Calculate networking potential score"""
@@ -1283,8 +1919,11 @@ Remember: Every suggestion should be something the student could actually do at
         
         return min(score, 100)
     
-    def analyze_industry_trends(self, target_company_alumni: List[dict]) -> str:
-        """Analyze industry trends from alumni data"""
+    def analyze_industry_trends(self, target_company_alumni: List[dict], target_companies: List[str] = None) -> str:
+        """Analyze industry trends from alumni data, memoized per target company set"""
+        return self._context_block('industry_trends', target_company_alumni, self._render_industry_trends, target_companies)
+    
+    def _render_industry_trends(self, target_company_alumni: List[dict]) -> str:
         if not target_company_alumni:
             return "No industry data available"
         
@@ -1352,94 +1991,270 @@ Remember: Every suggestion should be something the student could actually do at
     
     # ===== NEW STREAMING CHAT METHODS =====
     
-    def get_or_create_session(self, session_id: str) -> dict:
-        """Get or create a conversation session with context"""
-        if session_id not in self.conversation_sessions:
-            self.conversation_sessions[session_id] = {
-                'messages': [],
-                'current_step': 1,
-                'student_interests': [],
-                'career_paths': [],
-                'created_at': datetime.now().isoformat(),
-                'last_updated': datetime.now().isoformat()
-            }
-        return self.conversation_sessions[session_id]
+    async def get_or_create_session(self, session_id: str) -> dict:
+        """Get or create a conversation session with context, reloading it from the session backend if needed"""
+        return await self.conversation_sessions.fetch_or_create(session_id)
     
-    def update_session(self, session_id: str, **updates):
+    async def update_session(self, session_id: str, **updates):
         """Update session data"""
-        if session_id in self.conversation_sessions:
-            self.conversation_sessions[session_id].update(updates)
-            self.conversation_sessions[session_id]['last_updated'] = datetime.now().isoformat()
+        async with self.conversation_sessions.turn(session_id, load=False):
+            session = await self.conversation_sessions.fetch(session_id)
+            if session is not None:
+                session.update(updates)
+                session['last_updated'] = datetime.now().isoformat()
+                self.conversation_sessions.mark_dirty(session_id, session)
     
-    async def stream_chat_response(self, user_message: str, session_id: str = "default") -> AsyncGenerator[str, None]:
-        """Stream chat response using the new 6-step conversation flow"""
+    async def stream_chat_response(self, user_message: str, session_id: str = "default", turn_info: dict = None) -> AsyncGenerator[str, None]:
+        """Stream chat response using the new 6-step conversation flow
+
+        If given, turn_info['message_seq'] is set to the seq of the stored reply (complete or partial).
+        """
+        turn_info = {} if turn_info is None else turn_info
         try:
-            # Get or create session
-            session = self.get_or_create_session(session_id)
-            
-            # Add user message to conversation history
-            session['messages'].append({
-                'role': 'user',
-                'content': user_message,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Build conversation context
-            conversation_context = self._build_conversation_context(session)
-            
-            # Create the full prompt with context
-            full_prompt = f"{self.master_prompt}\n\n{conversation_context}"
-            
-            # Stream response from OpenAI
-            stream = await self.client.chat.completions.create(
-                model="gpt-4o",  # Using latest model
-                messages=[
-                    {"role": "system", "content": full_prompt}
-                ],
-                stream=True,
-                temperature=0.7,
-                max_tokens=2000
-            )
-            
-            # Collect full response for session storage
-            full_response = ""
-            
-            async for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
-                    content = chunk.choices[0].delta.content
-                    full_response += content
-                    yield content
-            
-            # Add assistant response to conversation history
-            session['messages'].append({
-                'role': 'assistant',
-                'content': full_response,
-                'timestamp': datetime.now().isoformat()
-            })
-            
-            # Update session with extracted information
-            self._extract_and_store_session_data(session, user_message, full_response)
+            # One turn at a time per session (across workers when MILO_SESSION_SHARED=1); the session
+            # is reloaded fresh for the turn and saved before the next turn on it can start
+            async with self.conversation_sessions.turn(session_id) as session:
+                # Add user message to conversation history
+                self.conversation_sessions.append_message(session_id, session, 'user', user_message)
+                
+                # Look up relevant alumni in the matching pool while the prompt is assembled; the
+                # retrieval budget runs from submission, so assembly time is not charged to it
+                retrieval = await self._start_chat_retrieval(session, user_message)
+                retrieval_started = time.perf_counter()
+                
+                # Build the request: static system prompt, summary, role-tagged history, then step guidance
+                messages = self._build_chat_messages(session)
+                if retrieval is not None:
+                    grounding = await self._chat_grounding_message(retrieval, retrieval_started)
+                    if grounding:
+                        messages.insert(-1, grounding)  # after the history, before the step guidance
+                prompt_entry = self._record_chat_prompt(session, messages)
+                
+                # Stream response from OpenAI (model and max_tokens chosen by the 'chat' route); the final
+                # usage chunk reports how much of the prompt prefix the provider served from its cache
+                stream = None
+                full_response = ""
+                try:
+                    stream = await self.model_router.create(
+                        self.client, 'chat', prompt_entry['prompt_tokens'],
+                        messages=messages,
+                        stream=True,
+                        temperature=0.7,
+                        extra_body={"stream_options": {"include_usage": True}}
+                    )
+                    
+                    async for chunk in stream:
+                        usage = getattr(chunk, 'usage', None)
+                        if usage:
+                            self._record_chat_usage(prompt_entry, usage)
+                        if not chunk.choices:
+                            continue
+                        if chunk.choices[0].delta.content is not None:
+                            content = chunk.choices[0].delta.content
+                            full_response += content
+                            yield content
+                except (asyncio.CancelledError, GeneratorExit):
+                    # The client disconnected: stop generation upstream and keep the part of the reply produced so far
+                    if stream is not None:
+                        close_stream(stream)
+                    self._record_cancelled_stream('chat', full_response)
+                    if full_response:
+                        self.conversation_sessions.append_message(session_id, session, 'assistant', full_response)
+                        session['last_updated'] = datetime.now().isoformat()
+                        turn_info['message_seq'] = session['message_count'] - 1
+                    raise
+                self._record_completed_stream('chat', full_response)
+                
+                # Add assistant response to conversation history
+                self.conversation_sessions.append_message(session_id, session, 'assistant', full_response)
+                session['last_updated'] = datetime.now().isoformat()
+                turn_info['message_seq'] = session['message_count'] - 1
+                
+                # Update session with extracted information (persisted by the session store)
+                self._extract_and_store_session_data(session, user_message, full_response)
+                self.conversation_sessions.mark_dirty(session_id, session)
             
+            # Fold older turns into the summary in the background, after the session lock is released
+            self._schedule_summary(session_id, session)
+                
         except Exception as e:
+            # Nothing was stored if the turn failed (e.g. the shared session save), so there is no reply to resume from
+            turn_info.pop('message_seq', None)
             error_msg = f"Error in chat: {str(e)}"
             yield error_msg
             print(f"Chat error: {error_msg}")
     
-    def _build_conversation_context(self, session: dict) -> str:
-        """Build conversation context from session history"""
-        if not session['messages']:
-            return "This is the start of a new conversation. Follow Step 1 of the 6-step process."
+    def _unsummarized_messages(self, session: dict) -> List[tuple]:
+        """(seq, message) for the stored messages not yet folded into the summary"""
+        first_seq = session.get('message_count', len(session['messages'])) - len(session['messages'])
+        summarized_through = session.get('summarized_through', 0)
+        return [(seq, msg) for seq, msg in enumerate(session['messages'], first_seq) if seq >= summarized_through]
+    
+    def _schedule_summary(self, session_id: str, session: dict):
+        """Start a background summary update once a full turn has left the raw-message window"""
+        if session_id in self._summarizing:
+            return
+        to_fold = self._unsummarized_messages(session)[:-self.chat_recent_messages or None]
+        if len(to_fold) < 2:
+            return
+        
+        base = session.get('summarized_through', 0)
+        end = to_fold[-1][0] + 1
+        task = asyncio.create_task(self._update_summary(session_id, session.get('summary', ''), base, end, [msg for _, msg in to_fold]))
+        self._summarizing[session_id] = task
+        task.add_done_callback(lambda done, session_id=session_id: self._summarizing.pop(session_id, None))
+    
+    async def _update_summary(self, session_id: str, previous_summary: str, base: int, end: int, messages: List[dict]):
+        """Fold messages [base, end) into the session's summary, unless another update got there first"""
         
-        context_parts = []
+        transcript = "\n".join(
+            f"{'Student' if msg['role'] == 'user' else 'Milo'}: {msg['content'][:2000]}" for msg in messages
+        )
+        prompt = f"""You are a conversation summarizer for Milo, a Yale career advisor. Update the running summary of a conversation with a student using the new messages below.
+        
+        Keep every fact that matters for advising them: interests, classes, activities, goals, career paths discussed, concrete actions suggested and anything they decided or rejected. Drop greetings and filler. Write at most 150 words of plain prose.
+        
+        Current summary:
+        {previous_summary or "(none yet)"}
+        
+        New messages:
+        {transcript}
+        
+        Return only the updated summary."""
+        
+        started = time.perf_counter()
+        try:
+            response = await self.model_router.create(
+                self.client, 'chat_summary', count_tokens(prompt),
+                messages=[{"role": "user", "content": prompt}],
+                temperature=0.2
+            )
+            summary = (response.choices[0].message.content or "").strip()
+            if not summary:
+                raise ValueError("empty summary")
+            self.summary_stats['latency_ms'] += (time.perf_counter() - started) * 1000
+            
+            async with self.conversation_sessions.turn(session_id, load=False):
+                session = await self.conversation_sessions.fetch(session_id)
+                if session is None or session.get('summarized_through', 0) != base:
+                    self.summary_stats['stale'] += 1
+                    return
+                session['summary'] = summary
+                session['summarized_through'] = end
+                self.conversation_sessions.mark_dirty(session_id, session)
+            
+            self.summary_stats['runs'] += 1
+            self.summary_stats['folded_messages'] += len(messages)
+        except Exception as e:
+            # The raw messages stay in the prompt (capped) until a later summary succeeds
+            self.summary_stats['failed'] += 1
+            print(f"⚠️  Conversation summary for {session_id} failed: {type(e).__name__}: {e}")
+    
+    def _record_chat_prompt(self, session: dict, messages: List[dict]) -> dict:
+        """Keep the size of this turn's chat prompt for /metrics; returns the entry so usage can be added to it"""
+        entry = {
+            'turn': (session.get('message_count', len(session['messages'])) + 1) // 2,
+            'prompt_tokens': sum(count_tokens(msg['content']) for msg in messages),
+            'system_prompt_tokens': count_tokens(self.master_prompt),
+            'summary_tokens': count_tokens(session.get('summary', '')),
+            'raw_messages': min(len(self._unsummarized_messages(session)), 8)
+        }
+        self.chat_prompt_history.append(entry)
+        return entry
+    
+    def _record_chat_usage(self, entry: dict, usage):
+        """Add the provider's prompt and cached-token counts (from the stream's final usage chunk) to this turn's entry"""
+        details = _field(usage, 'prompt_tokens_details')
+        cached_tokens = (_field(details, 'cached_tokens') if details is not None else None) or 0
+        prompt_tokens = _field(usage, 'prompt_tokens') or 0
+        
+        entry['usage_prompt_tokens'] = prompt_tokens
+        entry['cached_tokens'] = cached_tokens
+        self.chat_cache_stats['usage_reports'] += 1
+        self.chat_cache_stats['prompt_tokens'] += prompt_tokens
+        self.chat_cache_stats['cached_tokens'] += cached_tokens
+        print(f"💾 Chat turn {entry['turn']}: {cached_tokens}/{prompt_tokens} prompt tokens served from the provider cache")
+    
+    def _record_completed_stream(self, call_site: str, text: str):
+        """Remember the size of a fully streamed reply, the baseline for estimating what a cancellation saves"""
+        count, total = self.completed_stream_tokens.get(call_site, (0, 0))
+        self.completed_stream_tokens[call_site] = (count + 1, total + count_tokens(text))
+    
+    def _record_cancelled_stream(self, call_site: str, received_text: str):
+        """Count a stream stopped by a client disconnect and estimate the completion tokens it saved"""
+        count, total = self.completed_stream_tokens.get(call_site, (0, 0))
+        # Expected reply size: the average completed reply, or the route's max_tokens before there is one
+        expected = total / count if count else self.model_router.routes.get(call_site, {}).get('max_tokens', 0)
+        received = count_tokens(received_text)
+        saved = int(max(expected - received, 0))
+        
+        stats = self.cancelled_stream_stats.setdefault(call_site, {'cancelled': 0, 'tokens_received': 0, 'tokens_saved_est': 0})
+        stats['cancelled'] += 1
+        stats['tokens_received'] += received
+        stats['tokens_saved_est'] += saved
+        print(f"🔌 {call_site} stream cancelled by client disconnect after {received} tokens (~{saved} tokens saved)")
+    
+    def get_stream_cancellation_stats(self) -> dict:
+        """Streams cut short by client disconnects, per call site, with estimated completion tokens saved"""
+        return {
+            call_site: {
+                **stats,
+                'completed': self.completed_stream_tokens.get(call_site, (0, 0))[0]
+            }
+            for call_site, stats in self.cancelled_stream_stats.items()
+        }
+    
+    def get_chat_prompt_stats(self) -> dict:
+        """Chat prompt tokens per turn (average by turn number shows whether prompts stay flat) and summary counters"""
+        history = list(self.chat_prompt_history)
+        by_turn = {}
+        for entry in history:
+            by_turn.setdefault(min(entry['turn'], 20), []).append(entry['prompt_tokens'])
+        runs = self.summary_stats['runs']
+        cached, reported = self.chat_cache_stats['cached_tokens'], self.chat_cache_stats['prompt_tokens']
         
-        # Add conversation history
-        context_parts.append("## CONVERSATION HISTORY:")
-        for msg in session['messages'][-8:]:  # Last 8 messages for better context
-            role = "Student" if msg['role'] == 'user' else "Milo"
-            context_parts.append(f"{role}: {msg['content']}")
+        return {
+            'turns': len(history),
+            'avg_prompt_tokens': round(sum(entry['prompt_tokens'] for entry in history) / len(history), 1) if history else 0.0,
+            'max_prompt_tokens': max((entry['prompt_tokens'] for entry in history), default=0),
+            'avg_prompt_tokens_by_turn': {turn: round(sum(sizes) / len(sizes), 1) for turn, sizes in sorted(by_turn.items())},
+            'recent': history[-10:],
+            'recent_messages_kept': self.chat_recent_messages,
+            'prompt_cache': {
+                **self.chat_cache_stats,
+                'cached_ratio': round(cached / reported, 3) if reported else None
+            },
+            'summaries': {
+                **{key: value for key, value in self.summary_stats.items() if key != 'latency_ms'},
+                'avg_latency_ms': round(self.summary_stats['latency_ms'] / runs, 1) if runs else None,
+                'in_flight': len(self._summarizing)
+            }
+        }
+    
+    def _build_chat_messages(self, session: dict) -> List[dict]:
+        """Chat request messages, ordered so the unchanging part comes first and providers can cache the prefix"""
+        # The system prompt is byte-identical on every turn of every session
+        messages = [{"role": "system", "content": self.master_prompt}]
+        
+        # Earlier turns as a rolling summary, so the prompt stays roughly the same size as the conversation grows;
+        # it only changes when a background summary lands
+        if session.get('summary'):
+            messages.append({"role": "system", "content": f"## CONVERSATION SUMMARY (earlier turns):\n{session['summary']}"})
+        
+        # Messages not yet summarized, at most the last 8 while a summary catches up; append-only between summaries
+        for _, msg in self._unsummarized_messages(session)[-8:]:
+            messages.append({"role": msg['role'], "content": msg['content']})
+        
+        # Per-turn guidance goes last so it never invalidates the cached prefix
+        messages.append({"role": "system", "content": self._build_step_guidance(session)})
+        return messages
+    
+    def _build_step_guidance(self, session: dict) -> str:
+        """Current step, extracted interests and paths, and flow instructions for this turn"""
+        context_parts = []
         
         # Add current step information with more context
-        context_parts.append(f"\n## CURRENT STEP: {session['current_step']}")
+        context_parts.append(f"## CURRENT STEP: {session['current_step']}")
         
         # Add step-specific instructions with more detailed guidance
         step_instructions = {
@@ -1470,28 +2285,147 @@ Remember: Every suggestion should be something the student could actually do at
         
         return "\n".join(context_parts)
     
+    def _chat_retrieval_key(self, session: dict, user_message: str) -> Optional[tuple]:
+        """What a chat turn's alumni lookup depends on, or None when the turn names no company or field"""
+        query = classify_query(user_message)
+        fields = [query['detected_industry']] + session['student_interests']
+        industries = {resolve_industry(field) or INTEREST_INDUSTRIES.get(field.lower()) for field in fields}
+        industries.discard(None)
+        if not query['detected_companies'] and not industries:
+            return None
+        
+        # Title words that make an alumnus more relevant: the student's interests and any roles they named
+        keywords = {word for phrase in session['student_interests'] + query['detected_roles']
+                    for word in phrase.lower().split() if len(word) > 3}
+        return (self.alumni_index.version, tuple(query['detected_companies']), tuple(sorted(industries)), tuple(sorted(keywords)))
+    
+    async def _start_chat_retrieval(self, session: dict, user_message: str) -> Optional[asyncio.Task]:
+        """Start the alumni lookup for this turn, if its step uses one and the conversation gives it something to match
+
+        Returns once the lookup has been submitted to the matching pool (or answered from the cache), so it
+        runs while the caller assembles the prompt.
+        """
+        key = self._chat_retrieval_key(session, user_message) if session['current_step'] in self.chat_retrieval_steps else None
+        if key is None:
+            self.chat_retrieval_stats['skipped'] += 1
+            return None
+        self.chat_retrieval_stats['lookups'] += 1
+        retrieval = asyncio.ensure_future(self._retrieve_chat_grounding(key))
+        await asyncio.sleep(0)  # let the task run up to its pool submission
+        return retrieval
+    
+    async def _retrieve_chat_grounding(self, key: tuple) -> str:
+        """Rendered alumni/company block for a retrieval key, from the cache or the matching pool"""
+        block = self.chat_retrieval_cache.get(key)
+        if block is not None:
+            self.chat_retrieval_cache.move_to_end(key)
+            self.chat_retrieval_stats['cache_hits'] += 1
+            return block
+        
+        _, companies, industries, keywords = key
+        grounding = await self.run_matching(self.find_chat_grounding, list(companies), list(industries), list(keywords))
+        block = self._render_chat_grounding(grounding)
+        self.chat_retrieval_cache[key] = block
+        if len(self.chat_retrieval_cache) > self.context_cache_size:
+            self.chat_retrieval_cache.popitem(last=False)
+        return block
+    
+    async def _chat_grounding_message(self, retrieval: asyncio.Task, started: float) -> Optional[dict]:
+        """Wait for the alumni lookup until the retrieval budget runs out; a late lookup still fills the cache"""
+        left = self.chat_retrieval_budget_ms / 1000 - (time.perf_counter() - started)
+        done, _ = await asyncio.wait({retrieval}, timeout=max(left, 0))
+        self.chat_retrieval_stats['wait_ms'] += (time.perf_counter() - started) * 1000
+        if not done:
+            self.chat_retrieval_stats['over_budget'] += 1
+            retrieval.add_done_callback(lambda task: task.cancelled() or task.exception())
+            return None
+        
+        try:
+            block = retrieval.result()
+        except Exception as e:
+            self.chat_retrieval_stats['failed'] += 1
+            print(f"⚠️  Chat alumni lookup failed: {type(e).__name__}: {e}")
+            return None
+        if not block:
+            return None
+        self.chat_retrieval_stats['injected'] += 1
+        return {"role": "system", "content": block}
+    
+    def find_chat_grounding(self, companies: List[str], industries: List[str], keywords: List[str]) -> dict:
+        """Alumni at the named companies or in the student's fields, ranked by title keyword matches, plus top employers
+
+        At most MILO_CHAT_RETRIEVAL_SCAN candidates are scored, company matches first, so a lookup
+        stays within a few milliseconds on the full dataset.
+        """
+        candidates = {}
+        company_counts = Counter()
+        
+        # Only the rows that can still be scored are turned into profiles, never a whole company or industry
+        for company in companies:
+            rows = self.alumni_index.rows_for_company(company)
+            company_counts[company] = len(rows)
+            for row_id in rows[:self.chat_retrieval_scan - len(candidates)]:
+                profile = self.alumni_index.profiles[row_id]
+                candidates.setdefault(id(profile), (3, profile))
+        
+        for industry in industries:
+            for profile in self.alumni_index.profiles_for_industry(industry, limit=self.chat_retrieval_scan - len(candidates)):
+                candidates.setdefault(id(profile), (0, profile))
+                if not companies:
+                    company_counts[profile.get('current_company_name') or profile.get('company') or ''] += 1
+        company_counts.pop('', None)
+        
+        keyword_pattern = re.compile('|'.join(re.escape(keyword) for keyword in keywords)) if keywords else None
+        
+        def relevance(entry):
+            order, (bonus, profile) = entry
+            if keyword_pattern is None:
+                return (bonus, -order)
+            title = (profile.get('current_title') or profile.get('position') or '').lower()
+            return (bonus + len(set(keyword_pattern.findall(title))), -order)
+        
+        top = heapq.nlargest(self.chat_retrieval_alumni, enumerate(candidates.values()), key=relevance)
+        return {
+            'alumni': [
+                {
+                    'name': profile.get('name', 'Yale Alumni'),
+                    'title': profile.get('current_title') or profile.get('position') or '',
+                    'company': profile.get('current_company_name') or profile.get('company') or '',
+                    'path': self.build_detailed_career_path(profile)
+                }
+                for _, (_, profile) in top
+            ],
+            'companies': company_counts.most_common(5)
+        }
+    
+    def _render_chat_grounding(self, grounding: dict) -> str:
+        if not grounding['alumni']:
+            return ""
+        
+        lines = ["## RELEVANT YALE ALUMNI (real profiles from Milo's alumni data; bring them up where they fit this step and never invent others):"]
+        for alum in grounding['alumni']:
+            role = f"{alum['title']} at {alum['company']}" if alum['title'] and alum['company'] else alum['title'] or alum['company']
+            lines.append(f"- {alum['name']}: {role}. Path: {alum['path']}")
+        if grounding['companies']:
+            employers = ", ".join(f"{company} ({count})" for company, count in grounding['companies'])
+            lines.append(f"## COMPANIES WITH MATCHING YALE ALUMNI (count): {employers}")
+        return "\n".join(lines)
+    
+    def get_chat_retrieval_stats(self) -> dict:
+        """Alumni lookups for chat turns: how many were injected, served from cache or missed the time budget"""
+        lookups = self.chat_retrieval_stats['lookups']
+        return {
+            **{key: value for key, value in self.chat_retrieval_stats.items() if key != 'wait_ms'},
+            'avg_wait_ms': round(self.chat_retrieval_stats['wait_ms'] / lookups, 2) if lookups else 0.0,
+            'budget_ms': self.chat_retrieval_budget_ms,
+            'steps': sorted(self.chat_retrieval_steps),
+            'cache_entries': len(self.chat_retrieval_cache)
+        }
+    
     def _extract_and_store_session_data(self, session: dict, user_message: str, ai_response: str):
         """Extract and store relevant data from the conversation"""
-        # Extract interests from user message (expanded keyword matching)
-        interest_keywords = [
-            'data science', 'machine learning', 'artificial intelligence', 'programming', 'coding',
-            'writing', 'journalism', 'communication', 'media', 'publishing',
-            'business', 'finance', 'consulting', 'entrepreneurship', 'startup',
-            'research', 'academia', 'teaching', 'education',
-            'healthcare', 'medicine', 'public health', 'policy',
-            'law', 'legal', 'government', 'politics', 'public service',
-            'art', 'design', 'creative', 'music', 'theater', 'film',
-            'environment', 'sustainability', 'climate', 'energy',
-            'international', 'global', 'foreign', 'language', 'culture',
-            'engineering', 'cars', 'automotive', 'mechanical', 'electrical',
-            'computer science', 'software', 'hardware', 'robotics',
-            'biology', 'chemistry', 'physics', 'mathematics', 'statistics',
-            'psychology', 'sociology', 'economics', 'political science',
-            'history', 'literature', 'philosophy', 'languages'
-        ]
-        
-        user_lower = user_message.lower()
-        found_interests = [interest for interest in interest_keywords if interest in user_lower]
+        # Extract interests from user message in a single pass over the text
+        found_interests = get_matcher('interests', INTEREST_KEYWORDS).find_labels(user_message)
         
         if found_interests:
             session['student_interests'].extend(found_interests)
@@ -1499,7 +2433,7 @@ Remember: Every suggestion should be something the student could actually do at
         
         # Intelligent step progression based on conversation analysis
         current_step = session['current_step']
-        message_count = len(session['messages'])
+        message_count = session.get('message_count', len(session['messages']))
         
         # More conservative step progression - only advance when we have enough information
         if current_step == 1:
@@ -1535,25 +2469,52 @@ Remember: Every suggestion should be something the student could actually do at
             ("what activities" in ai_lower or "make you feel most alive" in ai_lower)):
             session['current_step'] = 1
     
-    async def get_chat_history(self, session_id: str = "default") -> List[dict]:
-        """Get chat history for a session"""
-        session = self.get_or_create_session(session_id)
-        return session['messages']
+    async def get_chat_history(self, session_id: str = "default") -> Optional[List[dict]]:
+        """Get chat history for a session, or None if there is no such session"""
+        session = await self.conversation_sessions.fetch(session_id)
+        return session['messages'] if session is not None else None
+    
+    async def get_stored_reply(self, session_id: str, message_seq: int) -> Optional[str]:
+        """Text of a stored assistant message by seq, or None if the session or message is gone"""
+        session = await self.conversation_sessions.fetch(session_id)
+        if session is None:
+            return None
+        index = message_seq - (session.get('message_count', len(session['messages'])) - len(session['messages']))
+        if not 0 <= index < len(session['messages']) or session['messages'][index]['role'] != 'assistant':
+            return None
+        return session['messages'][index]['content']
+    
+    async def clear_session(self, session_id: str = "default") -> bool:
+        """Clear a conversation session; returns False if it was not loaded in this worker"""
+        return await self.conversation_sessions.remove(session_id)
     
-    def clear_session(self, session_id: str = "default"):
-        """Clear a conversation session"""
-        if session_id in self.conversation_sessions:
-            del self.conversation_sessions[session_id]
+    async def get_session_info(self, session_id: str = "default") -> Optional[dict]:
+        """Get session information, or None if there is no such session"""
+        session = await self.conversation_sessions.fetch(session_id)
+        if session is None:
+            return None
+        return self._session_info(session_id, session)
     
-    def get_session_info(self, session_id: str = "default") -> dict:
-        """Get session information"""
-        session = self.get_or_create_session(session_id)
+    def _session_info(self, session_id: str, session: dict) -> dict:
         return {
             'session_id': session_id,
             'current_step': session['current_step'],
             'student_interests': session['student_interests'],
             'career_paths': session['career_paths'],
-            'message_count': len(session['messages']),
+            'message_count': session.get('message_count', len(session['messages'])),
             'created_at': session['created_at'],
             'last_updated': session['last_updated']
-        }
\ No newline at end of file
+        }
+    
+    def list_sessions(self) -> dict:
+        """Session info for every session loaded in this process"""
+        sessions = {}
+        for session_id in self.conversation_sessions.session_ids():
+            session = self.conversation_sessions.get(session_id, touch=False)
+            if session is not None:
+                sessions[session_id] = self._session_info(session_id, session)
+        return sessions
+    
+    def get_session_stats(self) -> dict:
+        """Session count, stored messages and eviction counters"""
+        return self.conversation_sessions.get_stats()
\ No newline at end of file
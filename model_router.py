@@ -0,0 +1,186 @@
+"""
+Latency-aware model routing for each LLM call site.
+
+Every call site (query processing, intent extraction, action plans, chat and
+chat summaries) has a route: an ordered list of models, a ``max_tokens`` and a
+latency budget. The router keeps recent per-model latencies for each call site and picks the first
+model whose p95 is within budget, so traffic shifts to the next model when the
+preferred one slows down and shifts back once its slow samples age out. Inputs
+below a route's ``simple_input_tokens`` count as simple and may use a cheaper
+``simple_model`` and a smaller ``simple_max_tokens``. For streamed call sites the
+latency recorded is the time until the stream opens (time to first byte). A call
+the provider fails (timeout, connection error, 429 or 5xx) is recorded as over
+budget, so a model returning fast errors is routed around rather than looking
+fast; a call stopped by the request deadline or an open circuit breaker is not
+recorded at all.
+
+Routes are configured without code edits through ``MILO_MODEL_ROUTES``, either a
+JSON object or the path of a JSON file, whose per-call-site entries override the
+defaults below key by key.
+"""
+
+import json
+import os
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from openai import APIConnectionError, APIStatusError
+
+from llm_client import RETRYABLE_STATUS_CODES
+
+DEFAULT_ROUTES = {
+    'process_user_query': {'models': ['gpt-3.5-turbo'], 'max_tokens': 400, 'latency_budget_ms': 4000},
+    'extract_intent': {'models': ['gpt-3.5-turbo'], 'max_tokens': 300, 'latency_budget_ms': 4000},
+    'action_plan': {'models': ['gpt-3.5-turbo'], 'max_tokens': 1000, 'latency_budget_ms': 8000},
+    'chat': {'models': ['gpt-4o', 'gpt-4o-mini'], 'max_tokens': 2000, 'latency_budget_ms': 3000},
+    'chat_summary': {'models': ['gpt-4o-mini', 'gpt-3.5-turbo'], 'max_tokens': 300, 'latency_budget_ms': 5000},
+}
+
+# Failed calls are recorded at this multiple of the route's latency budget (or their real latency if longer)
+FAILURE_PENALTY = 2
+
+
+def load_routes() -> Dict[str, dict]:
+    """Default routes merged with MILO_MODEL_ROUTES (inline JSON or a JSON file path)"""
+    routes = {call_site: dict(route) for call_site, route in DEFAULT_ROUTES.items()}
+
+    raw = os.getenv('MILO_MODEL_ROUTES', '').strip()
+    if not raw:
+        return routes
+
+    try:
+        if not raw.startswith('{'):
+            with open(raw, 'r', encoding='utf-8') as f:
+                raw = f.read()
+        overrides = json.loads(raw)
+        for call_site, route in overrides.items():
+            routes.setdefault(call_site, {}).update(route)
+        print(f"🧭 Loaded model routes for: {', '.join(overrides)}")
+    except Exception as e:
+        print(f"⚠️  Could not load MILO_MODEL_ROUTES, using default routes: {e}")
+
+    return routes
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ModelRouter:
+    """Chooses (model, max_tokens) per call site and tracks per-model latency percentiles"""
+
+    def __init__(self, routes: Dict[str, dict] = None):
+        self.routes = routes or load_routes()
+        self.window_seconds = float(os.getenv('MILO_ROUTER_WINDOW_S', '300'))
+        self.min_samples = int(os.getenv('MILO_ROUTER_MIN_SAMPLES', '5'))
+
+        # (call site, model) → recent (finished_at, latency_ms) samples
+        self._samples: Dict[Tuple[str, str], deque] = {}
+        self.decisions: Dict[str, Dict[str, int]] = {}
+        self.failures: Dict[Tuple[str, str], int] = {}
+
+    def _recent_latencies(self, call_site: str, model: str) -> List[float]:
+        samples = self._samples.get((call_site, model))
+        if not samples:
+            return []
+        cutoff = time.time() - self.window_seconds
+        while samples and samples[0][0] < cutoff:
+            samples.popleft()
+        return [latency_ms for _, latency_ms in samples]
+
+    def p95(self, call_site: str, model: str) -> Optional[float]:
+        """Recent p95 latency, or None until there are enough samples to judge"""
+        latencies = self._recent_latencies(call_site, model)
+        if len(latencies) < self.min_samples:
+            return None
+        return percentile(latencies, 95)
+
+    def choose(self, call_site: str, input_tokens: int = 0) -> Tuple[str, int]:
+        """Pick the model and max_tokens for a call from the route, its latency budget and the input size"""
+        route = self.routes[call_site]
+        models = list(route['models'])
+        max_tokens = route['max_tokens']
+
+        if input_tokens < route.get('simple_input_tokens', 0):
+            max_tokens = route.get('simple_max_tokens', max_tokens)
+            if route.get('simple_model'):
+                models.insert(0, route['simple_model'])
+
+        budget = route.get('latency_budget_ms')
+        chosen = models[0]
+        if budget:
+            observed = {model: self.p95(call_site, model) for model in models}
+            within_budget = [model for model in models if observed[model] is None or observed[model] <= budget]
+            if within_budget:
+                chosen = within_budget[0]
+            else:
+                # Every model is over budget: use whichever is currently fastest
+                chosen = min(models, key=lambda model: observed[model])
+
+        counts = self.decisions.setdefault(call_site, {})
+        counts[chosen] = counts.get(chosen, 0) + 1
+        return chosen, max_tokens
+
+    def record(self, call_site: str, model: str, latency_ms: float):
+        key = (call_site, model)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=500)
+        self._samples[key].append((time.time(), latency_ms))
+
+    def record_failure(self, call_site: str, model: str, latency_ms: float):
+        budget = self.routes.get(call_site, {}).get('latency_budget_ms') or 0
+        self.failures[(call_site, model)] = self.failures.get((call_site, model), 0) + 1
+        self.record(call_site, model, max(latency_ms, budget * FAILURE_PENALTY))
+
+    async def create(self, client, call_site: str, input_tokens: int = 0, route: Tuple[str, int] = None, **kwargs):
+        """Route a chat.completions.create call (or use an already chosen route) and record its latency"""
+        model, max_tokens = route or self.choose(call_site, input_tokens)
+        started = time.perf_counter()
+        try:
+            response = await client.chat.completions.create(model=model, max_tokens=max_tokens, **kwargs)
+        except (APIConnectionError, APIStatusError) as e:
+            latency_ms = (time.perf_counter() - started) * 1000
+            if isinstance(e, APIConnectionError) or e.status_code in RETRYABLE_STATUS_CODES:
+                # Timeouts, rate limits and server errors count as over budget however fast they came
+                # back, so an erroring model never looks healthy
+                self.record_failure(call_site, model, latency_ms)
+            else:
+                self.record(call_site, model, latency_ms)  # the model answered; the request itself was bad
+            raise
+        # Anything else (request deadline, open circuit breaker) says nothing about the model and is not recorded
+        self.record(call_site, model, (time.perf_counter() - started) * 1000)
+        return response
+
+    def get_stats(self) -> dict:
+        """Per call site: route, routing decisions and recent p50/p95 latency per model"""
+        stats = {}
+        for call_site, route in self.routes.items():
+            models = {}
+            for (site, model) in list(self._samples):
+                if site != call_site:
+                    continue
+                latencies = self._recent_latencies(site, model)
+                if latencies:
+                    models[model] = {
+                        'samples': len(latencies),
+                        'p50_ms': round(percentile(latencies, 50), 1),
+                        'p95_ms': round(percentile(latencies, 95), 1),
+                        'failures': self.failures.get((site, model), 0)
+                    }
+            stats[call_site] = {'route': route, 'decisions': self.decisions.get(call_site, {}), 'latency': models}
+        return stats
+
+
+_router: Optional[ModelRouter] = None
+
+
+def get_model_router() -> ModelRouter:
+    """Return the process-wide router, so every MiloAI instance shares latency samples"""
+    global _router
+    if _router is None:
+        _router = ModelRouter()
+    return _router
@@ -0,0 +1,101 @@
+"""
+Local token counting and budget fitting for LLM prompts.
+
+Prompts are assembled from named sections. When the total exceeds the budget,
+sections are trimmed line by line starting with the least important one, down
+to each section's floor, so required instructions are never cut and long
+alumni lists shrink before the core guidance does. Token counts use tiktoken
+when it is installed and a ~4 characters per token estimate otherwise.
+"""
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+TRUNCATION_MARKER = "[...trimmed to fit the prompt budget]"
+
+_encodings = {}
+
+
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encodings[model] = tiktoken.get_encoding("cl100k_base")
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """Count tokens in text with the model's tokenizer, or estimate them if tiktoken is unavailable"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+class PromptSection(NamedTuple):
+    name: str
+    text: str
+    priority: int  # lower is more important; the highest number is trimmed first
+    min_tokens: Optional[int] = None  # floor when trimming; None means the section is never trimmed
+
+
+def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> str:
+    """Keep whole lines of text up to max_tokens (including the truncation marker)"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+    budget = max_tokens - count_tokens(TRUNCATION_MARKER, model)
+    if budget <= 0:
+        return ""
+
+    kept, used = [], 0
+    for line in text.split("\n"):
+        line_tokens = count_tokens(line + "\n", model)
+        if used + line_tokens > budget:
+            break
+        kept.append(line)
+        used += line_tokens
+
+    while kept and not kept[-1].strip():
+        kept.pop()
+    return "\n".join(kept + [TRUNCATION_MARKER]) if kept else ""
+
+
+def fit_sections(sections: List[PromptSection], budget: int, model: str = "gpt-3.5-turbo") -> Tuple[Dict[str, str], dict]:
+    """Trim sections to fit a token budget; returns (section name → text, token report)"""
+    fitted = {section.name: section.text for section in sections}
+    counts = {section.name: count_tokens(section.text, model) for section in sections}
+    original_total = sum(counts.values())
+
+    over = original_total - budget
+    trimmed = []
+    for section in sorted(sections, key=lambda s: s.priority, reverse=True):
+        if over <= 0:
+            break
+        if section.min_tokens is None or counts[section.name] <= section.min_tokens:
+            continue
+
+        keep = max(counts[section.name] - over, section.min_tokens)
+        fitted[section.name] = truncate_to_tokens(section.text, keep, model)
+        new_count = count_tokens(fitted[section.name], model)
+        over -= counts[section.name] - new_count
+        counts[section.name] = new_count
+        trimmed.append(section.name)
+
+    report = {
+        'budget': budget,
+        'original_tokens': original_total,
+        'input_tokens': sum(counts.values()),
+        'sections': counts,
+        'trimmed': trimmed,
+        'tokenizer': 'tiktoken' if tiktoken is not None else 'estimate'
+    }
+    return fitted, report
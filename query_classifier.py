@@ -0,0 +1,273 @@
+"""
+Rule-based classifier for career queries.
+
+Handles obvious inputs ("work at Google", "investment banking", "software
+engineer") locally and returns the same JSON shape as
+MiloAI.process_user_query, so those requests skip the classification LLM call.
+The company alias table and industry mappings here are also the source of the
+Yale-specific mappings embedded in the LLM prompt.
+"""
+
+import json
+import re
+from typing import Dict, List
+
+from alumni_index import INDUSTRY_SYNONYMS
+from keyword_matcher import KeywordMatch, get_matcher
+
+# Industry → companies Yale students typically target
+INDUSTRY_COMPANIES = {
+    'Investment Banking': ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "Citigroup", "Bank of America"],
+    'Technology': ["Google", "Microsoft", "Apple", "Amazon", "Meta", "Netflix"],
+    'Consulting': ["McKinsey", "Bain", "BCG", "Deloitte", "PwC"],
+    'Finance': ["Goldman Sachs", "Morgan Stanley", "J.P. Morgan", "BlackRock", "Vanguard"],
+    'Startups': ["Stripe", "Airbnb", "Uber", "Lyft", "Pinterest"],
+    'Private Equity': ["KKR", "Blackstone", "Apollo", "Carlyle", "TPG"],
+    'Venture Capital': ["Andreessen Horowitz", "Sequoia", "Kleiner Perkins", "Accel", "Benchmark"],
+}
+
+# How each industry is written in the LLM prompt's mapping list
+INDUSTRY_PROMPT_TERMS = {
+    'Investment Banking': ['IB', 'investment banking'],
+    'Technology': ['tech', 'technology'],
+    'Consulting': ['consulting'],
+    'Finance': ['finance'],
+    'Startups': ['startups'],
+    'Private Equity': ['PE', 'private equity'],
+    'Venture Capital': ['VC', 'venture capital'],
+}
+
+# Company alias table: canonical name → (industry, lowercase aliases)
+COMPANY_ALIASES = {
+    'Goldman Sachs': ('Investment Banking', ['goldman sachs', 'goldman']),
+    'Morgan Stanley': ('Investment Banking', ['morgan stanley']),
+    'J.P. Morgan': ('Investment Banking', ['j.p. morgan', 'jp morgan', 'jpmorgan', 'jpmorgan chase', 'jpm']),
+    'Citigroup': ('Investment Banking', ['citigroup', 'citi', 'citibank']),
+    'Bank of America': ('Investment Banking', ['bank of america', 'bofa']),
+    'Evercore': ('Investment Banking', ['evercore']),
+    'Lazard': ('Investment Banking', ['lazard']),
+    'Centerview': ('Investment Banking', ['centerview', 'centerview partners']),
+    'Google': ('Technology', ['google', 'alphabet']),
+    'Microsoft': ('Technology', ['microsoft']),
+    'Apple': ('Technology', ['apple']),
+    'Amazon': ('Technology', ['amazon', 'aws']),
+    'Meta': ('Technology', ['meta', 'facebook']),
+    'Netflix': ('Technology', ['netflix']),
+    'Nvidia': ('Technology', ['nvidia']),
+    'OpenAI': ('Technology', ['openai']),
+    'Salesforce': ('Technology', ['salesforce']),
+    'Tesla': ('Technology', ['tesla']),
+    'McKinsey': ('Consulting', ['mckinsey', 'mckinsey & company', 'mck']),
+    'Bain': ('Consulting', ['bain', 'bain & company']),
+    'BCG': ('Consulting', ['bcg', 'boston consulting group']),
+    'Deloitte': ('Consulting', ['deloitte']),
+    'PwC': ('Consulting', ['pwc', 'pricewaterhousecoopers']),
+    'Accenture': ('Consulting', ['accenture']),
+    'BlackRock': ('Finance', ['blackrock']),
+    'Vanguard': ('Finance', ['vanguard']),
+    'Bridgewater': ('Finance', ['bridgewater', 'bridgewater associates']),
+    'Citadel': ('Finance', ['citadel']),
+    'Jane Street': ('Finance', ['jane street']),
+    'Two Sigma': ('Finance', ['two sigma']),
+    'Stripe': ('Startups', ['stripe']),
+    'Airbnb': ('Startups', ['airbnb']),
+    'Uber': ('Startups', ['uber']),
+    'Lyft': ('Startups', ['lyft']),
+    'Pinterest': ('Startups', ['pinterest']),
+    'KKR': ('Private Equity', ['kkr']),
+    'Blackstone': ('Private Equity', ['blackstone']),
+    'Apollo': ('Private Equity', ['apollo', 'apollo global']),
+    'Carlyle': ('Private Equity', ['carlyle', 'carlyle group']),
+    'TPG': ('Private Equity', ['tpg']),
+    'Andreessen Horowitz': ('Venture Capital', ['andreessen horowitz', 'andreessen', 'a16z']),
+    'Sequoia': ('Venture Capital', ['sequoia', 'sequoia capital']),
+    'Kleiner Perkins': ('Venture Capital', ['kleiner perkins', 'kleiner']),
+    'Accel': ('Venture Capital', ['accel']),
+    'Benchmark': ('Venture Capital', ['benchmark capital']),
+}
+
+# Role keyword → (canonical title, industry where the role is most common)
+ROLE_KEYWORDS = {
+    'software engineer': ('Software Engineer', 'Technology'),
+    'software engineering': ('Software Engineer', 'Technology'),
+    'software developer': ('Software Engineer', 'Technology'),
+    'swe': ('Software Engineer', 'Technology'),
+    'product manager': ('Product Manager', 'Technology'),
+    'product management': ('Product Manager', 'Technology'),
+    'data scientist': ('Data Scientist', 'Technology'),
+    'machine learning engineer': ('Machine Learning Engineer', 'Technology'),
+    'ml engineer': ('Machine Learning Engineer', 'Technology'),
+    'consultant': ('Consultant', 'Consulting'),
+    'management consultant': ('Management Consultant', 'Consulting'),
+    'investment banker': ('Investment Banking Analyst', 'Investment Banking'),
+    'investment banking analyst': ('Investment Banking Analyst', 'Investment Banking'),
+    'sales and trading': ('Sales & Trading Analyst', 'Investment Banking'),
+    'sales & trading': ('Sales & Trading Analyst', 'Investment Banking'),
+    'trader': ('Trader', 'Finance'),
+    'quant': ('Quantitative Researcher', 'Finance'),
+    'quantitative researcher': ('Quantitative Researcher', 'Finance'),
+    'quantitative trader': ('Quantitative Trader', 'Finance'),
+    'private equity associate': ('Private Equity Associate', 'Private Equity'),
+    'venture capitalist': ('Venture Capital Associate', 'Venture Capital'),
+}
+
+# Default entry-level roles when a query names a company or industry but no role
+INDUSTRY_ROLES = {
+    'Investment Banking': ["Investment Banking Analyst", "Sales & Trading Analyst", "Operations Analyst"],
+    'Technology': ["Software Engineer", "Product Manager", "Business Analyst"],
+    'Consulting': ["Business Analyst", "Associate Consultant", "Management Consultant"],
+    'Finance': ["Investment Banking Analyst", "Investment Analyst", "Sales & Trading Analyst"],
+    'Startups': ["Software Engineer", "Product Manager", "Business Operations Associate"],
+    'Private Equity': ["Private Equity Analyst", "Private Equity Associate"],
+    'Venture Capital': ["Venture Capital Analyst", "Venture Capital Associate"],
+}
+
+# Words that don't change what the student is asking for
+FILLER_WORDS = {
+    'i', "i'm", 'im', 'me', 'my', 'a', 'an', 'the', 'to', 'at', 'in', 'into', 'for', 'as', 'of', 'and', 'or',
+    'want', 'wanna', 'would', 'like', 'love', 'hope', 'plan', 'dream', 'goal', 'interested', 'be', 'become',
+    'get', 'getting', 'work', 'working', 'job', 'jobs', 'career', 'careers', 'role', 'roles', 'position',
+    'internship', 'internships', 'intern', 'full', 'time', 'full-time', 'summer', 'entry', 'level',
+    'analyst', 'company', 'firm', 'firms', 'industry', 'break', 'land', 'join', 'hired', 'how', 'do', 'can',
+    'should', 'some', 'day', 'someday', 'eventually', 'after', 'graduation', 'yale', 'please', 'help',
+}
+
+# Rule confidence per query type, reduced for every word the rules can't explain
+BASE_CONFIDENCE = {'specific_company': 0.95, 'industry': 0.9, 'role': 0.85}
+UNEXPLAINED_WORD_PENALTY = 0.1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9&.'+-]*")
+
+
+def format_industry_mappings(indent: str = "") -> str:
+    """Render the industry → companies mapping as it appears in the query-processing prompt"""
+    lines = []
+    for industry, companies in INDUSTRY_COMPANIES.items():
+        terms = " or ".join(f'"{term}"' for term in INDUSTRY_PROMPT_TERMS[industry])
+        lines.append(f"{indent}- {terms} → {json.dumps(companies)}")
+    return "\n".join(lines).lstrip()
+
+
+def _company_vocabulary() -> Dict[str, str]:
+    return {alias: company for company, (_, aliases) in COMPANY_ALIASES.items() for alias in aliases}
+
+
+def _industry_vocabulary() -> Dict[str, str]:
+    vocabulary = {
+        term: industry for term, industry in INDUSTRY_SYNONYMS.items()
+        if industry in INDUSTRY_COMPANIES and term != 'it'  # "it" is too ambiguous as a whole word
+    }
+    vocabulary.update({'startup': 'Startups', 'startups': 'Startups'})
+    for industry, terms in INDUSTRY_PROMPT_TERMS.items():
+        vocabulary.update({term.lower(): industry for term in terms})
+    return vocabulary
+
+
+def _role_vocabulary() -> Dict[str, str]:
+    return {keyword: title for keyword, (title, _) in ROLE_KEYWORDS.items()}
+
+
+def _whole_word_matches(text: str, matches: List[KeywordMatch]) -> List[KeywordMatch]:
+    """Keep only matches that start and end on word boundaries"""
+    kept = []
+    for match in matches:
+        before = text[match.start - 1] if match.start > 0 else ' '
+        after = text[match.end] if match.end < len(text) else ' '
+        if not before.isalnum() and not after.isalnum():
+            kept.append(match)
+    return kept
+
+
+def _unique(values: List[str]) -> List[str]:
+    return list(dict.fromkeys(values))
+
+
+def classify_query(user_input: str) -> dict:
+    """Classify a query with local rules, returning the process_user_query JSON shape plus a confidence"""
+    text = (user_input or '').lower()
+
+    company_hits = _whole_word_matches(text, get_matcher('companies', _company_vocabulary()).find_all(text))
+    industry_hits = _whole_word_matches(text, get_matcher('industries', _industry_vocabulary()).find_all(text))
+    role_hits = _whole_word_matches(text, get_matcher('roles', _role_vocabulary()).find_all(text))
+
+    # "software engineer" is a role query, not a "software" industry query
+    industry_hits = [
+        match for match in industry_hits
+        if not any(role.start <= match.start and match.end <= role.end for role in role_hits)
+    ]
+
+    # Count words that none of the rules explain; each one lowers confidence
+    remainder = list(text)
+    for match in company_hits + industry_hits + role_hits:
+        remainder[match.start:match.end] = ' ' * (match.end - match.start)
+    unexplained = [
+        token.strip(".'-") for token in TOKEN_PATTERN.findall(''.join(remainder))
+        if token.strip(".'-") and token.strip(".'-") not in FILLER_WORDS
+    ]
+
+    companies = _unique([match.label for match in company_hits])
+    industries = _unique([match.label for match in industry_hits])
+    roles = _unique([match.label for match in role_hits])
+    role_industries = _unique([ROLE_KEYWORDS[match.keyword][1] for match in role_hits if match.keyword in ROLE_KEYWORDS])
+
+    if companies:
+        query_type = 'specific_company'
+        industry = industries[0] if industries else (COMPANY_ALIASES.get(companies[0], (None,))[0] or 'Not specified')
+        detected_companies = companies
+        expanded_query = f"Work at {', '.join(companies)}"
+        if roles:
+            expanded_query += f" as {', '.join(roles)}"
+        student_intent = f"Get hired at {', '.join(companies)}"
+    elif industries and industries[0] in INDUSTRY_COMPANIES:
+        query_type = 'industry'
+        industry = industries[0]
+        detected_companies = INDUSTRY_COMPANIES[industry]
+        expanded_query = f"Work in {industry} at companies like {', '.join(detected_companies)}"
+        if roles:
+            expanded_query += f" as {', '.join(roles)}"
+        student_intent = f"Break into {industry}"
+    elif role_industries and role_industries[0] in INDUSTRY_COMPANIES:
+        query_type = 'role'
+        industry = role_industries[0]
+        detected_companies = INDUSTRY_COMPANIES[industry]
+        expanded_query = f"Work as {', '.join(roles)} at companies like {', '.join(detected_companies)}"
+        student_intent = f"Work as a {roles[0]}"
+    else:
+        return {
+            "query_type": "general",
+            "original_query": user_input,
+            "expanded_query": user_input,
+            "detected_industry": "Not specified",
+            "detected_companies": [],
+            "detected_roles": [],
+            "confidence": 0.0,
+            "student_intent": "Unclear - needs LLM classification",
+            "source": "rules"
+        }
+
+    confidence = max(0.0, BASE_CONFIDENCE[query_type] - UNEXPLAINED_WORD_PENALTY * len(unexplained))
+
+    return {
+        "query_type": query_type,
+        "original_query": user_input,
+        "expanded_query": expanded_query,
+        "detected_industry": industry,
+        "detected_companies": detected_companies,
+        "detected_roles": roles or INDUSTRY_ROLES.get(industry, []),
+        "confidence": round(confidence, 2),
+        "student_intent": student_intent,
+        "source": "rules"
+    }
+
+
+def local_intent(user_input: str) -> dict:
+    """Build the extract_intent JSON shape from the local rules, for when the LLM is unavailable"""
+    processed = classify_query(user_input)
+    industry = processed['detected_industry'] if processed['query_type'] != 'general' else 'Technology'
+    return {
+        "target_companies": processed['detected_companies'] if processed['query_type'] == 'specific_company' else [],
+        "target_roles": processed['detected_roles'] or INDUSTRY_ROLES.get(industry, ["Analyst"]),
+        "industry": industry,
+        "motivation": "Career growth",
+        "timeline": "1-2 years"
+    }
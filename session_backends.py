@@ -0,0 +1,510 @@
+"""
+Durable storage backends for chat sessions.
+
+``SessionStore`` keeps live sessions in memory and hands batches of changes to a
+backend from a background flush task, so nothing here runs on the token
+streaming path. A backend stores session metadata (step, interests, career
+paths, timestamps, conversation summary) in one row per session and every message in its own row,
+numbered per session, so a flush only inserts the messages added since the
+previous one. ``load`` rebuilds a session with its newest messages when it is
+first used after a restart or after being evicted from memory.
+
+Every backend also provides a lease-style per-session lock
+(``acquire_lock`` / ``release_lock``) that works across worker processes, so
+with ``MILO_SESSION_SHARED=1`` two messages for the same session never
+interleave, whichever workers they land on.
+
+Select one with ``MILO_SESSION_BACKEND``: ``memory`` (default, no persistence),
+``sqlite`` (``MILO_SESSION_DB_PATH``, shared by the workers on one node),
+``postgres`` (``MILO_SESSION_DATABASE_URL``, falling back to ``DATABASE_URL``),
+``redis`` (``MILO_SESSION_REDIS_URL``, needs the ``redis`` package) or
+``local_redis``, an in-process stand-in for Redis for tests and local runs.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import psycopg2
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# session id → (metadata, [(seq, message), ...] added since the last flush)
+SessionBatch = Dict[str, Tuple[dict, List[Tuple[int, dict]]]]
+
+
+def session_metadata(session: dict) -> dict:
+    """Copy of the persisted, non-message fields of a session"""
+    return {
+        'current_step': session['current_step'],
+        'student_interests': list(session['student_interests']),
+        'career_paths': list(session['career_paths']),
+        'message_count': session.get('message_count', len(session['messages'])),
+        'created_at': session['created_at'],
+        'last_updated': session['last_updated'],
+        'summary': session.get('summary', ''),
+        'summarized_through': session.get('summarized_through', 0)
+    }
+
+
+def _session_from_rows(metadata_row, message_rows) -> dict:
+    current_step, interests, career_paths, message_count, created_at, last_updated, summary, summarized_through = metadata_row
+    return {
+        'messages': [
+            {'role': role, 'content': content, 'timestamp': timestamp}
+            for role, content, timestamp in reversed(message_rows)
+        ],
+        'message_count': message_count,
+        'current_step': current_step,
+        'student_interests': json.loads(interests),
+        'career_paths': json.loads(career_paths),
+        'created_at': created_at,
+        'last_updated': last_updated,
+        'summary': summary or '',
+        'summarized_through': summarized_through or 0
+    }
+
+
+def _metadata_params(session_id: str, metadata: dict) -> tuple:
+    return (
+        session_id, metadata['current_step'], json.dumps(metadata['student_interests']),
+        json.dumps(metadata['career_paths']), metadata['message_count'], metadata['created_at'], metadata['last_updated'],
+        metadata['summary'], metadata['summarized_through']
+    )
+
+
+def _message_params(batch: SessionBatch) -> List[tuple]:
+    return [
+        (session_id, seq, message['role'], message['content'], message['timestamp'])
+        for session_id, (_, messages) in batch.items()
+        for seq, message in messages
+    ]
+
+
+class SQLiteSessionBackend:
+    """Sessions in a SQLite file (WAL mode, shared by the workers on a node)"""
+
+    name = 'sqlite'
+
+    def __init__(self, path: str = None):
+        self.path = path or os.getenv('MILO_SESSION_DB_PATH', '.milo_cache/sessions.sqlite3')
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    current_step INTEGER NOT NULL,
+                    student_interests TEXT NOT NULL,
+                    career_paths TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    created_at TEXT NOT NULL,
+                    last_updated TEXT NOT NULL,
+                    summary TEXT NOT NULL DEFAULT '',
+                    summarized_through INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Tables created before conversation summaries lack the summary columns
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(chat_sessions)")}
+            if 'summary' not in columns:
+                conn.execute("ALTER TABLE chat_sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+                conn.execute("ALTER TABLE chat_sessions ADD COLUMN summarized_through INTEGER NOT NULL DEFAULT 0")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_messages (
+                    session_id TEXT NOT NULL,
+                    seq INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    PRIMARY KEY (session_id, seq)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_session_locks (
+                    session_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, as in llm_cache.py
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def load(self, session_id: str, max_messages: int) -> Optional[dict]:
+        conn = self._connect()
+        metadata_row = conn.execute(
+            "SELECT current_step, student_interests, career_paths, message_count, created_at, last_updated, summary, summarized_through "
+            "FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if metadata_row is None:
+            return None
+        message_rows = conn.execute(
+            "SELECT role, content, timestamp FROM chat_messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, max_messages)
+        ).fetchall()
+        return _session_from_rows(metadata_row, message_rows)
+
+    def save_batch(self, batch: SessionBatch, deletes: Set[str]):
+        """Apply deletes, then upsert session rows and insert new messages, in one transaction"""
+        with self._connect() as conn:
+            for session_id in deletes:
+                conn.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+            conn.executemany("""
+                INSERT INTO chat_sessions (session_id, current_step, student_interests, career_paths, message_count, created_at, last_updated, summary, summarized_through)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET
+                    current_step = excluded.current_step, student_interests = excluded.student_interests,
+                    career_paths = excluded.career_paths, message_count = excluded.message_count,
+                    last_updated = excluded.last_updated, summary = excluded.summary,
+                    summarized_through = excluded.summarized_through
+            """, [_metadata_params(session_id, metadata) for session_id, (metadata, _) in batch.items()])
+            conn.executemany(
+                "INSERT OR REPLACE INTO chat_messages (session_id, seq, role, content, timestamp) VALUES (?, ?, ?, ?, ?)",
+                _message_params(batch)
+            )
+
+    def acquire_lock(self, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the session's lock unless another owner holds an unexpired one"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute("""
+                INSERT INTO chat_session_locks (session_id, owner, expires_at) VALUES (?, ?, ?)
+                ON CONFLICT(session_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+                WHERE chat_session_locks.expires_at < ?
+            """, (session_id, owner, now + ttl_seconds, now))
+            return cursor.rowcount == 1
+
+    def release_lock(self, session_id: str, owner: str):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM chat_session_locks WHERE session_id = ? AND owner = ?", (session_id, owner))
+
+
+class PostgresSessionBackend:
+    """Sessions in PostgreSQL, shared by every worker and surviving redeploys"""
+
+    name = 'postgres'
+
+    def __init__(self, database_url: str = None):
+        self.database_url = database_url or os.getenv('MILO_SESSION_DATABASE_URL') or os.getenv('DATABASE_URL')
+        if not self.database_url:
+            raise ValueError("MILO_SESSION_BACKEND=postgres needs MILO_SESSION_DATABASE_URL or DATABASE_URL")
+        self._conn = None
+        self._lock = threading.Lock()
+
+        with self._lock:
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_sessions (
+                        session_id TEXT PRIMARY KEY,
+                        current_step INTEGER NOT NULL,
+                        student_interests TEXT NOT NULL,
+                        career_paths TEXT NOT NULL,
+                        message_count INTEGER NOT NULL,
+                        created_at TEXT NOT NULL,
+                        last_updated TEXT NOT NULL,
+                        summary TEXT NOT NULL DEFAULT '',
+                        summarized_through INTEGER NOT NULL DEFAULT 0
+                    )
+                """)
+                cursor.execute("ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summary TEXT NOT NULL DEFAULT ''")
+                cursor.execute("ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS summarized_through INTEGER NOT NULL DEFAULT 0")
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_messages (
+                        session_id TEXT NOT NULL,
+                        seq INTEGER NOT NULL,
+                        role TEXT NOT NULL,
+                        content TEXT NOT NULL,
+                        timestamp TEXT NOT NULL,
+                        PRIMARY KEY (session_id, seq)
+                    )
+                """)
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS chat_session_locks (
+                        session_id TEXT PRIMARY KEY,
+                        owner TEXT NOT NULL,
+                        expires_at DOUBLE PRECISION NOT NULL
+                    )
+                """)
+
+    def _connect(self):
+        # One connection, reopened if the server dropped it; callers hold self._lock
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(self.database_url)
+        return self._conn
+
+    def load(self, session_id: str, max_messages: int) -> Optional[dict]:
+        with self._lock:
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute(
+                    "SELECT current_step, student_interests, career_paths, message_count, created_at, last_updated, summary, summarized_through "
+                    "FROM chat_sessions WHERE session_id = %s", (session_id,)
+                )
+                metadata_row = cursor.fetchone()
+                if metadata_row is None:
+                    return None
+                cursor.execute(
+                    "SELECT role, content, timestamp FROM chat_messages WHERE session_id = %s ORDER BY seq DESC LIMIT %s",
+                    (session_id, max_messages)
+                )
+                return _session_from_rows(metadata_row, cursor.fetchall())
+
+    def save_batch(self, batch: SessionBatch, deletes: Set[str]):
+        """Apply deletes, then upsert session rows and insert new messages, in one transaction"""
+        with self._lock:
+            with self._connect() as conn, conn.cursor() as cursor:
+                if deletes:
+                    cursor.execute("DELETE FROM chat_messages WHERE session_id = ANY(%s)", (list(deletes),))
+                    cursor.execute("DELETE FROM chat_sessions WHERE session_id = ANY(%s)", (list(deletes),))
+                cursor.executemany("""
+                    INSERT INTO chat_sessions (session_id, current_step, student_interests, career_paths, message_count, created_at, last_updated, summary, summarized_through)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (session_id) DO UPDATE SET
+                        current_step = EXCLUDED.current_step, student_interests = EXCLUDED.student_interests,
+                        career_paths = EXCLUDED.career_paths, message_count = EXCLUDED.message_count,
+                        last_updated = EXCLUDED.last_updated, summary = EXCLUDED.summary,
+                        summarized_through = EXCLUDED.summarized_through
+                """, [_metadata_params(session_id, metadata) for session_id, (metadata, _) in batch.items()])
+                cursor.executemany("""
+                    INSERT INTO chat_messages (session_id, seq, role, content, timestamp)
+                    VALUES (%s, %s, %s, %s, %s)
+                    ON CONFLICT (session_id, seq) DO UPDATE SET
+                        role = EXCLUDED.role, content = EXCLUDED.content, timestamp = EXCLUDED.timestamp
+                """, _message_params(batch))
+
+    def acquire_lock(self, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        """Take the session's lock unless another owner holds an unexpired one"""
+        now = time.time()
+        with self._lock:
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute("""
+                    INSERT INTO chat_session_locks (session_id, owner, expires_at) VALUES (%s, %s, %s)
+                    ON CONFLICT (session_id) DO UPDATE SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at
+                    WHERE chat_session_locks.expires_at < %s
+                """, (session_id, owner, now + ttl_seconds, now))
+                return cursor.rowcount == 1
+
+    def release_lock(self, session_id: str, owner: str):
+        with self._lock:
+            with self._connect() as conn, conn.cursor() as cursor:
+                cursor.execute("DELETE FROM chat_session_locks WHERE session_id = %s AND owner = %s", (session_id, owner))
+
+
+# Delete the lock only if we still own it (it may have expired and been taken by another worker)
+RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class RedisSessionBackend:
+    """Sessions in Redis (or any server speaking its protocol), shared by every worker on every node
+
+    Each session is a hash of metadata plus a hash of messages keyed by sequence number,
+    so replaying a batch after a failed flush never duplicates messages.
+    """
+
+    name = 'redis'
+
+    def __init__(self, client=None, prefix: str = None):
+        if client is None:
+            if redis is None:
+                raise ImportError("MILO_SESSION_BACKEND=redis needs the redis package (pip install redis)")
+            client = redis.Redis.from_url(os.getenv('MILO_SESSION_REDIS_URL', 'redis://localhost:6379/0'), decode_responses=True)
+        self.client = client
+        self.prefix = prefix or os.getenv('MILO_SESSION_REDIS_PREFIX', 'milo:session:')
+        self.client.ping()
+
+    def _key(self, session_id: str, part: str = '') -> str:
+        return f"{self.prefix}{session_id}{part}"
+
+    def load(self, session_id: str, max_messages: int) -> Optional[dict]:
+        metadata = self.client.hgetall(self._key(session_id))
+        if not metadata:
+            return None
+        message_count = int(metadata['message_count'])
+        seqs = [str(seq) for seq in range(max(0, message_count - max_messages), message_count)]
+        raw_messages = self.client.hmget(self._key(session_id, ':messages'), seqs) if seqs else []
+        return {
+            'messages': [json.loads(raw) for raw in raw_messages if raw is not None],
+            'message_count': message_count,
+            'current_step': int(metadata['current_step']),
+            'student_interests': json.loads(metadata['student_interests']),
+            'career_paths': json.loads(metadata['career_paths']),
+            'created_at': metadata['created_at'],
+            'last_updated': metadata['last_updated'],
+            'summary': metadata.get('summary', ''),
+            'summarized_through': int(metadata.get('summarized_through', 0))
+        }
+
+    def save_batch(self, batch: SessionBatch, deletes: Set[str]):
+        """Apply deletes, then write metadata and new messages, in one MULTI/EXEC transaction"""
+        pipe = self.client.pipeline(transaction=True)
+        for session_id in deletes:
+            pipe.delete(self._key(session_id), self._key(session_id, ':messages'))
+        for session_id, (metadata, messages) in batch.items():
+            pipe.hset(self._key(session_id), mapping={
+                'current_step': metadata['current_step'],
+                'student_interests': json.dumps(metadata['student_interests']),
+                'career_paths': json.dumps(metadata['career_paths']),
+                'message_count': metadata['message_count'],
+                'created_at': metadata['created_at'],
+                'last_updated': metadata['last_updated'],
+                'summary': metadata['summary'],
+                'summarized_through': metadata['summarized_through']
+            })
+            if messages:
+                pipe.hset(self._key(session_id, ':messages'), mapping={str(seq): json.dumps(message) for seq, message in messages})
+        pipe.execute()
+
+    def acquire_lock(self, session_id: str, owner: str, ttl_seconds: float) -> bool:
+        return bool(self.client.set(self._key(session_id, ':lock'), owner, nx=True, px=int(ttl_seconds * 1000)))
+
+    def release_lock(self, session_id: str, owner: str):
+        self.client.eval(RELEASE_LOCK_SCRIPT, 1, self._key(session_id, ':lock'), owner)
+
+
+class LocalRedis:
+    """In-process stand-in for the subset of the Redis client API that RedisSessionBackend uses
+
+    Only shared between SessionStores in the same process, so it is for tests and local
+    runs, not for multiple workers.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._expires = {}
+        self._mutex = threading.RLock()
+
+    def _live(self, key: str):
+        expires_at = self._expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return self._data.get(key)
+
+    def ping(self) -> bool:
+        return True
+
+    def hgetall(self, key: str) -> dict:
+        with self._mutex:
+            return dict(self._live(key) or {})
+
+    def hmget(self, key: str, fields: List[str]) -> list:
+        with self._mutex:
+            values = self._live(key) or {}
+            return [values.get(field) for field in fields]
+
+    def hset(self, key: str, mapping: dict) -> int:
+        with self._mutex:
+            values = self._data.setdefault(key, {})
+            added = sum(1 for field in mapping if field not in values)
+            values.update({field: str(value) for field, value in mapping.items()})
+            return added
+
+    def delete(self, *keys: str) -> int:
+        with self._mutex:
+            deleted = 0
+            for key in keys:
+                if self._live(key) is not None:
+                    deleted += 1
+                self._data.pop(key, None)
+                self._expires.pop(key, None)
+            return deleted
+
+    def set(self, key: str, value: str, nx: bool = False, px: int = None):
+        with self._mutex:
+            if nx and self._live(key) is not None:
+                return None
+            self._data[key] = value
+            if px:
+                self._expires[key] = time.time() + px / 1000
+            else:
+                self._expires.pop(key, None)
+            return True
+
+    def get(self, key: str):
+        with self._mutex:
+            return self._live(key)
+
+    def eval(self, script: str, numkeys: int, *keys_and_args):
+        if script != RELEASE_LOCK_SCRIPT:
+            raise NotImplementedError("LocalRedis only runs the session lock release script")
+        key, owner = keys_and_args[0], keys_and_args[numkeys]
+        with self._mutex:
+            return self.delete(key) if self._live(key) == owner else 0
+
+    def pipeline(self, transaction: bool = True) -> '_LocalPipeline':
+        return _LocalPipeline(self)
+
+
+class _LocalPipeline:
+    """Queues commands and runs them together under the stand-in's lock, like MULTI/EXEC"""
+
+    def __init__(self, client: LocalRedis):
+        self._client = client
+        self._commands = []
+
+    def __getattr__(self, command: str):
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self) -> list:
+        with self._client._mutex:
+            return [getattr(self._client, command)(*args, **kwargs) for command, args, kwargs in self._commands]
+
+
+_local_redis: Optional[LocalRedis] = None
+
+
+def local_redis_backend() -> RedisSessionBackend:
+    """Redis backend on the process-wide LocalRedis stand-in"""
+    global _local_redis
+    if _local_redis is None:
+        _local_redis = LocalRedis()
+    backend = RedisSessionBackend(client=_local_redis)
+    backend.name = 'local_redis'
+    return backend
+
+
+# Backend name → factory; 'memory' means no backend
+SESSION_BACKENDS = {
+    'sqlite': SQLiteSessionBackend,
+    'postgres': PostgresSessionBackend,
+    'redis': RedisSessionBackend,
+    'local_redis': local_redis_backend,
+}
+
+
+def get_session_backend(name: str = None):
+    """Backend selected by MILO_SESSION_BACKEND, or None for memory-only sessions"""
+    name = name or os.getenv('MILO_SESSION_BACKEND', 'memory')
+    if name == 'memory':
+        return None
+    if name not in SESSION_BACKENDS:
+        raise ValueError(f"Unknown MILO_SESSION_BACKEND '{name}', expected memory or one of: {', '.join(SESSION_BACKENDS)}")
+    try:
+        backend = SESSION_BACKENDS[name]()
+        print(f"💾 Persisting chat sessions to {name}")
+        return backend
+    except Exception as e:
+        print(f"⚠️  Session backend '{name}' unavailable, keeping sessions in memory only: {e}")
+        return None
@@ -0,0 +1,409 @@
+"""
+Bounded in-memory store for chat conversation sessions, with optional write-behind persistence.
+
+Sessions are kept in least-recently-used order. Creating a session beyond
+``MILO_SESSION_MAX`` evicts the least recently used one, sessions idle for longer
+than ``MILO_SESSION_TTL_S`` expire, and each session keeps only its newest
+``MILO_SESSION_MAX_MESSAGES`` messages (``message_count`` still counts them all).
+Only ``get_or_create`` / ``fetch_or_create`` create sessions; ``get`` and
+``fetch`` return None for unknown or expired ids, so read endpoints cannot fill
+the store.
+
+With a backend (see session_backends.py), changes are queued in memory and a
+background task writes them in batches every ``MILO_SESSION_FLUSH_MS`` (or
+sooner once ``MILO_SESSION_FLUSH_BATCH`` messages are waiting), so streaming a
+reply never waits on the database. Eviction and expiry then only drop the
+in-memory copy: ``fetch`` reloads the session from the backend on its next use.
+
+Chat turns run inside ``turn(session_id)``, which serializes turns on the same
+session. With ``MILO_SESSION_SHARED=1`` (for more than one uvicorn worker, or
+more than one node) the turn also holds the backend's cross-process session
+lock, reloads the session from the backend instead of trusting this worker's
+copy, and writes it back before releasing the lock; reads always go to the
+backend too. If that write fails the turn fails: its changes are dropped, never
+retried after the lock is released, where they could overwrite what the next
+holder wrote.
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from session_backends import get_session_backend, session_metadata
+
+
+def new_session() -> dict:
+    now = datetime.now().isoformat()
+    return {
+        'messages': [],
+        'message_count': 0,
+        'current_step': 1,
+        'student_interests': [],
+        'career_paths': [],
+        'created_at': now,
+        'last_updated': now,
+        'summary': '',
+        'summarized_through': 0
+    }
+
+
+def _message_chars(messages: List[dict]) -> int:
+    return sum(len(message.get('content') or '') for message in messages)
+
+
+class SessionStore:
+    """LRU + idle-TTL bounded mapping of session id → session dict"""
+
+    def __init__(self, max_sessions: int = None, ttl_seconds: float = None, max_messages: int = None, backend=None):
+        self.max_sessions = max_sessions or int(os.getenv('MILO_SESSION_MAX', '10000'))
+        self.ttl_seconds = ttl_seconds or float(os.getenv('MILO_SESSION_TTL_S', '86400'))
+        self.max_messages = max_messages or int(os.getenv('MILO_SESSION_MAX_MESSAGES', '200'))
+
+        # Least recently used first; _last_access holds the matching monotonic timestamps
+        self._sessions: OrderedDict = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self.message_chars = 0
+        self.stats = {'created': 0, 'evicted_lru': 0, 'expired': 0, 'deleted': 0, 'trimmed_messages': 0, 'misses': 0}
+
+        # Write-behind queue: session id → {'session': live dict, 'messages': [(seq, message), ...]}
+        self.backend = backend if backend is not None else get_session_backend()
+        self.flush_interval = float(os.getenv('MILO_SESSION_FLUSH_MS', '200')) / 1000
+        self.flush_batch = int(os.getenv('MILO_SESSION_FLUSH_BATCH', '100'))
+        self._pending: Dict[str, dict] = {}
+        self._pending_deletes = set()
+        self._pending_messages = 0
+        self._flush_task = None
+        self._flush_requested = None
+        self._flush_lock = None
+        self.persist_stats = {'flushes': 0, 'flushed_sessions': 0, 'flushed_messages': 0, 'flush_errors': 0, 'flush_ms': 0.0, 'rehydrated': 0, 'load_errors': 0}
+
+        # Multi-worker mode: the backend is the source of truth and turns hold its per-session lock
+        self.shared = self.backend is not None and os.getenv('MILO_SESSION_SHARED', '0') == '1'
+        if os.getenv('MILO_SESSION_SHARED', '0') == '1' and self.backend is None:
+            print("⚠️  MILO_SESSION_SHARED=1 needs MILO_SESSION_BACKEND; sessions stay local to this worker")
+        self.lock_ttl = float(os.getenv('MILO_SESSION_LOCK_TTL_S', '120'))
+        self.lock_wait = float(os.getenv('MILO_SESSION_LOCK_WAIT_S', '10'))
+        self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._locks: Dict[str, list] = {}  # session id → [asyncio.Lock, holders + waiters]
+        self.lock_stats = {'turns': 0, 'contended': 0, 'wait_ms': 0.0, 'timeouts': 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _touch(self, session_id: str):
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._last_access.pop(session_id, None)
+        self.message_chars -= _message_chars(session['messages'])
+
+    def _insert(self, session_id: str, session: dict):
+        while len(self._sessions) >= self.max_sessions:
+            self._drop(next(iter(self._sessions)))
+            self.stats['evicted_lru'] += 1
+        self._sessions[session_id] = session
+        self.message_chars += _message_chars(session['messages'])
+        self._touch(session_id)
+
+    def expire_idle(self) -> int:
+        """Drop sessions idle for longer than the TTL; cheap because the oldest are at the front"""
+        cutoff = time.monotonic() - self.ttl_seconds
+        expired = 0
+        while self._sessions:
+            session_id = next(iter(self._sessions))
+            if self._last_access[session_id] >= cutoff:
+                break
+            self._drop(session_id)
+            expired += 1
+        self.stats['expired'] += expired
+        return expired
+
+    def get(self, session_id: str, touch: bool = True) -> Optional[dict]:
+        """Return the in-memory session, or None if it is not loaded or has expired; touch=False leaves its idle timer alone"""
+        self.expire_idle()
+        session = self._sessions.get(session_id)
+        if session is None:
+            self.stats['misses'] += 1
+            return None
+        if touch:
+            self._touch(session_id)
+        return session
+
+    async def fetch(self, session_id: str, touch: bool = True) -> Optional[dict]:
+        """Like get, but reloads a session that is no longer in memory (or, when shared, every session) from the backend"""
+        session = None if self.shared else self.get(session_id, touch)
+        if session is not None or self.backend is None:
+            return session
+
+        # Evicted before its changes were flushed: the queued copy is the newest one
+        pending = self._pending.get(session_id)
+        if pending is not None:
+            session = pending['session']
+        else:
+            try:
+                session = await asyncio.to_thread(self.backend.load, session_id, self.max_messages)
+            except Exception as e:
+                # Raise rather than return None, so a backend outage never looks like a new, empty session
+                print(f"⚠️  Could not load session {session_id} from {self.backend.name}: {e}")
+                self.persist_stats['load_errors'] += 1
+                raise
+            if session is None:
+                return None
+            self.persist_stats['rehydrated'] += 1
+
+        # Another request may have loaded or created it while we waited; when shared, the fresh copy wins
+        if session_id in self._sessions:
+            if not self.shared:
+                return self.get(session_id, touch)
+            self._drop(session_id)
+        self._insert(session_id, session)
+        return session
+
+    def get_or_create(self, session_id: str) -> dict:
+        session = None if self.shared else self.get(session_id)
+        if session is not None:
+            return session
+
+        if session_id in self._sessions:
+            self._drop(session_id)  # shared: another worker deleted it since this copy was loaded
+        session = new_session()
+        self._insert(session_id, session)
+        self.stats['created'] += 1
+        self.mark_dirty(session_id, session)
+        return session
+
+    async def fetch_or_create(self, session_id: str) -> dict:
+        session = await self.fetch(session_id)
+        if session is not None:
+            return session
+        return self.get_or_create(session_id)
+
+    def append_message(self, session_id: str, session: dict, role: str, content: str):
+        """Add a message to a session, dropping its oldest messages beyond the per-session cap"""
+        message = {
+            'role': role,
+            'content': content,
+            'timestamp': datetime.now().isoformat()
+        }
+        session['messages'].append(message)
+        seq = session.get('message_count', 0)
+        session['message_count'] = seq + 1
+        self.message_chars += len(content or '')
+        self.mark_dirty(session_id, session, (seq, message))
+
+        overflow = len(session['messages']) - self.max_messages
+        if overflow > 0:
+            self.message_chars -= _message_chars(session['messages'][:overflow])
+            del session['messages'][:overflow]
+            self.stats['trimmed_messages'] += overflow
+
+    def delete(self, session_id: str) -> bool:
+        existed = session_id in self._sessions
+        if existed:
+            self._drop(session_id)
+            self.stats['deleted'] += 1
+
+        if self.backend is not None:
+            dropped = self._pending.pop(session_id, None)
+            if dropped:
+                self._pending_messages -= len(dropped['messages'])
+            self._pending_deletes.add(session_id)
+            self._schedule_flush()
+        return existed
+
+    async def remove(self, session_id: str) -> bool:
+        """Delete a session; when shared, wait for the delete to reach the backend"""
+        if not self.shared:
+            return self.delete(session_id)
+        async with self.turn(session_id, load=False):
+            existed = self.delete(session_id)
+        return existed
+
+    # ===== PER-SESSION LOCKING =====
+
+    @asynccontextmanager
+    async def _local_lock(self, session_id: str):
+        entry = self._locks.get(session_id)
+        if entry is None:
+            entry = self._locks[session_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[session_id]
+
+    async def _acquire_shared_lock(self, session_id: str):
+        """Poll the backend's session lock until we hold it or MILO_SESSION_LOCK_WAIT_S runs out"""
+        deadline = time.monotonic() + self.lock_wait
+        delay = 0.01
+        while not await asyncio.to_thread(self.backend.acquire_lock, session_id, self._owner, self.lock_ttl):
+            if time.monotonic() + delay > deadline:
+                self.lock_stats['timeouts'] += 1
+                raise TimeoutError(f"Session {session_id} is busy with another message")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+    @asynccontextmanager
+    async def turn(self, session_id: str, load: bool = True):
+        """Exclusive access to a session for one chat turn, yielding the (fresh, when shared) session
+
+        Turns on the same session run one at a time in this worker and, when shared, across
+        every worker; the session is written to the backend before the lock is released.
+        """
+        started = time.perf_counter()
+        contended = session_id in self._locks
+        async with self._local_lock(session_id):
+            if self.shared:
+                await self._acquire_shared_lock(session_id)
+            waited_ms = (time.perf_counter() - started) * 1000
+            self.lock_stats['turns'] += 1
+            self.lock_stats['wait_ms'] += waited_ms
+            if contended or waited_ms > 50:
+                self.lock_stats['contended'] += 1
+
+            try:
+                yield await self.fetch_or_create(session_id) if load else None
+            finally:
+                if self.shared:
+                    try:
+                        await self.flush(session_id)
+                    except Exception:
+                        # The turn's changes never reached the backend; forget them rather than let this
+                        # worker's copy outlive the lock and overwrite what the next holder writes
+                        if session_id in self._sessions:
+                            self._drop(session_id)
+                        raise
+                    finally:
+                        await asyncio.to_thread(self.backend.release_lock, session_id, self._owner)
+
+    def session_ids(self) -> List[str]:
+        """Ids of the sessions in memory, most recently used last"""
+        self.expire_idle()
+        return list(self._sessions)
+
+    # ===== WRITE-BEHIND PERSISTENCE =====
+
+    def mark_dirty(self, session_id: str, session: dict, message: tuple = None):
+        """Queue a session (and optionally a new (seq, message)) for the next background flush"""
+        if self.backend is None:
+            return
+        entry = self._pending.setdefault(session_id, {'session': session, 'messages': []})
+        entry['session'] = session
+        if message is not None:
+            entry['messages'].append(message)
+            self._pending_messages += 1
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # no event loop (scripts, shutdown); flush() writes the queue when called
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_requested = asyncio.Event()
+            self._flush_task = loop.create_task(self._flush_loop())
+        if self._pending_messages >= self.flush_batch:
+            self._flush_requested.set()
+
+    async def _flush_loop(self):
+        while self._pending or self._pending_deletes:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self, session_id: str = None):
+        """Write every queued change to the backend in one batch
+
+        With session_id, only that session's changes are written, and a failure is raised instead of
+        requeued: a shared-mode turn must not leave a write behind that could land after its lock is gone.
+        """
+        if self.backend is None:
+            return
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+
+        async with self._flush_lock:
+            if session_id is not None:
+                pending = {session_id: self._pending.pop(session_id)} if session_id in self._pending else {}
+                deletes = {session_id} & self._pending_deletes
+                self._pending_deletes -= deletes
+                self._pending_messages -= sum(len(entry['messages']) for entry in pending.values())
+            else:
+                pending, deletes = self._pending, self._pending_deletes
+                self._pending, self._pending_deletes, self._pending_messages = {}, set(), 0
+            if not pending and not deletes:
+                return
+
+            # Snapshot metadata on the event loop; the write itself runs in a thread
+            batch = {session_id: (session_metadata(entry['session']), entry['messages']) for session_id, entry in pending.items()}
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self.backend.save_batch, batch, deletes)
+            except Exception as e:
+                self.persist_stats['flush_errors'] += 1
+                if session_id is not None:
+                    print(f"⚠️  Session {session_id} could not be saved to {self.backend.name}, dropping the turn: {e}")
+                    raise
+                print(f"⚠️  Session flush to {self.backend.name} failed, will retry: {e}")
+                self._requeue(pending, deletes)
+                return
+
+            self.persist_stats['flushes'] += 1
+            self.persist_stats['flushed_sessions'] += len(batch)
+            self.persist_stats['flushed_messages'] += sum(len(messages) for _, messages in batch.values())
+            self.persist_stats['flush_ms'] += (time.perf_counter() - started) * 1000
+
+    def _requeue(self, pending: Dict[str, dict], deletes: set):
+        """Put a failed batch back in front of anything queued since"""
+        for session_id in deletes:
+            if session_id not in self._pending:
+                self._pending_deletes.add(session_id)
+        for session_id, entry in pending.items():
+            if session_id in self._pending_deletes:
+                continue
+            newer = self._pending.get(session_id)
+            if newer is not None:
+                newer['messages'] = entry['messages'] + newer['messages']
+            else:
+                self._pending[session_id] = entry
+            self._pending_messages += len(entry['messages'])
+
+    def get_stats(self) -> dict:
+        stats = {
+            'sessions': len(self._sessions),
+            'max_sessions': self.max_sessions,
+            'ttl_seconds': self.ttl_seconds,
+            'max_messages': self.max_messages,
+            'stored_messages': sum(len(session['messages']) for session in self._sessions.values()),
+            'message_chars': self.message_chars,
+            **self.stats,
+            'backend': self.backend.name if self.backend is not None else 'memory',
+            'shared': self.shared,
+            'turns': self.lock_stats['turns'],
+            'contended_turns': self.lock_stats['contended'],
+            'avg_lock_wait_ms': round(self.lock_stats['wait_ms'] / self.lock_stats['turns'], 1) if self.lock_stats['turns'] else 0.0,
+            'lock_timeouts': self.lock_stats['timeouts']
+        }
+        if self.backend is not None:
+            flushes = self.persist_stats['flushes']
+            stats.update({
+                **{key: value for key, value in self.persist_stats.items() if key != 'flush_ms'},
+                'avg_flush_ms': round(self.persist_stats['flush_ms'] / flushes, 1) if flushes else 0.0,
+                'pending_sessions': len(self._pending),
+                'pending_messages': self._pending_messages,
+                'pending_deletes': len(self._pending_deletes)
+            })
+        return stats
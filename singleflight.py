@@ -0,0 +1,56 @@
+"""
+Request coalescing ("single flight") for identical in-flight async calls.
+
+While a call for a key is running, later callers with the same key await the
+same execution instead of starting their own. Each caller receives its own deep
+copy of the result, so callers can mutate what they get back. Cancelling one
+waiter does not cancel the shared execution the others are waiting on.
+"""
+
+import asyncio
+import copy
+from typing import Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Coalesce concurrent calls that share a key into one execution"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.stats = {'calls': 0, 'executions': 0, 'coalesced': 0, 'max_waiters': 0}
+        self._waiters: Dict[str, int] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable]):
+        """Return the result of factory(), sharing one execution among concurrent callers with the same key"""
+        self.stats['calls'] += 1
+
+        task = self._in_flight.get(key)
+        if task is None:
+            self.stats['executions'] += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        else:
+            self.stats['coalesced'] += 1
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        self.stats['max_waiters'] = max(self.stats['max_waiters'], self._waiters[key])
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, task: asyncio.Future):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+            self._waiters.pop(key, None)
+        if not task.cancelled():
+            task.exception()  # mark retrieved so an error nobody awaited is not logged as unhandled
+
+    def get_stats(self) -> dict:
+        calls = self.stats['calls']
+        return {
+            **self.stats,
+            'in_flight': len(self._in_flight),
+            'coalescing_ratio': round(self.stats['coalesced'] / calls, 3) if calls else 0.0
+        }